@@ -0,0 +1,283 @@
+"""
+Vectorized lender policies.
+
+A lender policy sizes loans for a whole position set at the open and decides
+liquidations at the close, as array math over all positions:
+
+    policy.begin_day(context)                           # optional
+    loans = policy.size_loans(values_open, stress_matrix)
+    decisions = policy.decide(values_close, loans)
+    policy.last_worst_hf                                # stress policies: worst HF behind the day's loans
+
+stress_matrix holds every position's value at each shocked open price, shape
+(n_positions, n_shocks). It is computed once per day by the caller and shared
+by all policies, so adding a policy adds only its own array math to the day.
+
+Policies:
+    - FixedLTVPolicy: AaveSimulator (DeFi baseline)
+    - StressAdjustedPolicy: hybrid_stress_sim.py stress cap
+    - SlidingLTVPolicy: sim4.py tiers + stress cap, optionally with the regression projection
+    - HaircutPolicy: Duffie-style collateral haircut from the stressed loss
+    - VolScaledLTVPolicy: LTV scaled by realized volatility
+"""
+
+from typing import Any, Mapping, NamedTuple, Optional, Protocol, Sequence, Tuple, runtime_checkable
+
+import numpy as np
+
+from aave.aave_original import AaveSimulator
+from aave.worst_case import worst_case_projected_hf
+
+
+class LenderDecisions(NamedTuple):
+    """Per-position liquidation decisions (arrays), as in AaveSimulator.decide_liquidation."""
+    should_liquidate: np.ndarray
+    health_factor: np.ndarray
+    repay_amount: np.ndarray
+    collateral_to_take: np.ndarray
+
+
+class DayContext(NamedTuple):
+    """Market state handed to LenderPolicy.begin_day before loans are sized."""
+    day: int
+    open_price: float
+    close_price: float
+    shocks_pct: np.ndarray
+    book: Any = None
+    backend: Any = None
+    volatility: float = float('nan')  # annualized realized volatility up to the open
+    risk: Optional[Mapping[str, float]] = None  # risk_factors row for the day (vol_*, ewma_vol, drawdown, ...)
+
+
+@runtime_checkable
+class LenderPolicy(Protocol):
+    name: str
+    aave: AaveSimulator     # lender parameters; aave.ltv_max is the plain (unreduced) LTV
+
+    def begin_day(self, context: DayContext) -> None:
+        ...
+
+    def size_loans(self, values_open: np.ndarray, stress_matrix: np.ndarray) -> np.ndarray:
+        """Loan per position at the open."""
+        ...
+
+    def decide(self, values_close: np.ndarray, loans: np.ndarray) -> LenderDecisions:
+        """Liquidation decisions at the close."""
+        ...
+
+
+def _health_factor(values, loans, liquidation_threshold):
+    """AaveSimulator.calculate_health_factor over arrays: +inf where loan <= 0."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(loans > 0, values * liquidation_threshold / loans, np.inf)
+
+
+def worst_stress_hf(stress_matrix, loans, liquidation_threshold):
+    """
+    Worst health factor over the shock grid for each position.
+    Value (and so HF) is monotone in each row, so the worst HF is at the row minimum.
+    """
+    if stress_matrix.shape[1] == 0:
+        return np.full(len(loans), np.inf)
+    return _health_factor(stress_matrix.min(axis=1), loans, liquidation_threshold)
+
+
+class FixedLTVPolicy:
+    """DeFi baseline: borrow ltv_max of the open value, liquidate below HF 1 (AaveSimulator)."""
+
+    name = 'fixed_ltv'
+
+    def __init__(self, aave: AaveSimulator = None, liquidation_threshold: float = 1.0):
+        """
+        Args:
+            aave: Lender parameters (ltv_max, liquidation threshold, close factor, bonus)
+            liquidation_threshold: Liquidate when HF falls below this
+        """
+        self.aave = aave or AaveSimulator()
+        self.liquidation_threshold = liquidation_threshold
+
+    def begin_day(self, context: DayContext) -> None:
+        self.context = context
+
+    def provisional_loans(self, values_open):
+        """The plain Aave loan (aave.borrow) each position could take."""
+        return values_open * self.aave.ltv_max
+
+    def size_loans(self, values_open, stress_matrix=None):
+        return self.provisional_loans(values_open)
+
+    def decide(self, values_close, loans) -> LenderDecisions:
+        hf = _health_factor(values_close, loans, self.aave.liquidation_threshold)
+        liquidate = hf < self.liquidation_threshold
+        repay = np.where(liquidate, loans * self.aave.close_factor, 0.0)
+        collateral = np.where(liquidate, repay * (1 + self.aave.liquidation_bonus), 0.0)
+        return LenderDecisions(liquidate, hf, repay, collateral)
+
+
+class StressAdjustedPolicy(FixedLTVPolicy):
+    """
+    TradFi-style dynamic margin (hybrid_stress_sim.py): stress-test the provisional
+    Aave loan over the shock grid, then cap the loan at
+    value_open * ltv_max * (worst_hf + safety_buffer).
+    """
+
+    name = 'stress_adjusted'
+
+    def __init__(self, aave: AaveSimulator = None, ltv_max: float = 0.65, safety_buffer: float = 0.1,
+                 liquidation_threshold: float = 1.0):
+        super().__init__(aave, liquidation_threshold)
+        self.ltv_max = ltv_max
+        self.safety_buffer = safety_buffer
+        # Worst HF computed by the last size_loans() call of the day, so callers reporting it
+        # do not run the stress projection (or the continuous worst-case solve) again
+        self.last_worst_hf: Optional[np.ndarray] = None
+
+    def begin_day(self, context: DayContext) -> None:
+        super().begin_day(context)
+        self.last_worst_hf = None
+
+    def worst_hf(self, values_open, stress_matrix):
+        """Worst projected HF over the shock grid with the provisional loan."""
+        return worst_stress_hf(stress_matrix, self.provisional_loans(values_open), self.aave.liquidation_threshold)
+
+    def _stressed(self, values_open, stress_matrix):
+        worst_hf = self.worst_hf(values_open, stress_matrix)
+        self.last_worst_hf = worst_hf
+        stressed = np.isfinite(worst_hf) & (worst_hf > 0)
+        with np.errstate(divide='ignore'):
+            # Same operation order as the scalar drivers: value * LTV_MAX / stress_factor
+            stress_safe = values_open * self.ltv_max / (1.0 / (worst_hf + self.safety_buffer))
+        return worst_hf, stressed, stress_safe
+
+    def size_loans(self, values_open, stress_matrix):
+        provisional = self.provisional_loans(values_open)
+        _, stressed, stress_safe = self._stressed(values_open, stress_matrix)
+        return np.where(stressed, np.minimum(provisional, stress_safe), provisional)
+
+
+# sim4.py sliding tiers: (worst HF below, max LTV), first match wins
+SLIDING_LTV_TIERS = ((1.2, 0.55), (1.0, 0.45), (0.8, 0.35))
+
+
+class SlidingLTVPolicy(StressAdjustedPolicy):
+    """
+    sim4.py variant: the stress cap (with a larger safety buffer) combined with a
+    tiered max LTV chosen by the worst stressed HF.
+
+    With a regression_model (sim4 REGRESSION_MODE), the projected HF under each
+    shock is model.predict(shock) + IL(shocked price) * il_adjust_factor, floored
+    at 0, instead of a direct revaluation. That needs begin_day() for the book.
+    continuous_shocks=True then takes the exact worst case over the whole
+    interval spanned by the shock grid (aave.worst_case) instead of the grid
+    points, from the book's own values (fees in the stress matrix are not seen).
+    The revaluation HF is monotone in price, so its grid minimum is already exact.
+    """
+
+    name = 'sliding_ltv'
+
+    def __init__(self, aave: AaveSimulator = None, ltv_max: float = 0.65, safety_buffer: float = 0.6,
+                 liquidation_threshold: float = 1.0, tiers: Sequence[Tuple[float, float]] = SLIDING_LTV_TIERS,
+                 regression_model=None, il_adjust_factor: float = 0.5, continuous_shocks: bool = False):
+        super().__init__(aave, ltv_max, safety_buffer, liquidation_threshold)
+        self.tiers = tuple(tiers)
+        self.regression_model = regression_model
+        self.il_adjust_factor = il_adjust_factor
+        self.continuous_shocks = continuous_shocks
+
+    def max_allowed_ltv(self, worst_hf):
+        # np.select takes the first matching condition, like the if/elif chain in sim4
+        return np.select([worst_hf < below for below, _ in self.tiers],
+                         [ltv for _, ltv in self.tiers], default=self.ltv_max)
+
+    def worst_hf(self, values_open, stress_matrix):
+        if self.regression_model is None:
+            return super().worst_hf(values_open, stress_matrix)
+
+        context = self.context
+        shocks = np.asarray(context.shocks_pct, dtype=np.float64)
+        if self.continuous_shocks and shocks.size:
+            worst = worst_case_projected_hf(context.book, context.open_price, self.provisional_loans(values_open),
+                                            self.regression_model, self.il_adjust_factor,
+                                            shocks.min(), shocks.max())
+            return worst.health_factor
+        predicted = self.regression_model.predict(shocks.reshape(-1, 1))
+        projected = np.zeros_like(stress_matrix)
+        for s, shock in enumerate(shocks):
+            shocked_price = context.open_price * (1 + shock / 100)
+            if shocked_price <= 0:
+                continue
+            hold = context.book.actual_eth * shocked_price + context.book.actual_usdc
+            with np.errstate(divide='ignore', invalid='ignore'):
+                il = np.where(hold != 0, stress_matrix[:, s] / hold - 1, 0.0)
+            projected[:, s] = np.maximum(predicted[s] + il * self.il_adjust_factor, 0.0)
+        worst = projected.min(axis=1) if projected.shape[1] else np.full(len(values_open), np.inf)
+        return np.where(self.provisional_loans(values_open) > 0, worst, np.inf)
+
+    def size_loans(self, values_open, stress_matrix):
+        provisional = self.provisional_loans(values_open)
+        worst_hf, stressed, stress_safe = self._stressed(values_open, stress_matrix)
+        sliding_safe = values_open * self.max_allowed_ltv(worst_hf)
+        safe = np.minimum(sliding_safe, stress_safe)
+        return np.where(stressed, np.minimum(provisional, safe), provisional)
+
+
+class HaircutPolicy(FixedLTVPolicy):
+    """
+    Duffie-style haircut: lend value_open * (1 - haircut). The haircut scales the
+    collateral's worst loss over the shock grid up to a tail move
+    (tail_multiplier) and adds a liquidity add-on, floored at min_haircut.
+    The loan never exceeds the plain Aave loan.
+    """
+
+    name = 'haircut'
+
+    def __init__(self, aave: AaveSimulator = None, min_haircut: float = 0.40, tail_multiplier: float = 2.5,
+                 liquidity_addon: float = 0.05, liquidation_threshold: float = 1.0):
+        super().__init__(aave, liquidation_threshold)
+        self.min_haircut = min_haircut
+        self.tail_multiplier = tail_multiplier
+        self.liquidity_addon = liquidity_addon
+
+    def haircuts(self, values_open, stress_matrix):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stress_loss = np.where(values_open > 0, 1 - stress_matrix.min(axis=1) / values_open, 1.0)
+        haircut = self.tail_multiplier * np.maximum(stress_loss, 0.0) + self.liquidity_addon
+        return np.clip(np.maximum(haircut, self.min_haircut), 0.0, 1.0)
+
+    def size_loans(self, values_open, stress_matrix):
+        loans = values_open * (1 - self.haircuts(values_open, stress_matrix))
+        return np.minimum(loans, self.provisional_loans(values_open))
+
+
+class VolScaledLTVPolicy(FixedLTVPolicy):
+    """
+    Volatility targeting: LTV = ltv_max * target_vol / realized_vol, clipped to
+    [min_ltv, ltv_max]. Uses ltv_max when no volatility estimate is available yet.
+    """
+
+    name = 'vol_scaled'
+
+    def __init__(self, aave: AaveSimulator = None, target_vol: float = 0.6, min_ltv: float = 0.3,
+                 liquidation_threshold: float = 1.0):
+        """
+        Args:
+            target_vol: Annualized volatility at which the full ltv_max is allowed
+            min_ltv: Lowest LTV offered however volatile the market
+        """
+        super().__init__(aave, liquidation_threshold)
+        self.target_vol = target_vol
+        self.min_ltv = min_ltv
+
+    def current_ltv(self) -> float:
+        ltv_max = self.aave.ltv_max
+        volatility: Optional[float] = getattr(getattr(self, 'context', None), 'volatility', float('nan'))
+        if volatility is None or not np.isfinite(volatility) or volatility <= 0:
+            return ltv_max
+        return float(np.clip(ltv_max * self.target_vol / volatility, self.min_ltv, ltv_max))
+
+    def size_loans(self, values_open, stress_matrix=None):
+        return values_open * self.current_ltv()
+
+
+POLICIES = {policy.name: policy for policy in
+            (FixedLTVPolicy, StressAdjustedPolicy, SlidingLTVPolicy, HaircutPolicy, VolScaledLTVPolicy)}
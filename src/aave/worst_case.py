@@ -0,0 +1,162 @@
+"""
+Exact worst-case health factor over a continuous shock interval.
+
+The stress policies scan a fixed shock grid (SHOCK_LEVELS_PCT). Here the
+worst case over the whole interval [shock_lo, shock_hi] is solved
+analytically, per position and vectorized over the book.
+
+Revaluation HF (value * LT / loan with a fixed loan): v3 value is
+non-decreasing in price, so the minimum is always at the lowest shock. One
+valuation gives the exact answer. (A grid that contains its lowest shock is
+therefore already exact for this HF; the gain is cost, not accuracy.)
+
+Regression-projected HF (SlidingLTVPolicy with a regression model):
+
+    F(p) = intercept + slope * s(p) + il_adjust_factor * (value(p) / hold(p) - 1),
+    floored at 0,  s(p) = 100 * (p / p0 - 1)
+
+This is not monotone. IL peaks at the position's initial price and has kinks
+at the range bounds. F is smooth on each of the three range regions, so its
+minimum lies at the interval ends, at a range bound inside the interval, or
+at a stationary point of one piece:
+
+    below / above range:  dF/dp = 0 is a quadratic in p with closed-form roots
+    in range (u = sqrt(p)): u * hold^2 * dF/dp is a quintic in u, whose roots
+                            are the eigenvalues of its companion matrix (one
+                            batched eigvals call for the book)
+
+F is evaluated at every candidate, each clipped into the interval, and the
+minimum is taken. Spurious candidates (maxima, roots in another piece) can only
+be evaluated at real points of the interval, so they never lower the result.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from kernels import numpy_backend
+
+
+class WorstCase(NamedTuple):
+    health_factor: np.ndarray   # exact minimum over the interval
+    shock_pct: np.ndarray       # shock at which it is reached
+
+
+def _price_bounds(open_price, shock_lo: float, shock_hi: float, n: int):
+    if shock_lo > shock_hi:
+        raise ValueError("shock_lo must not exceed shock_hi")
+    open_prices = np.broadcast_to(np.asarray(open_price, dtype=np.float64), (n,))
+    return open_prices, open_prices * (1 + shock_lo / 100), open_prices * (1 + shock_hi / 100)
+
+
+def worst_case_hf(book, open_price, loans, liquidation_threshold: float, shock_lo: float = -15.0,
+                  shock_hi: float = 15.0, backend=None) -> WorstCase:
+    """
+    Exact minimum of value * liquidation_threshold / loan over shocks in
+    [shock_lo, shock_hi] percent, per position: the value at the lowest shock.
+    Conventions as kernels.numpy_backend.worst_shock_hf: a non-positive shocked
+    price gives HF 0, a non-positive loan +inf.
+    """
+    backend = backend or numpy_backend
+    loans = np.asarray(loans, dtype=np.float64)
+    _, p_lo, _ = _price_bounds(open_price, shock_lo, shock_hi, len(book))
+    values = backend.position_value(book, np.maximum(p_lo, 0.0))
+    hf = numpy_backend.health_factor(values, loans, liquidation_threshold)
+    hf = np.where(loans > 0, np.where(p_lo > 0, hf, 0.0), np.inf)
+    return WorstCase(hf, np.full(len(book), float(shock_lo)))
+
+
+def _projected(book, prices, open_prices, intercept, slope, il_adjust_factor):
+    # F at prices of shape (n_candidates, n_positions), floored at 0
+    value = numpy_backend.position_value(book, prices)
+    hold = book.actual_eth * prices + book.actual_usdc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        il = np.where(hold != 0, value / hold - 1, 0.0)
+    shock = 100 * (prices / open_prices - 1)
+    return np.maximum(intercept + slope * shock + il * il_adjust_factor, 0.0)
+
+
+def _quadratic_stationary(x0, y0, numerator, c):
+    # (x0 p + y0)^2 = numerator / c  →  p = (sqrt(numerator / c) - y0) / x0 (NaN when there is none)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.sqrt(numerator / c) - y0) / x0
+
+
+def _in_range_stationary(book, c, f, rows):
+    """
+    Real roots u of the in-range quintic, as prices u^2, shape (5, n) (NaN where
+    missing). Only positions in rows (a mask) are solved.
+    """
+    roots = np.full((len(book), 5), np.nan)
+    c = np.broadcast_to(c, (len(book),))[rows]
+    L, x0, y0 = book.liquidity[rows], book.actual_eth[rows], book.actual_usdc[rows]
+    sa, sb = book.sqrt_lower[rows], book.sqrt_upper[rows]
+    # u * hold^2 * dF/dp, coefficients of u^5 .. u^0
+    coeffs = np.stack([c * x0 ** 2, np.zeros_like(L), 2 * c * x0 * y0, -f * L * x0,
+                       c * y0 ** 2 + f * L * (x0 * sa - y0 / sb), f * L * y0], axis=1)
+    solved = np.full((len(L), 5), np.nan)
+
+    lead = coeffs[:, 0]
+    scale = np.abs(coeffs).max(axis=1)
+    quintic = np.abs(lead) > 1e-12 * scale
+    if quintic.any():
+        monic = coeffs[quintic, 1:] / lead[quintic, None]
+        companion = np.zeros((int(quintic.sum()), 5, 5))
+        companion[:, 0, :] = -monic
+        companion[:, np.arange(1, 5), np.arange(4)] = 1.0
+        eig = np.linalg.eigvals(companion)
+        real = np.abs(eig.imag) <= 1e-9 * np.maximum(np.abs(eig.real), 1.0)
+        solved[quintic] = np.where(real, eig.real, np.nan)
+    for i in np.flatnonzero(~quintic & (scale > 0)):
+        # Degenerate rows (no price slope or no ETH held): lower-degree polynomial
+        r = np.roots(coeffs[i])
+        r = r[np.abs(r.imag) <= 1e-9 * np.maximum(np.abs(r.real), 1.0)].real
+        solved[i, :len(r)] = r
+    roots[rows] = np.where(solved > 0, solved, np.nan)
+    return (roots ** 2).T
+
+
+def worst_case_projected_hf(book, open_price, loans, regression_model, il_adjust_factor: float = 0.5,
+                            shock_lo: float = -15.0, shock_hi: float = 15.0) -> WorstCase:
+    """
+    Exact minimum over [shock_lo, shock_hi] percent of the SlidingLTVPolicy
+    regression projection max(model(shock) + IL(shocked price) * il_adjust_factor, 0),
+    per position. Positions without a loan get +inf; an interval reaching a
+    non-positive price gives 0.
+
+    Args:
+        regression_model: Fitted linear model of HF on the shock (coef_, intercept_),
+            e.g. sklearn LinearRegression
+    """
+    slope = float(np.ravel(regression_model.coef_)[0])
+    intercept = float(np.ravel(regression_model.intercept_)[0])
+    loans = np.asarray(loans, dtype=np.float64)
+    n = len(book)
+    open_prices, p_lo, p_hi = _price_bounds(open_price, shock_lo, shock_hi, n)
+    if n == 0:
+        return WorstCase(np.zeros(0), np.zeros(0))
+
+    f = il_adjust_factor
+    c = 100 * slope / open_prices           # d(slope * shock) / dp
+    x0, y0 = book.actual_eth, book.actual_usdc
+    x_max = book.liquidity * (1 / book.sqrt_lower - 1 / book.sqrt_upper)
+    y_max = book.liquidity * (book.sqrt_upper - book.sqrt_lower)
+    candidates = np.vstack([
+        p_lo, p_hi, book.lower_price, book.upper_price,
+        _quadratic_stationary(x0, y0, -f * x_max * y0, c),    # below range
+        _quadratic_stationary(x0, y0, f * y_max * x0, c),     # above range
+        # Only positions whose range overlaps the interval have an in-range piece
+        _in_range_stationary(book, c, f, (book.lower_price < p_hi) & (book.upper_price > p_lo)),
+    ])
+    candidates = np.where(np.isfinite(candidates), candidates, p_lo)
+    candidates = np.clip(candidates, np.maximum(p_lo, 0.0), np.maximum(p_hi, 0.0))
+    projected = _projected(book, candidates, open_prices, intercept, slope, il_adjust_factor)
+
+    worst_at = projected.argmin(axis=0)
+    worst = projected[worst_at, np.arange(n)]
+    worst_price = candidates[worst_at, np.arange(n)]
+    shock = 100 * (worst_price / open_prices - 1)
+    # A non-positive shocked price projects 0, as in SlidingLTVPolicy.worst_hf
+    worst = np.where(p_lo > 0, worst, 0.0)
+    shock = np.where(p_lo > 0, shock, shock_lo)
+    return WorstCase(np.where(loans > 0, worst, np.inf), shock)
@@ -0,0 +1,387 @@
+"""
+Benchmark harness for the simulation hot paths.
+
+Measures the per-position work that dominates a run (LP valuation, lender
+decisions, stress projection) and the daily CSV I/O, sweeping the number of
+positions. Results are stored as JSON and can be compared against a saved
+baseline with a regression threshold.
+
+Usage (from the repository root):
+    python src/benchmarks/bench_hot_paths.py --sizes 500 5000 50000
+    python src/benchmarks/bench_hot_paths.py --save-baseline
+    python src/benchmarks/bench_hot_paths.py --compare --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Mirror the IDE source roots so the simulation modules import as they do there
+SRC_DIR = Path(__file__).resolve().parent.parent
+for _path in (SRC_DIR / 'defi_sim', SRC_DIR.parent, SRC_DIR):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+from aave.aave_original import AaveSimulator
+from position_loader import create_positions
+
+DEFAULT_SIZES = [500, 5_000, 50_000, 1_000_000]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10  # 10% slower than baseline counts as a regression
+DEFAULT_RESULTS_DIR = SRC_DIR.parent / 'output' / 'benchmarks'
+BASELINE_FILENAME = 'baseline.json'
+
+SEED = 1234
+BENCH_PRICE = 2500.0      # same as position_loader.INITIAL_ETH_PRICE
+BENCH_SHOCKED_PRICE = 2250.0
+IO_DAYS = 3               # trading-day files written for the load benchmark
+
+
+# ────────────────────────────────────────────────
+# Benchmark cases
+# Each case takes the number of positions, does its setup (untimed)
+# and returns a zero-argument callable that runs the timed workload.
+# ────────────────────────────────────────────────
+
+def _positions(n_positions: int):
+    random.seed(SEED)
+    return create_positions(n_positions)
+
+
+def bench_position_valuation(n_positions: int) -> Callable[[], None]:
+    """UniswapV3Position value, hold value and IL at one price."""
+    positions = _positions(n_positions)
+
+    def run():
+        for pos in positions:
+            pos.compute_position_value(BENCH_SHOCKED_PRICE)
+            pos.compute_hold_value(BENCH_SHOCKED_PRICE)
+            pos.compute_impermanent_loss(BENCH_SHOCKED_PRICE)
+
+    return run
+
+
+def bench_position_evaluate(n_positions: int) -> Callable[[], None]:
+    """UniswapV3Position.evaluate (open value, close value, hold value and IL in one call)."""
+    positions = _positions(n_positions)
+
+    def run():
+        for pos in positions:
+            pos.evaluate(BENCH_PRICE, BENCH_SHOCKED_PRICE)
+
+    return run
+
+
+def bench_position_valuation_separate(n_positions: int) -> Callable[[], None]:
+    """The four separate valuation calls that UniswapV3Position.evaluate replaces."""
+    positions = _positions(n_positions)
+
+    def run():
+        for pos in positions:
+            pos.compute_position_value(BENCH_PRICE)
+            pos.compute_position_value(BENCH_SHOCKED_PRICE)
+            pos.compute_hold_value(BENCH_SHOCKED_PRICE)
+            pos.compute_impermanent_loss(BENCH_SHOCKED_PRICE)
+
+    return run
+
+
+def bench_decide_liquidation(n_positions: int) -> Callable[[], None]:
+    """AaveSimulator.decide_liquidation over the book."""
+    positions = _positions(n_positions)
+    aave = AaveSimulator()
+    loans = [aave.borrow(pos.compute_position_value(BENCH_PRICE)) for pos in positions]
+    values = [pos.compute_position_value(BENCH_SHOCKED_PRICE) for pos in positions]
+
+    def run():
+        for value, loan in zip(values, loans):
+            aave.decide_liquidation(value, loan)
+
+    return run
+
+
+def bench_worst_projected_hf(n_positions: int) -> Callable[[], None]:
+    """sim4.compute_worst_projected_hf (direct mode) over the book."""
+    import sim4
+
+    positions = _positions(n_positions)
+    aave = AaveSimulator()
+    loans = [aave.borrow(pos.compute_position_value(BENCH_PRICE)) for pos in positions]
+
+    def run():
+        for pos, loan in zip(positions, loans):
+            sim4.compute_worst_projected_hf(pos, BENCH_PRICE, loan, aave, None)
+
+    return run
+
+
+def bench_liquidation_shock_table(n_positions: int) -> Callable[[], None]:
+    """defi_sim.liquidation_index shock table (21 shocks) from a prebuilt index, no revaluation."""
+    import numpy as np
+    from defi_sim.liquidation_index import LiquidationIndex
+    from position_loader import create_position_book
+
+    random.seed(SEED)
+    index = LiquidationIndex.from_open_price(create_position_book(n_positions), BENCH_PRICE)
+    shocks = np.arange(-50, 55, 5)
+
+    def run():
+        index.shock_table(BENCH_PRICE, shocks)
+
+    return run
+
+
+def _daily_rows(n_positions: int) -> List[Dict]:
+    """Build daily CSV rows exactly as run_full_simulation formats them."""
+    from simulator import build_daily_csv_row
+
+    positions = _positions(n_positions)
+    aave = AaveSimulator()
+    rows = []
+    for pos in positions:
+        value_open = pos.compute_position_value(BENCH_PRICE)
+        value_close = pos.compute_position_value(BENCH_SHOCKED_PRICE)
+        loan = aave.borrow(value_open)
+        decision = aave.decide_liquidation(value_close, loan)
+        rows.append(build_daily_csv_row(
+            pos.position_id, BENCH_PRICE, BENCH_SHOCKED_PRICE, value_open, value_close, loan,
+            pos.compute_hold_value(BENCH_SHOCKED_PRICE), pos.compute_impermanent_loss(BENCH_SHOCKED_PRICE),
+            decision['health_factor'], decision['should_liquidate'],
+            decision['repay_amount'], decision['collateral_to_take'],
+        ))
+    return rows
+
+
+def bench_daily_csv_write(n_positions: int) -> Callable[[], None]:
+    """simulator.write_daily_csv for one trading day."""
+    from simulator import write_daily_csv
+
+    rows = _daily_rows(n_positions)
+    tmp_dir = tempfile.TemporaryDirectory(prefix='bench_csv_')
+    csv_filename = os.path.join(tmp_dir.name, 'trading_day_20220101.csv')
+
+    def run():
+        write_daily_csv(csv_filename, rows)
+
+    run.cleanup = tmp_dir.cleanup
+    return run
+
+
+def bench_load_and_extract(n_positions: int) -> Callable[[], None]:
+    """generate_analysis_charts.load_daily_files + extract_timeseries."""
+    from simulator import write_daily_csv
+    from generate_analysis_charts import load_daily_files, extract_timeseries
+
+    rows = _daily_rows(n_positions)
+    tmp_dir = tempfile.TemporaryDirectory(prefix='bench_load_')
+    for day in range(IO_DAYS):
+        write_daily_csv(os.path.join(tmp_dir.name, f'trading_day_202201{day + 1:02d}.csv'), rows)
+
+    def run():
+        extract_timeseries(load_daily_files(tmp_dir.name))
+
+    run.cleanup = tmp_dir.cleanup
+    return run
+
+
+def _kernel_case(backend_name: str, kernel: str) -> Callable[[int], Callable[[], None]]:
+    """Benchmark one kernels/ backend function over a PositionBook."""
+
+    def setup(n_positions: int) -> Callable[[], None]:
+        import numpy as np
+        from kernels.backend import get_backend
+        from sim4 import SHOCK_LEVELS_PCT
+        from position_loader import create_position_book
+
+        backend = get_backend(backend_name)
+        aave = AaveSimulator()
+        random.seed(SEED)
+        book = create_position_book(n_positions)
+        loans = backend.position_value(book, BENCH_PRICE) * aave.ltv_max
+        calls = {
+            'evaluate': lambda: backend.evaluate(book, BENCH_PRICE, BENCH_SHOCKED_PRICE),
+            'decide_liquidation': lambda: backend.decide_liquidation(
+                loans, loans, aave.liquidation_threshold, aave.close_factor, aave.liquidation_bonus),
+            'worst_shock_hf': lambda: backend.worst_shock_hf(
+                book, BENCH_PRICE, np.asarray(SHOCK_LEVELS_PCT), loans, aave.liquidation_threshold),
+        }
+        run = calls[kernel]
+        run()  # warm-up (JIT compilation for numba)
+        return run
+
+    setup.__doc__ = f"kernels.{backend_name}_backend.{kernel} over a PositionBook."
+    return setup
+
+
+BENCHMARKS: Dict[str, Callable[[int], Callable[[], None]]] = {
+    'position_valuation': bench_position_valuation,
+    'position_valuation_separate': bench_position_valuation_separate,
+    'position_evaluate': bench_position_evaluate,
+    'decide_liquidation': bench_decide_liquidation,
+    'worst_projected_hf': bench_worst_projected_hf,
+    'liquidation_shock_table': bench_liquidation_shock_table,
+    'daily_csv_write': bench_daily_csv_write,
+    'load_and_extract': bench_load_and_extract,
+}
+for _backend in ('numpy', 'numba'):
+    for _kernel in ('evaluate', 'decide_liquidation', 'worst_shock_hf'):
+        BENCHMARKS[f'{_backend}_{_kernel}'] = _kernel_case(_backend, _kernel)
+
+
+# ────────────────────────────────────────────────
+# Runner
+# ────────────────────────────────────────────────
+
+def time_case(run: Callable[[], None], repeat: int) -> List[float]:
+    """Return wall-clock timings (seconds) of `repeat` calls to run()."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_benchmarks(sizes: List[int] = None, names: List[str] = None, repeat: int = DEFAULT_REPEAT) -> Dict:
+    """Run the selected benchmarks for every size.
+
+    Args:
+        sizes: Position counts to sweep (default: DEFAULT_SIZES)
+        names: Benchmark names to run (default: all)
+        repeat: Timed repetitions per (benchmark, size)
+
+    Returns:
+        Dict with 'meta' and a 'results' list of per-(benchmark, size) timings
+    """
+    sizes = sizes or DEFAULT_SIZES
+    names = names or list(BENCHMARKS)
+
+    results = []
+    for name in names:
+        for n_positions in sizes:
+            run = BENCHMARKS[name](n_positions)
+            try:
+                timings = time_case(run, repeat)
+            finally:
+                # Setups that write files attach a cleanup for their temporary directory
+                if hasattr(run, 'cleanup'):
+                    run.cleanup()
+            best = min(timings)
+            throughput = n_positions / best if best > 0 else float('inf')
+            results.append({
+                'benchmark': name,
+                'n_positions': n_positions,
+                'repeat': repeat,
+                'min_s': best,
+                'median_s': statistics.median(timings),
+                'mean_s': statistics.mean(timings),
+                'positions_per_s': throughput,
+            })
+            print(f"{name:<28} n={n_positions:>9,}  min={best:9.4f}s  "
+                  f"median={statistics.median(timings):9.4f}s  ({throughput:,.0f} pos/s)")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'seed': SEED,
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+
+
+def save_results(report: Dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results saved to: {path}")
+    return path
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Compare a report against a baseline report.
+
+    Cases are matched on (benchmark, n_positions) and compared on min_s,
+    which is the least noisy of the recorded statistics.
+
+    Returns:
+        List of comparison rows; rows with 'regression' True exceeded the threshold
+    """
+    baseline_index = {(r['benchmark'], r['n_positions']): r for r in baseline.get('results', [])}
+    comparisons = []
+    for row in report['results']:
+        base = baseline_index.get((row['benchmark'], row['n_positions']))
+        if base is None or base['min_s'] <= 0:
+            continue
+        ratio = row['min_s'] / base['min_s']
+        comparisons.append({
+            'benchmark': row['benchmark'],
+            'n_positions': row['n_positions'],
+            'baseline_s': base['min_s'],
+            'current_s': row['min_s'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return comparisons
+
+
+def print_comparison(comparisons: List[Dict], threshold: float) -> None:
+    print(f"\n===== COMPARISON VS BASELINE (threshold +{threshold * 100:.0f}%) =====")
+    for c in comparisons:
+        flag = 'REGRESSION' if c['regression'] else 'ok'
+        print(f"{c['benchmark']:<28} n={c['n_positions']:>9,}  base={c['baseline_s']:9.4f}s  "
+              f"now={c['current_s']:9.4f}s  x{c['ratio']:.2f}  {flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the simulation hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Position counts to sweep')
+    parser.add_argument('--bench', nargs='+', choices=sorted(BENCHMARKS), default=None,
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--results-dir', type=Path, default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Also store this run as the baseline')
+    parser.add_argument('--compare', action='store_true',
+                        help='Compare against the saved baseline; exit 1 on regression')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed slowdown vs baseline as a fraction (0.10 = 10%%)')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.bench, args.repeat)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    save_results(report, args.results_dir / f'bench_{timestamp}.json')
+
+    baseline_path = args.results_dir / BASELINE_FILENAME
+    if args.save_baseline:
+        save_results(report, baseline_path)
+
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"No baseline found at {baseline_path}; run with --save-baseline first.")
+            return 1
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        comparisons = compare_to_baseline(report, baseline, args.threshold)
+        print_comparison(comparisons, args.threshold)
+        if any(c['regression'] for c in comparisons):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
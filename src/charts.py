@@ -1,15 +1,22 @@
-import pandas as pd
+import os
+
 import matplotlib.pyplot as plt
 
+from defi_sim.artifacts import read_timeseries, resolve_artifact
+from defi_sim.run_summary import RunSummary
+
+RUN_ID = 'paper_data'
+
 # Read the DeFi timeseries
-defi_df = pd.read_csv('../output/paper_data/liquidation_timeseries.csv')
-defi_df['date'] = pd.to_datetime(defi_df['date'])
-defi_df.set_index('date', inplace=True)
+defi_path = resolve_artifact('liquidation_timeseries.csv', run_id=RUN_ID)
+defi_df = read_timeseries(defi_path).set_index('date')
 
 # Read the TradFi timeseries
-tradfi_df = pd.read_csv('../output/paper_data/hybrid_adjusted_timeseries.csv')
-tradfi_df['date'] = pd.to_datetime(tradfi_df['date'])
-tradfi_df.set_index('date', inplace=True)
+tradfi_path = resolve_artifact('hybrid_adjusted_timeseries.csv', run_id=RUN_ID)
+tradfi_df = read_timeseries(tradfi_path).set_index('date')
+
+# Charts and stats go next to the resolved run's files
+output_dir = os.path.dirname(defi_path)
 
 # Ensure both dataframes cover the same date range
 common_dates = defi_df.index.intersection(tradfi_df.index)
@@ -25,7 +32,7 @@ plt.xlabel('Date')
 plt.ylabel('Close Price')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/close_price_comparison.png')
+plt.savefig(os.path.join(output_dir, 'close_price_comparison.png'))
 plt.close()
 
 # Chart 2: Price Change Percentage Over Time
@@ -37,7 +44,7 @@ plt.xlabel('Date')
 plt.ylabel('Price Change %')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/price_change_comparison.png')
+plt.savefig(os.path.join(output_dir, 'price_change_comparison.png'))
 plt.close()
 
 # Chart 3: Number of Liquidations Over Time
@@ -49,7 +56,7 @@ plt.xlabel('Date')
 plt.ylabel('Number of Liquidations')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/liquidations_comparison.png')
+plt.savefig(os.path.join(output_dir, 'liquidations_comparison.png'))
 plt.close()
 
 # Chart 4: Average Health Factor Over Time
@@ -61,7 +68,7 @@ plt.xlabel('Date')
 plt.ylabel('Average Health Factor')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/health_factor_comparison.png')
+plt.savefig(os.path.join(output_dir, 'health_factor_comparison.png'))
 plt.close()
 
 # Chart 5: Cumulative Liquidations
@@ -76,7 +83,7 @@ plt.xlabel('Date')
 plt.ylabel('Cumulative Liquidations')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/cumulative_liquidations.png')
+plt.savefig(os.path.join(output_dir, 'cumulative_liquidations.png'))
 plt.close()
 
 # Additional Stats for the Paper
@@ -98,10 +105,28 @@ stats = {
 print(stats)
 
 # Write stats to file
-with open('../output/paper_data/summary.txt', 'w') as f:
+with open(os.path.join(output_dir, 'summary.txt'), 'w') as f:
     for key, value in stats.items():
         f.write(f'{key}: {value}\n')
 
+# Typed summary.json alongside summary.txt
+RunSummary(
+    driver='charts',
+    run_id=RUN_ID,
+    total_dates=len(common_dates),
+    metrics={
+        'total_defi_liquidations': total_defi_liquidations,
+        'total_tradfi_liquidations': total_tradfi_liquidations,
+        'liquidation_reduction_pct': liquidation_reduction_pct,
+        'days_with_defi_liquidations': days_with_defi_liq,
+        'days_with_tradfi_liquidations': days_with_tradfi_liq,
+    },
+    params={
+        'defi_timeseries': defi_path,
+        'tradfi_timeseries': tradfi_path,
+    },
+).write(output_dir)
+
 # TradFi Specific Charts
 # Chart 6: Average Effective LTV Over Time (TradFi only)
 plt.figure(figsize=(12, 6))
@@ -111,7 +136,7 @@ plt.xlabel('Date')
 plt.ylabel('Avg Effective LTV')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/tradfi_ltv.png')
+plt.savefig(os.path.join(output_dir, 'tradfi_ltv.png'))
 plt.close()
 
 # Chart 7: Reductions Applied and Unique Liquidated Today (TradFi)
@@ -123,7 +148,7 @@ plt.xlabel('Date')
 plt.ylabel('Count')
 plt.legend()
 plt.grid(True)
-plt.savefig('../output/paper_data/tradfi_reductions_liquidations.png')
+plt.savefig(os.path.join(output_dir, 'tradfi_reductions_liquidations.png'))
 plt.close()
 
 print('Charts generated: close_price_comparison.png, price_change_comparison.png, liquidations_comparison.png, health_factor_comparison.png, cumulative_liquidations.png, tradfi_ltv.png, tradfi_reductions_liquidations.png')
\ No newline at end of file
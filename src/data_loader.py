@@ -3,5 +3,14 @@ from pathlib import Path
 
 # Load the price data at the module level
 data_path = Path(__file__).parent.parent / 'data' / 'eth-usd-max.csv'
-df = pd.read_csv(data_path, parse_dates=['date'])
-df = df[['date', 'open_price', 'close_price']].sort_values('date').reset_index(drop=True)
+_raw = pd.read_csv(data_path, parse_dates=['date']).sort_values('date').reset_index(drop=True)
+df = _raw[['date', 'open_price', 'close_price']].copy()
+
+# Daily traded volume (USD, all venues), aligned with df's rows
+volume = _raw['total_volume'].astype(float)
+
+# Crash windows analyzed by the simulators (inclusive date ranges)
+CRASH_WINDOWS = {
+    'May 2021 Crash': ('2021-05-01', '2021-06-30'),
+    'FTX Nov 2022': ('2022-11-01', '2022-11-30'),
+}
@@ -0,0 +1,217 @@
+"""
+Shared reader for run artifacts (timeseries CSVs).
+
+Analysis scripts locate a run's files through the run catalog rather than
+hardcoded paths, and load them with explicit dtypes:
+
+    path = resolve_artifact('liquidation_timeseries.csv', run_id='run_20260111_122829')
+    df = read_timeseries(path)
+
+The parsed frame is cached next to the CSV (<name>.csv.parquet, or
+<name>.csv.pkl when no Parquet engine is installed). The cache file's mtime is
+set to the CSV's, and the cache is used only while the two still match, so a
+rewritten CSV is parsed again on the next read. Repeated reads in the same
+process are served from a small in-memory LRU (one frame per CSV path, at most
+MEMORY_CACHE_MAX_ENTRIES frames and MEMORY_CACHE_MAX_BYTES in total).
+"""
+
+import importlib.util
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from defi_sim.run_catalog import RunCatalog, get_catalog_path
+
+# Column dtypes of the known timeseries files; columns not listed are inferred
+TIMESERIES_DTYPES: Dict[str, Dict[str, str]] = {
+    'liquidation_timeseries.csv': {
+        'open_price': 'float64',
+        'close_price': 'float64',
+        'price_change': 'float64',
+        'number_of_liquidations': 'int64',
+        'average_health_factor': 'float64',
+    },
+    'hybrid_adjusted_timeseries.csv': {
+        'open_price': 'float64',
+        'close_price': 'float64',
+        'price_change_pct': 'float64',
+        'liquidations_tradfi_adjusted': 'int64',
+        'avg_health_factor': 'float64',
+        'avg_effective_ltv': 'float64',
+        'reductions_applied_today': 'int64',
+        'unique_liquidated_today': 'int64',
+    },
+}
+
+DATE_COLUMN = 'date'
+
+MEMORY_CACHE_MAX_ENTRIES = 32
+MEMORY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# abspath -> (mtime_ns, frame, nbytes), least recently used first
+_memory_cache: "OrderedDict[str, Tuple[int, pd.DataFrame, int]]" = OrderedDict()
+_memory_cache_bytes = 0
+
+
+# ────────────────────────────────────────────────
+# Path resolution
+# ────────────────────────────────────────────────
+
+def _artifact_in_run(run: Dict, filename: str) -> Optional[str]:
+    # Drivers record artifacts under their own keys, backfilled runs under the file name
+    for path in run['artifacts'].values():
+        if isinstance(path, str) and os.path.basename(path) == filename and os.path.isfile(path):
+            return path
+    if run.get('run_dir'):
+        path = os.path.join(run['run_dir'], filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def resolve_artifact(filename: str, run_id: str = None, driver: str = None,
+                     base_output_dir: str = '../output') -> str:
+    """
+    Path of an artifact file of a run.
+
+    With run_id, the run's catalog entry is used, falling back to
+    <base_output_dir>/<run_id>/<filename> for runs not in the catalog. Without
+    it, the newest cataloged run (of driver, if given) that has the file is used.
+
+    Raises:
+        FileNotFoundError: No such artifact
+    """
+    catalog_path = get_catalog_path(base_output_dir)
+    runs = []
+    if os.path.exists(catalog_path):
+        with RunCatalog(catalog_path) as catalog:
+            if run_id is not None:
+                run = catalog.get_run(run_id)
+                runs = [run] if run else []
+            else:
+                runs = catalog.list_runs(driver=driver)
+    for run in runs:
+        path = _artifact_in_run(run, filename)
+        if path:
+            return path
+
+    if run_id is not None:
+        path = os.path.join(base_output_dir, run_id, filename)
+        if os.path.isfile(path):
+            return path
+        raise FileNotFoundError(f"Run {run_id} has no {filename}")
+    raise FileNotFoundError(f"No cataloged run{f' of driver {driver}' if driver else ''} has {filename}")
+
+
+# ────────────────────────────────────────────────
+# Cached reading
+# ────────────────────────────────────────────────
+
+def _cache_format() -> str:
+    if importlib.util.find_spec('pyarrow') or importlib.util.find_spec('fastparquet'):
+        return 'parquet'
+    return 'pkl'
+
+
+def cache_path(csv_path: str) -> str:
+    return f"{csv_path}.{_cache_format()}"
+
+
+def parse_timeseries_csv(path: str, dtypes: Dict[str, str] = None) -> pd.DataFrame:
+    """Parse a timeseries CSV: explicit column dtypes and a datetime 'date' column."""
+    if dtypes is None:
+        dtypes = TIMESERIES_DTYPES.get(os.path.basename(path), {})
+    header = pd.read_csv(path, nrows=0).columns
+    df = pd.read_csv(path, dtype={name: dtype for name, dtype in dtypes.items() if name in header})
+    if DATE_COLUMN in df:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format='ISO8601')
+    return df
+
+
+def _read_cache(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_pickle(path)
+
+
+def _write_cache(df: pd.DataFrame, path: str, mtime_ns: int) -> None:
+    tmp_path = f"{path}.tmp"
+    if path.endswith('.parquet'):
+        df.to_parquet(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp_path, path)
+
+
+def read_timeseries(path: str, dtypes: Dict[str, str] = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a timeseries CSV, from the parsed-frame cache when it is current.
+
+    Args:
+        path: CSV path (see resolve_artifact)
+        dtypes: Column dtypes (default: TIMESERIES_DTYPES for the file name). Custom
+            dtypes bypass the caches.
+        use_cache: Read and write the memory and on-disk caches
+
+    Returns:
+        A new DataFrame with a datetime 'date' column; callers may modify it.
+    """
+    if not use_cache or dtypes is not None:
+        return parse_timeseries_csv(path, dtypes)
+
+    mtime_ns = os.stat(path).st_mtime_ns
+    key = os.path.abspath(path)
+    entry = _memory_cache.get(key)
+    if entry is not None and entry[0] == mtime_ns:
+        _memory_cache.move_to_end(key)
+        return entry[1].copy()
+
+    cached = cache_path(path)
+    df = None
+    if os.path.exists(cached) and os.stat(cached).st_mtime_ns == mtime_ns:
+        try:
+            df = _read_cache(cached)
+        except Exception as e:
+            print(f"Warning: ignoring unreadable timeseries cache {cached}: {e}")
+    if df is None:
+        df = parse_timeseries_csv(path)
+        try:
+            _write_cache(df, cached, mtime_ns)
+        except (OSError, ImportError, ValueError) as e:
+            print(f"Warning: could not write timeseries cache {cached}: {e}")
+
+    _remember(key, mtime_ns, df)
+    return df.copy()
+
+
+def _remember(key: str, mtime_ns: int, df: pd.DataFrame) -> None:
+    # Replaces any frame of an older version of the same file, then evicts least recently used frames
+    global _memory_cache_bytes
+    clear_memory_cache(key)
+    nbytes = int(df.memory_usage(deep=True).sum())
+    if nbytes > MEMORY_CACHE_MAX_BYTES:
+        return
+    _memory_cache[key] = (mtime_ns, df, nbytes)
+    _memory_cache_bytes += nbytes
+    while len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES or _memory_cache_bytes > MEMORY_CACHE_MAX_BYTES:
+        _, (_, _, evicted) = _memory_cache.popitem(last=False)
+        _memory_cache_bytes -= evicted
+
+
+def clear_memory_cache(path: str = None) -> None:
+    """Drop a CSV's frame (default: all frames) from the in-memory cache; the on-disk cache is kept."""
+    global _memory_cache_bytes
+    if path is None:
+        _memory_cache.clear()
+        _memory_cache_bytes = 0
+        return
+    entry = _memory_cache.pop(os.path.abspath(path), None)
+    if entry is not None:
+        _memory_cache_bytes -= entry[2]
+
+
+def load_run_timeseries(filename: str, run_id: str = None, driver: str = None,
+                        base_output_dir: str = '../output', **kwargs) -> pd.DataFrame:
+    """resolve_artifact() + read_timeseries()."""
+    return read_timeseries(resolve_artifact(filename, run_id, driver, base_output_dir), **kwargs)
@@ -0,0 +1,283 @@
+"""
+Liquidation cascades: seized collateral is sold into the market and moves the price.
+
+AaveSimulator.decide_liquidation returns collateral_to_take, but the simulators
+never sell it, so liquidations have no price impact. Here the liquidator
+withdraws the seized share of each liquidated LP position and sells its ETH
+into a market model. The lower price can liquidate more positions. Within each
+step this is iterated to a fixed point:
+
+    p_0 = exogenous close price
+    L_k = positions with HF(p_k) < 1                  (LiquidationIndex: binary search)
+    S_k = ETH sold by the positions in L_k, each valued when it was liquidated
+    p_{k+1} = market.price_after_sale(p_0, S_k)
+
+The liquidated set only grows and the price only falls, so the iteration stops
+after at most one round per newly crossed critical price. Each round costs
+O(log n + newly liquidated) through LiquidationIndex.crossed.
+
+Market models:
+    - ConstantProductMarket: x * y = k pool with depth_usd of USDC at the reference price
+    - DepthCurveMarket: p * exp(-sold_usd / depth_usd), a log-linear order book depth curve
+
+Run the crash windows with and without impact:
+    python -m defi_sim.cascade --positions 20000 --depth-usd 5e6
+"""
+
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Protocol, Tuple
+
+import numpy as np
+import pandas as pd
+
+from aave.aave_original import AaveSimulator
+from defi_sim.liquidation_index import LiquidationIndex
+from kernels.backend import get_backend
+from uniswap.position_book import PositionBook
+
+class MarketImpact(Protocol):
+    def price_after_sale(self, price: float, eth_sold: float) -> float:
+        """Price after selling eth_sold ETH into the market, starting at `price`."""
+        ...
+
+
+class ConstantProductMarket:
+    """
+    Constant-product (x * y = k) pool holding depth_usd USDC at the starting price.
+    Selling dx ETH moves the price to p * (x / (x + dx))^2, with x = depth_usd / p.
+    """
+
+    def __init__(self, depth_usd: float):
+        self.depth_usd = depth_usd
+
+    def price_after_sale(self, price: float, eth_sold: float) -> float:
+        eth_reserve = self.depth_usd / price
+        return price * (eth_reserve / (eth_reserve + eth_sold)) ** 2
+
+
+class DepthCurveMarket:
+    """
+    Log-linear depth curve: selling sold_usd (valued at the starting price) moves the
+    price to p * exp(-sold_usd / depth_usd). So depth_usd of sales moves it by about -63%,
+    and 1% of depth_usd by about -1%.
+    """
+
+    def __init__(self, depth_usd: float):
+        self.depth_usd = depth_usd
+
+    def price_after_sale(self, price: float, eth_sold: float) -> float:
+        return price * math.exp(-eth_sold * price / self.depth_usd)
+
+
+class CascadeResult(NamedTuple):
+    """One step of the cascade."""
+    start_price: float
+    final_price: float
+    rounds: int
+    liquidated: np.ndarray      # book columns liquidated in this step
+    eth_sold: float
+    repay_amount: float
+    collateral_to_take: float   # USDC value of the seized collateral when seized
+    price_path: List[float]     # p_0, p_1, ... until the fixed point
+
+
+class CascadeEngine:
+    """
+    Steps a position book with outstanding loans through exogenous prices with
+    liquidation feedback.
+
+    After each step the liquidated positions are reduced as Aave would leave them.
+    The loan drops by repay_amount, and the LP position loses the seized share
+    of its liquidity. A position is liquidated at most once per step, matching
+    one decide_liquidation per day in the simulators. The impact of a step does
+    not carry over to the next step's exogenous price.
+    """
+
+    def __init__(self, book: PositionBook, loans, market: MarketImpact, aave: AaveSimulator = None,
+                 sell_fraction: float = 1.0, max_rounds: int = 1000, price_tol: float = 1e-9, backend=None):
+        """
+        Args:
+            book: Positions. Copied, because liquidations shrink them.
+            loans: Outstanding loan per position (USDC)
+            market: Where the seized ETH is sold (None: no price impact)
+            aave: Lender parameters (liquidation threshold, close factor, bonus)
+            sell_fraction: Share of the seized ETH sold during the step
+            max_rounds: Safety cap on fixed-point rounds per step
+            price_tol: Stop when the price moves by less than this (relative)
+            backend: Backend name or module for valuation
+        """
+        self.book = book.copy()
+        self.aave = aave or AaveSimulator()
+        self.market = market
+        self.sell_fraction = sell_fraction
+        self.max_rounds = max_rounds
+        self.price_tol = price_tol
+        self.backend = get_backend(backend) if backend is None or isinstance(backend, str) else backend
+        self.index = LiquidationIndex(self.book, loans, self.aave)
+
+    @classmethod
+    def from_open_price(cls, book: PositionBook, open_price: float, market: MarketImpact,
+                        aave: AaveSimulator = None, **kwargs) -> "CascadeEngine":
+        """Loans of aave.borrow(value at open_price) per position, as the simulators take them."""
+        aave = aave or AaveSimulator()
+        return cls(book, book.position_value(open_price) * aave.ltv_max, market, aave, **kwargs)
+
+    @property
+    def loans(self) -> np.ndarray:
+        return self.index.loans
+
+    def _seize(self, columns: np.ndarray, price: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(repay, collateral USDC, ETH withdrawn, liquidity share withdrawn) for liquidating `columns` at `price`."""
+        sub_book = PositionBook(self.book.data[:, columns])
+        repay = self.loans[columns] * self.aave.close_factor
+        collateral = repay * (1 + self.aave.liquidation_bonus)
+        value = self.backend.position_value(sub_book, price)
+        amount_eth, _ = self.backend.position_amounts(sub_book, price)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(value > 0, np.minimum(collateral / value, 1.0), 1.0)
+        return repay, np.minimum(collateral, value), share * amount_eth, share
+
+    def step(self, price: float) -> CascadeResult:
+        """Liquidate at the exogenous `price` and iterate the sale feedback to a fixed point."""
+        start_price = current = float(price)
+        path = [start_price]
+        batches = [self.index.liquidated_at(current)]
+        seized = [self._seize(batches[0], current)]
+        eth_sold = self.sell_fraction * seized[0][2].sum()
+
+        rounds = 0
+        while self.market is not None and eth_sold > 0 and rounds < self.max_rounds:
+            new_price = self.market.price_after_sale(start_price, eth_sold)
+            rounds += 1
+            path.append(new_price)
+            new = self.index.crossed(current, new_price)
+            moved = abs(new_price - current) > self.price_tol * current
+            current = new_price
+            if not len(new):
+                break
+            batches.append(new)
+            seized.append(self._seize(new, current))
+            eth_sold += self.sell_fraction * seized[-1][2].sum()
+            if not moved:
+                break
+
+        liquidated = np.concatenate(batches)
+        repay = np.concatenate([s[0] for s in seized])
+        collateral = np.concatenate([s[1] for s in seized])
+        self._apply(liquidated, repay, np.concatenate([s[3] for s in seized]))
+        return CascadeResult(start_price, current, rounds, liquidated, float(eth_sold), float(repay.sum()),
+                             float(collateral.sum()), path)
+
+    def _apply(self, columns: np.ndarray, repay: np.ndarray, share: np.ndarray) -> None:
+        """Shrink liquidated loans and LP positions by the share seized from each, then re-index them."""
+        if not len(columns):
+            return
+        # The share was fixed at the seize price; revaluing at the (lower) final price would overshoot
+        keep = np.clip(1 - share, 0.0, 1.0)
+        # Withdrawing a share of liquidity scales the liquidity and the deposited amounts alike
+        for field in ('liquidity', 'actual_eth', 'actual_usdc'):
+            self.book.field(field)[columns] *= keep
+        if (self.book.liquidity[columns] < 0).any():
+            raise RuntimeError("Liquidation left a position with negative liquidity")
+        self.index.update_loans(columns, self.loans[columns] - repay)
+
+
+def simulate_window(book: PositionBook, price_df: pd.DataFrame, market: Optional[MarketImpact],
+                    aave: AaveSimulator = None, **kwargs) -> pd.DataFrame:
+    """
+    Borrow at the first open price of price_df, then step through its close prices.
+
+    Returns:
+        One row per day: prices, the post-cascade close, rounds, liquidations and amounts sold.
+    """
+    engine = CascadeEngine.from_open_price(book, float(price_df['open_price'].iloc[0]), market, aave, **kwargs)
+    rows = []
+    for date, open_price, close_price in zip(price_df['date'], price_df['open_price'], price_df['close_price']):
+        result = engine.step(close_price)
+        rows.append({
+            'date': date,
+            'open_price': open_price,
+            'close_price': close_price,
+            'impacted_close': result.final_price,
+            'rounds': result.rounds,
+            'liquidations': len(result.liquidated),
+            'eth_sold': result.eth_sold,
+            'repay_amount': result.repay_amount,
+            'collateral_to_take': result.collateral_to_take,
+            'outstanding_loans': float(engine.loans.sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def run_crash_cascades(output_dir_base: str = "../output/cascade", n_positions: int = None,
+                       market: MarketImpact = None, windows: Dict[str, Tuple[str, str]] = None,
+                       price_df: pd.DataFrame = None) -> Dict[str, pd.DataFrame]:
+    """
+    Driver: every crash window simulated without and with market impact,
+    one CSV per window plus summary.json.
+    """
+    import data_loader
+    from position_loader import create_position_book, N_POSITIONS
+    from defi_sim.run_catalog import hash_inputs, record_run
+    from defi_sim.run_summary import RunSummary
+
+    n_positions = n_positions or N_POSITIONS
+    market = market or DepthCurveMarket(depth_usd=5e6)
+    windows = windows or data_loader.CRASH_WINDOWS
+    price_df = data_loader.df if price_df is None else price_df
+    dates = pd.to_datetime(price_df['date']).dt.tz_localize(None)
+
+    output_dir = f"{output_dir_base}_{datetime.now().strftime('%Y%m%d_%H%M')}"
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = os.path.basename(output_dir)
+
+    book = create_position_book(n_positions)
+    results, metrics, artifacts = {}, {}, {}
+    for name, (start, end) in windows.items():
+        window = price_df[(dates >= start) & (dates <= end)].reset_index(drop=True)
+        if window.empty:
+            print(f"{name}: no prices between {start} and {end}, skipped")
+            continue
+        baseline = simulate_window(book, window, None)
+        impacted = simulate_window(book, window, market)
+        df = impacted.copy()
+        df.insert(df.columns.get_loc('liquidations'), 'liquidations_no_impact', baseline['liquidations'])
+        results[name] = df
+
+        slug = name.lower().replace(' ', '_')
+        path = os.path.join(output_dir, f"{slug}_cascade.csv")
+        df.to_csv(path, index=False)
+        artifacts[f"{slug}_csv"] = path
+        metrics[f"{slug}.liquidations_no_impact"] = int(baseline['liquidations'].sum())
+        metrics[f"{slug}.liquidations_with_impact"] = int(impacted['liquidations'].sum())
+        metrics[f"{slug}.max_rounds"] = int(impacted['rounds'].max())
+        metrics[f"{slug}.eth_sold"] = float(impacted['eth_sold'].sum())
+        metrics[f"{slug}.max_extra_drop_pct"] = float(
+            ((1 - impacted['impacted_close'] / impacted['close_price']) * 100).max())
+        print(f"{name}: liquidations {metrics[f'{slug}.liquidations_no_impact']} without impact, "
+              f"{metrics[f'{slug}.liquidations_with_impact']} with impact "
+              f"(max {metrics[f'{slug}.max_rounds']} rounds, "
+              f"max extra drop {metrics[f'{slug}.max_extra_drop_pct']:.2f}%)")
+
+    params = {'n_positions': n_positions, 'market': type(market).__name__, 'depth_usd': market.depth_usd,
+              'windows': {name: list(window) for name, window in windows.items()}}
+    artifacts['summary_json'] = RunSummary(driver='cascade', run_id=run_id, total_positions=n_positions,
+                                           metrics=metrics, params=params).write(output_dir)
+    record_run(os.path.dirname(output_dir) or '.', run_id, 'cascade', output_dir, params=params,
+               input_hashes=hash_inputs(price_df, book), summary=metrics, artifacts=artifacts)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Liquidation cascades over the crash windows")
+    parser.add_argument('--positions', type=int, default=None)
+    parser.add_argument('--depth-usd', type=float, default=5e6, help="Market depth in USDC")
+    parser.add_argument('--market', choices=('depth', 'cpmm'), default='depth')
+    args = parser.parse_args()
+
+    market_cls = ConstantProductMarket if args.market == 'cpmm' else DepthCurveMarket
+    run_crash_cascades(n_positions=args.positions, market=market_cls(args.depth_usd))
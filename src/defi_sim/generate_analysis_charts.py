@@ -13,6 +13,8 @@ from datetime import datetime
 from typing import List, Dict, Tuple
 import statistics
 
+from instrumentation import NULL_METRICS
+
 
 def load_daily_files(output_dir: str = '../output') -> Dict[str, List[Dict]]:
     """Load all daily trading CSV files from the output directory.
@@ -513,35 +515,47 @@ def generate_price_change_liquidation_correlation_chart(timeseries: Dict[str, Li
     print(f"  Interpretation: {strength.capitalize()} {direction} correlation")
 
 
-def main(output_dir: str = 'output', output_charts_dir: str = None):
+def main(output_dir: str = 'output', output_charts_dir: str = None, metrics=NULL_METRICS):
     """Main entry point for chart generation.
 
     Args:
         output_dir: Directory containing daily CSV files
         output_charts_dir: Directory to save generated charts (if None, uses current directory)
+        metrics: RunMetrics collecting load / extract / per-chart timings (see instrumentation.py)
     """
     if output_charts_dir is None:
         output_charts_dir = ''
 
     print("Loading daily trading files...")
-    daily_data = load_daily_files(output_dir)
+    with metrics.stage('load_daily_files'):
+        daily_data = load_daily_files(output_dir)
 
     if not daily_data:
         print("No daily files found in", output_dir)
         return
 
     print(f"Loaded {len(daily_data)} trading days")
+    metrics.count('load_daily_files', positions=sum(len(records) for records in daily_data.values()))
 
     print("\nExtracting timeseries data...")
-    timeseries = extract_timeseries(daily_data)
+    with metrics.stage('extract_timeseries'):
+        timeseries = extract_timeseries(daily_data)
 
     print("\nGenerating charts...")
-    generate_liquidation_chart(timeseries, os.path.join(output_charts_dir, 'liquidation_analysis.png'))
-    generate_health_factor_chart(timeseries, os.path.join(output_charts_dir, 'health_factor_analysis.png'))
-    generate_impermanent_loss_chart(timeseries, os.path.join(output_charts_dir, 'impermanent_loss_analysis.png'))
-    generate_combined_dashboard(timeseries, os.path.join(output_charts_dir, 'combined_dashboard.png'))
-    generate_price_distribution_chart(daily_data, os.path.join(output_charts_dir, 'price_distribution.png'))
-    generate_price_change_liquidation_correlation_chart(timeseries, os.path.join(output_charts_dir, 'price_change_liquidation_correlation.png'))
+    charts = [
+        (generate_liquidation_chart, timeseries, 'liquidation_analysis.png'),
+        (generate_health_factor_chart, timeseries, 'health_factor_analysis.png'),
+        (generate_impermanent_loss_chart, timeseries, 'impermanent_loss_analysis.png'),
+        (generate_combined_dashboard, timeseries, 'combined_dashboard.png'),
+        (generate_price_distribution_chart, daily_data, 'price_distribution.png'),
+        (generate_price_change_liquidation_correlation_chart, timeseries, 'price_change_liquidation_correlation.png'),
+    ]
+    for generate_chart, data, filename in charts:
+        chart_path = os.path.join(output_charts_dir, filename)
+        stage_name = 'chart:' + os.path.splitext(filename)[0]
+        with metrics.stage(stage_name):
+            generate_chart(data, chart_path)
+        metrics.count_file(stage_name, chart_path)
 
     print("\nAll charts generated successfully!")
 
@@ -0,0 +1,255 @@
+"""
+Per-stage timing instrumentation for simulation runs.
+
+A RunMetrics object records wall and CPU time for named stages (valuation,
+lender decisions, CSV formatting, disk writes, chart rendering), along with
+position and byte counters. It writes them as run_metrics.json in the run
+directory. It can also capture a cProfile or pyinstrument profile of the run.
+
+Stages are timed at day or chart granularity, never per position. When
+metrics are disabled, NULL_METRICS is used: its stage() hands back one shared
+no-op context manager, so an instrumented loop costs one attribute lookup per
+stage.
+"""
+
+import contextlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+METRICS_FILENAME = 'run_metrics.json'
+METRICS_SCHEMA_VERSION = 1
+PROFILE_MODES = ('cprofile', 'pyinstrument')
+
+# Environment overrides, e.g. DEFI_SIM_PROFILE=cprofile python simulator.py
+METRICS_ENV_VAR = 'DEFI_SIM_METRICS'
+PROFILE_ENV_VAR = 'DEFI_SIM_PROFILE'
+
+
+class _Stage:
+    """Context manager that adds its elapsed wall/CPU time to a stage record."""
+
+    __slots__ = ('record', 'wall_start', 'cpu_start')
+
+    def __init__(self, record: Dict):
+        self.record = record
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record['wall_s'] += time.perf_counter() - self.wall_start
+        self.record['cpu_s'] += time.process_time() - self.cpu_start
+        self.record['calls'] += 1
+        return False
+
+
+class RunMetrics:
+    """
+    Collects per-stage timings and counters for one run.
+
+    Usage:
+        metrics = RunMetrics(driver='simulator')
+        with metrics.stage('valuation'):
+            ...
+        metrics.count('valuation', positions=len(book))
+        metrics.write(run_base_dir)
+    """
+
+    enabled = True
+
+    def __init__(self, driver: str = None, run_id: str = None, profile: Optional[str] = None):
+        """
+        Args:
+            driver: Name of the driver producing the run (e.g. 'simulator', 'sim4')
+            run_id: Run identifier, recorded in the metrics file
+            profile: None, 'cprofile' or 'pyinstrument' to capture a profile of the run
+        """
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"profile must be one of {PROFILE_MODES}, got {profile!r}")
+        self.driver = driver
+        self.run_id = run_id
+        self.profile_mode = profile
+        self.profile_path = None
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._stages: Dict[str, Dict] = {}
+        self._caches: Dict[str, Dict] = {}
+
+    def _record(self, name: str) -> Dict:
+        record = self._stages.get(name)
+        if record is None:
+            record = {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'positions': 0, 'bytes_written': 0}
+            self._stages[name] = record
+        return record
+
+    def stage(self, name: str) -> _Stage:
+        """Return a context manager timing one pass through the named stage."""
+        return _Stage(self._record(name))
+
+    def count(self, name: str, positions: int = 0, bytes_written: int = 0) -> None:
+        """Add position / byte counters to the named stage."""
+        record = self._record(name)
+        record['positions'] += positions
+        record['bytes_written'] += bytes_written
+
+    def cache_stats(self, name: str, stats: Dict) -> None:
+        """Record a cache's counters (hits, misses, hit_rate, ...) under the cache name."""
+        self._caches[name] = dict(stats)
+
+    def count_file(self, name: str, path: str) -> None:
+        """Add the size of a file just written to the named stage."""
+        try:
+            self.count(name, bytes_written=os.path.getsize(path))
+        except OSError:
+            pass
+
+    def start_profiling(self, output_dir: str) -> None:
+        """Start capturing a profile if profiling was requested; written by stop_profiling()."""
+        self._profile_dir = output_dir
+        self._profiler = None
+        if self.profile_mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile_mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("Warning: pyinstrument not installed. Running without profile capture.")
+                print("Install with: pip install pyinstrument")
+                return
+            self._profiler = Profiler()
+            self._profiler.start()
+
+    def stop_profiling(self) -> Optional[str]:
+        """Stop the profile started by start_profiling() and write it to the run directory."""
+        profiler = getattr(self, '_profiler', None)
+        if profiler is None:
+            return None
+        self._profiler = None
+        if self.profile_mode == 'cprofile':
+            profiler.disable()
+            self.profile_path = os.path.join(self._profile_dir, 'profile.pstats')
+            profiler.dump_stats(self.profile_path)
+        else:
+            profiler.stop()
+            self.profile_path = os.path.join(self._profile_dir, 'profile.html')
+            with open(self.profile_path, 'w') as f:
+                f.write(profiler.output_html())
+        return self.profile_path
+
+    @contextlib.contextmanager
+    def profiling(self, output_dir: str):
+        """Capture a profile of the enclosed block into output_dir if profiling was requested."""
+        self.start_profiling(output_dir)
+        try:
+            yield
+        finally:
+            self.stop_profiling()
+
+    def as_dict(self) -> Dict:
+        stages = {}
+        for name, record in self._stages.items():
+            stage = dict(record)
+            stage['positions_per_s'] = (record['positions'] / record['wall_s']
+                                        if record['positions'] and record['wall_s'] > 0 else None)
+            stages[name] = stage
+        return {
+            'schema_version': METRICS_SCHEMA_VERSION,
+            'driver': self.driver,
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'total_wall_s': time.perf_counter() - self._wall_start,
+            'total_cpu_s': time.process_time() - self._cpu_start,
+            'stages': stages,
+            'caches': dict(self._caches),
+            'profile': {'mode': self.profile_mode, 'path': self.profile_path},
+        }
+
+    def write(self, output_dir: str, filename: str = METRICS_FILENAME) -> str:
+        """Write the metrics as JSON into output_dir and return the file path."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return path
+
+    def print_report(self) -> None:
+        data = self.as_dict()
+        print(f"\n===== STAGE TIMINGS ({data['total_wall_s']:.2f}s wall) =====")
+        for name, stage in sorted(data['stages'].items(), key=lambda kv: -kv[1]['wall_s']):
+            rate = f"  {stage['positions_per_s']:,.0f} pos/s" if stage['positions_per_s'] else ''
+            written = f"  {stage['bytes_written'] / 1e6:.1f} MB" if stage['bytes_written'] else ''
+            print(f"  {name:<40} wall={stage['wall_s']:8.3f}s  cpu={stage['cpu_s']:8.3f}s{rate}{written}")
+        for name, stats in data['caches'].items():
+            print(f"  cache {name:<34} hit rate={stats.get('hit_rate', 0.0):6.1%}  "
+                  f"hits={stats.get('hits', 0):,}  misses={stats.get('misses', 0):,}  "
+                  f"evictions={stats.get('evictions', 0):,}")
+
+
+class _NullMetrics:
+    """Disabled metrics: every call is a no-op."""
+
+    enabled = False
+    profile_mode = None
+    _null_stage = contextlib.nullcontext()
+
+    def stage(self, name: str):
+        return self._null_stage
+
+    def count(self, name: str, positions: int = 0, bytes_written: int = 0) -> None:
+        pass
+
+    def cache_stats(self, name: str, stats: Dict) -> None:
+        pass
+
+    def count_file(self, name: str, path: str) -> None:
+        pass
+
+    def start_profiling(self, output_dir: str) -> None:
+        pass
+
+    def stop_profiling(self) -> None:
+        return None
+
+    def profiling(self, output_dir: str):
+        return self._null_stage
+
+    def as_dict(self) -> Dict:
+        return {}
+
+    def write(self, output_dir: str, filename: str = METRICS_FILENAME) -> None:
+        return None
+
+    def print_report(self) -> None:
+        pass
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def create_run_metrics(driver: str, run_id: str = None, enabled: bool = None, profile: str = None):
+    """Build the metrics collector for a run.
+
+    Args:
+        driver: Name of the driver producing the run
+        run_id: Run identifier
+        enabled: Collect stage timings (default: on, unless DEFI_SIM_METRICS=0)
+        profile: 'cprofile' / 'pyinstrument' capture mode (default: DEFI_SIM_PROFILE or off)
+
+    Returns:
+        RunMetrics, or NULL_METRICS when disabled
+    """
+    if enabled is None:
+        enabled = os.environ.get(METRICS_ENV_VAR, '1') not in ('0', 'false', 'no', '')
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV_VAR) or None
+    if not enabled and profile is None:
+        return NULL_METRICS
+    return RunMetrics(driver=driver, run_id=run_id, profile=profile)
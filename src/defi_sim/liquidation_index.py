@@ -0,0 +1,201 @@
+"""
+Price-sorted liquidation index: O(log n) "how many liquidate at price X" queries.
+
+With its loan fixed, a position's health factor (AaveSimulator rule:
+value * liquidation_threshold / loan) is non-decreasing in the ETH price,
+because a Uniswap v3 position's value is. So every position has a critical
+price below which it is liquidated (HF < 1), and
+PositionBook.price_for_value gives it exactly.
+
+The index stores the critical prices of the whole book, sorted, together with
+cumulative loan totals in the same order. After that:
+    - count_liquidated(x)      one binary search
+    - liquidated_at(x)         a slice of the sort order
+    - liquidation_curve(xs)    one vectorized binary search for any number of prices
+    - shock_table(p, shocks)   the what-if table of the stress tests, with no revaluation
+
+Usage:
+    index = LiquidationIndex.from_open_price(book, open_price)
+    index.count_liquidated(open_price * 0.8)
+    index.shock_table(open_price, SHOCK_LEVELS_PCT)
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from aave.aave_original import AaveSimulator
+from uniswap.position_book import PositionBook
+
+
+def critical_prices(book: PositionBook, loans, liquidation_threshold: float, health_factor: float = 1.0,
+                    shock_pct: float = 0.0) -> np.ndarray:
+    """
+    Price below which each position's HF at price * (1 + shock_pct / 100) is under health_factor.
+
+    Positions without a loan never cross (critical price 0). If the shock takes
+    every price to zero or below, the simulators project HF 0, so every loan
+    crosses (+inf).
+    """
+    loans = np.broadcast_to(np.asarray(loans, dtype=np.float64), (len(book),))
+    factor = 1 + shock_pct / 100
+    if factor <= 0:
+        return np.where(loans > 0, np.inf, 0.0)
+    # HF < h  <=>  value < h * loan / liquidation_threshold
+    target = np.where(loans > 0, health_factor * loans / liquidation_threshold, 0.0)
+    return book.price_for_value(target) / factor
+
+
+class LiquidationIndex:
+    """
+    Sorted critical prices of a position book for one HF threshold.
+
+    A position is below the threshold at price p exactly when p < its critical
+    price. This matches the AaveSimulator rule up to floating-point rounding
+    right at the critical price.
+    """
+
+    def __init__(self, book: PositionBook, loans, aave: AaveSimulator = None, health_factor: float = 1.0,
+                 shock_pct: float = 0.0):
+        """
+        Args:
+            book: Positions
+            loans: Outstanding loan per position (USDC)
+            aave: Lender parameters (liquidation threshold, close factor, bonus)
+            health_factor: Threshold the index tracks (1.0 = liquidation)
+            shock_pct: Evaluate the HF at a shocked price, e.g. -15 for the worst
+                point of the stress grid
+        """
+        self.book = book
+        self.aave = aave or AaveSimulator()
+        self.health_factor = health_factor
+        self.shock_pct = shock_pct
+        self.loans = np.array(np.broadcast_to(np.asarray(loans, dtype=np.float64), (len(book),)))
+        self._build(critical_prices(book, self.loans, self.aave.liquidation_threshold, health_factor, shock_pct))
+
+    @classmethod
+    def from_open_price(cls, book: PositionBook, open_price: float, aave: AaveSimulator = None,
+                        **kwargs) -> "LiquidationIndex":
+        """Index loans of aave.borrow(value at open_price), as the simulators take them."""
+        aave = aave or AaveSimulator()
+        return cls(book, book.position_value(open_price) * aave.ltv_max, aave, **kwargs)
+
+    def _build(self, critical: np.ndarray) -> None:
+        self.critical_prices = critical
+        self.order = np.argsort(critical, kind='stable')
+        self.sorted_prices = critical[self.order]
+        self._sorted_loans = self.loans[self.order]
+        self._update_suffix()
+
+    def _update_suffix(self) -> None:
+        # Loans of the positions above sorted position k: suffix sums in sort order
+        self._loan_suffix = np.concatenate([np.cumsum(self._sorted_loans[::-1])[::-1], [0.0]])
+
+    def update_loans(self, indices, loans) -> None:
+        """
+        Change some positions' loans and move them to their new place in the
+        index. Only their critical prices are recomputed and sorted; the rest of
+        the sort order is kept, so an update costs O(n + k log k) for k positions
+        (a full re-sort once k is a large share of the book).
+        """
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        self.loans[indices] = loans
+        indices = np.unique(indices)
+        sub_book = PositionBook(self.book.data[:, indices])
+        critical = critical_prices(sub_book, self.loans[indices], self.aave.liquidation_threshold,
+                                   self.health_factor, self.shock_pct)
+        self.critical_prices[indices] = critical
+        if 4 * len(indices) > len(self.critical_prices):
+            self._build(self.critical_prices)
+            return
+
+        # Drop the changed positions from the sorted arrays, then insert them at their new places
+        changed = np.zeros(len(self.critical_prices), dtype=bool)
+        changed[indices] = True
+        kept = ~changed[self.order]
+        order, prices, sorted_loans = self.order[kept], self.sorted_prices[kept], self._sorted_loans[kept]
+        new_order = np.argsort(critical, kind='stable')
+        critical = critical[new_order]
+        at = np.searchsorted(prices, critical, side='right')
+        self.order = np.insert(order, at, indices[new_order])
+        self.sorted_prices = np.insert(prices, at, critical)
+        self._sorted_loans = np.insert(sorted_loans, at, self.loans[indices[new_order]])
+        self._update_suffix()
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    # ────────────────────────────────────────────────
+    # Queries
+    # ────────────────────────────────────────────────
+
+    def _first_below(self, price):
+        """Sort position of the first critical price above `price` (everything from there on is below threshold)."""
+        return np.searchsorted(self.sorted_prices, price, side='right')
+
+    def count_liquidated(self, price):
+        """Positions below the threshold at `price` (scalar or array of prices)."""
+        return len(self) - self._first_below(price)
+
+    def liquidated_at(self, price: float) -> np.ndarray:
+        """Book columns of the positions below the threshold at `price`."""
+        return self.order[self._first_below(price):]
+
+    def crossed(self, old_price: float, new_price: float) -> np.ndarray:
+        """Book columns whose state differs between the two prices (critical price in (low, high])."""
+        low, high = min(old_price, new_price), max(old_price, new_price)
+        return self.order[self._first_below(low):self._first_below(high)]
+
+    def debt_at_risk(self, price):
+        """Total loans of the positions below the threshold at `price` (scalar or array)."""
+        return self._loan_suffix[self._first_below(price)]
+
+    def liquidation_curve(self, prices) -> pd.DataFrame:
+        """Positions and debt below the threshold at each price, for plotting liquidation curves."""
+        prices = np.asarray(prices, dtype=np.float64)
+        first = self._first_below(prices)
+        count = len(self) - first
+        return pd.DataFrame({
+            'price': prices,
+            'positions_liquidated': count,
+            'share_liquidated': count / len(self) if len(self) else 0.0,
+            'debt_at_risk': self._loan_suffix[first],
+        })
+
+    def shock_table(self, open_price: float, shocks_pct, close_factor: Optional[float] = None) -> pd.DataFrame:
+        """
+        What-if table: for each shock, the liquidation count, the debt at risk and
+        what decide_liquidation would repay and seize for those positions.
+        """
+        shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+        close_factor = self.aave.close_factor if close_factor is None else close_factor
+        table = self.liquidation_curve(open_price * (1 + shocks_pct / 100))
+        table.insert(0, 'shock_pct', shocks_pct)
+        table['repay_amount'] = table['debt_at_risk'] * close_factor
+        table['collateral_to_take'] = table['repay_amount'] * (1 + self.aave.liquidation_bonus)
+        return table
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from position_loader import create_position_book
+
+    parser = argparse.ArgumentParser(description="Liquidation what-if table from the sorted critical-price index")
+    parser.add_argument('--positions', type=int, default=100_000)
+    parser.add_argument('--open-price', type=float, default=2500.0)
+    args = parser.parse_args()
+
+    random.seed(42)
+    book = create_position_book(args.positions)
+    t0 = time.perf_counter()
+    index = LiquidationIndex.from_open_price(book, args.open_price)
+    built = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    table = index.shock_table(args.open_price, np.arange(-50, 55, 5))
+    queried = time.perf_counter() - t0
+    print(table.to_string(index=False))
+    print(f"Index over {len(index)} positions built in {built:.3f}s; table in {queried * 1e3:.2f} ms")
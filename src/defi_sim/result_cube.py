@@ -0,0 +1,270 @@
+"""
+Memory-mapped (days x positions x fields) result cube for post-hoc analysis.
+
+The simulator can write per-position, per-day health factor, impermanent loss
+and liquidation flags into one fixed-layout file next to the daily CSVs.
+Queries then touch only the slice they need: one day's row, a day range, or
+one position's column over all days. The CSVs would need every file scanned.
+
+Planes are stored position-major, so one position's history is one contiguous
+read. The writer buffers a block of days and writes it once per block instead
+of a strided column per day.
+
+File layout (little-endian):
+    8 bytes   magic b'DSIMCUBE'
+    4 bytes   format version
+    4 bytes   JSON header length
+    JSON      {n_days, n_positions, dates, id_prefix | position_ids, fields: [{name, dtype, offset}]}
+    planes    one C-order (n_positions, n_days) array per field, 64-byte aligned
+
+Usage:
+    cube = ResultCube.open(os.path.join(run_base_dir, RESULT_CUBE_FILENAME))
+    hf = cube.position_series('health_factor', 'id#4821')
+    streaks = cube.liquidation_streaks('id#4821')
+"""
+
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RESULT_CUBE_FILENAME = 'results.cube'
+CUBE_VERSION = 2
+
+# Memory for the writer's block of buffered days, all fields together
+WRITE_BUFFER_BYTES = 128 * 1024 * 1024
+
+# (field name, dtype) planes stored in every cube
+CUBE_FIELDS = (
+    ('health_factor', '<f4'),
+    ('impermanent_loss', '<f4'),
+    ('liquidated', '|u1'),
+)
+
+_MAGIC = b'DSIMCUBE'
+_PREFIX = struct.Struct('<8sII')
+_ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _ids_header(position_ids: Sequence[str], id_prefix: str = "id#") -> Dict:
+    """Store generated ids (id_prefix + index) as just the prefix."""
+    if all(pid == f"{id_prefix}{i}" for i, pid in enumerate(position_ids)):
+        return {'id_prefix': id_prefix}
+    return {'position_ids': list(position_ids)}
+
+
+class ResultCubeWriter:
+    """
+    Creates a cube file and fills it one trading day at a time.
+
+    The file is allocated at full size up front (sparse where supported) and
+    written through a memory map. Days are collected in a block buffer, and
+    each block is written into the position-major planes when a day outside it
+    arrives or on close(). Only the days actually written are stored.
+    """
+
+    def __init__(self, path: str, dates: Sequence, position_ids: Sequence[str],
+                 buffer_bytes: int = WRITE_BUFFER_BYTES):
+        """
+        Args:
+            path: Output file path.
+            dates: One entry per simulated day (anything str()-able, e.g. Timestamps).
+            position_ids: Position ids in column order.
+            buffer_bytes: Memory for buffered days (sets the block length)
+        """
+        self.path = path
+        self.n_days = len(dates)
+        self.n_positions = len(position_ids)
+
+        header = {
+            'n_days': self.n_days,
+            'n_positions': self.n_positions,
+            'dates': [str(d) for d in dates],
+            **_ids_header(position_ids),
+        }
+        # Offsets depend on the header length; reserve room for them before encoding
+        fields = [{'name': name, 'dtype': dtype, 'offset': 0} for name, dtype in CUBE_FIELDS]
+        header['fields'] = fields
+        reserved = len(json.dumps(header).encode()) + 32 * len(fields)
+        offset = _align(_PREFIX.size + reserved)
+        for field in fields:
+            field['offset'] = offset
+            offset = _align(offset + np.dtype(field['dtype']).itemsize * self.n_days * self.n_positions)
+        encoded = json.dumps(header).encode().ljust(reserved)
+        total_size = offset
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_PREFIX.pack(_MAGIC, CUBE_VERSION, len(encoded)))
+            f.write(encoded)
+            f.truncate(total_size)
+
+        self._planes = {
+            field['name']: np.memmap(path, dtype=field['dtype'], mode='r+', offset=field['offset'],
+                                     shape=(self.n_positions, self.n_days))
+            for field in fields
+        } if self.n_days and self.n_positions else {}
+
+        day_bytes = max(sum(np.dtype(dtype).itemsize for _, dtype in CUBE_FIELDS) * self.n_positions, 1)
+        self.block_days = int(np.clip(buffer_bytes // day_bytes, 1, max(self.n_days, 1)))
+        self._buffers = {name: np.zeros((self.block_days, self.n_positions), dtype=dtype)
+                         for name, dtype in CUBE_FIELDS}
+        self._block_start = None
+        self._written = np.zeros(self.block_days, dtype=bool)
+
+    def write_day(self, day_index: int, health_factor, impermanent_loss, liquidated) -> None:
+        """Store one day's per-position results (arrays or sequences in column order)."""
+        if not 0 <= day_index < self.n_days:
+            raise IndexError(f"Day {day_index} outside the cube's {self.n_days} days")
+        if self._block_start is None or not 0 <= day_index - self._block_start < self.block_days:
+            self._flush_block()
+            self._block_start = day_index
+        row = day_index - self._block_start
+        self._buffers['health_factor'][row] = health_factor
+        self._buffers['impermanent_loss'][row] = impermanent_loss
+        self._buffers['liquidated'][row] = liquidated
+        self._written[row] = True
+
+    def _flush_block(self) -> None:
+        # Write each run of buffered days as one (n_positions, run) block per plane
+        if self._block_start is None:
+            return
+        edges = np.diff(np.concatenate(([0], self._written.astype(np.int8), [0])))
+        for first, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            days = slice(self._block_start + first, self._block_start + stop)
+            for name, plane in self._planes.items():
+                plane[:, days] = self._buffers[name][first:stop].T
+        self._written[:] = False
+        self._block_start = None
+
+    def close(self) -> None:
+        self._flush_block()
+        for plane in self._planes.values():
+            plane.flush()
+        self._planes = {}
+        self._buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ResultCube:
+    """Read-only access to a cube file; every accessor returns a view or a small copy of the slice asked for."""
+
+    def __init__(self, path: str, header: Dict, planes: Dict[str, np.ndarray]):
+        """planes: (n_positions, n_days) arrays (memory maps)."""
+        self.path = path
+        self.header = header
+        self.n_days = header['n_days']
+        self.n_positions = header['n_positions']
+        self.dates: List[str] = header['dates']
+        self._sorted_dates = np.asarray(self.dates, dtype=str)
+        self._planes = planes
+        self._id_prefix = header.get('id_prefix')
+        self._ids = header.get('position_ids')
+        self._id_index = None
+
+    @classmethod
+    def open(cls, path: str) -> "ResultCube":
+        with open(path, 'rb') as f:
+            magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a result cube")
+            if version != CUBE_VERSION:
+                raise ValueError(f"Unsupported result cube version {version} in {path}")
+            header = json.loads(f.read(header_len).decode())
+        shape = (header['n_positions'], header['n_days'])
+        planes = {}
+        for field in header['fields']:
+            if not header['n_days'] or not header['n_positions']:
+                planes[field['name']] = np.zeros(shape, dtype=field['dtype'])
+            else:
+                planes[field['name']] = np.memmap(path, dtype=field['dtype'], mode='r', offset=field['offset'],
+                                                  shape=shape)
+        return cls(path, header, planes)
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self._planes)
+
+    @property
+    def position_ids(self) -> List[str]:
+        if self._ids is not None:
+            return list(self._ids)
+        return [f"{self._id_prefix}{i}" for i in range(self.n_positions)]
+
+    def position_index(self, position) -> int:
+        """Column index for a position id (str) or index (int)."""
+        if isinstance(position, (int, np.integer)):
+            return int(position)
+        if self._ids is None:
+            suffix = position[len(self._id_prefix):]
+            if position.startswith(self._id_prefix) and suffix.isdigit() and int(suffix) < self.n_positions:
+                return int(suffix)
+            raise KeyError(position)
+        if self._id_index is None:
+            self._id_index = {pid: i for i, pid in enumerate(self._ids)}
+        return self._id_index[position]
+
+    def day_index(self, date) -> int:
+        """Index of the first stored day whose date string starts with str(date) (e.g. '2022-11-09')."""
+        # Dates are stored in order as ISO strings, so string order is date order
+        prefix = str(date)
+        i = int(np.searchsorted(self._sorted_dates, prefix, side='left'))
+        if i < self.n_days and self.dates[i].startswith(prefix):
+            return i
+        raise KeyError(date)
+
+    def field(self, name: str) -> np.ndarray:
+        """The full plane as (n_days, n_positions), memory-mapped (nothing is read until sliced)."""
+        return self._planes[name].T
+
+    def day_slice(self, name: str, start: int, stop: Optional[int] = None) -> np.ndarray:
+        """Rows [start, stop) of a field: (days, n_positions)."""
+        stop = start + 1 if stop is None else stop
+        return self._planes[name][:, start:stop].T
+
+    def position_series(self, name: str, position, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """One position's values of a field over days [start, stop), a contiguous read."""
+        return np.asarray(self._planes[name][self.position_index(position), start:stop])
+
+    def liquidation_streaks(self, position, start: int = 0, stop: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Runs of consecutive liquidation days for one position.
+
+        Returns:
+            List of (first_day_index, length) tuples.
+        """
+        flags = self.position_series('liquidated', position, start, stop).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], flags, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return [(int(s) + start, int(e - s)) for s, e in zip(starts, ends)]
+
+    def liquidations_per_day(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Number of liquidated positions on each day in [start, stop)."""
+        return self._planes['liquidated'][:, start:stop].sum(axis=0, dtype=np.int64)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python result_cube.py <results.cube> [position_id]
+    cube = ResultCube.open(sys.argv[1])
+    print(f"{cube.path}: {cube.n_days} days x {cube.n_positions} positions, fields {cube.fields}")
+    if len(sys.argv) > 2:
+        pid = sys.argv[2]
+        streaks = cube.liquidation_streaks(pid)
+        longest = max(streaks, key=lambda s: s[1]) if streaks else None
+        print(f"{pid}: {len(streaks)} liquidation streaks, longest {longest[1] if longest else 0} days"
+              + (f" from {cube.dates[longest[0]]}" if longest else ""))
@@ -0,0 +1,435 @@
+"""
+SQLite catalog of simulation runs.
+
+Every driver records its run here on completion: parameters, input hashes,
+summary metrics, stage timings and artifact paths, one row per run in
+<output>/runs.sqlite. Finding, listing and comparing runs is then one indexed
+query instead of a scan over hundreds of run directories and their summary files.
+Runs produced before the catalog existed can be added with backfill().
+
+CLI:
+    python run_catalog.py list [--driver sim4] [--param n_positions=500] [--limit 20]
+    python run_catalog.py show RUN_ID
+    python run_catalog.py diff RUN_A RUN_B
+    python run_catalog.py backfill
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+CATALOG_FILENAME = 'runs.sqlite'
+CATALOG_SCHEMA_VERSION = 1
+
+# Seconds a connection waits on another writer (sweep workers record concurrently)
+DEFAULT_TIMEOUT_S = 30.0
+
+# Sections stored as JSON columns, in display order
+SECTIONS = ('params', 'input_hashes', 'summary', 'timing', 'artifacts')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       TEXT PRIMARY KEY,
+    driver       TEXT,
+    run_dir      TEXT,
+    created_at   TEXT,
+    recorded_at  TEXT,
+    status       TEXT,
+    params       TEXT,
+    input_hashes TEXT,
+    summary      TEXT,
+    timing       TEXT,
+    artifacts    TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_driver_created ON runs (driver, created_at);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+"""
+
+
+def get_catalog_path(base_output_dir: str = '../output') -> str:
+    return os.path.join(base_output_dir, CATALOG_FILENAME)
+
+
+# ────────────────────────────────────────────────
+# Input hashing
+# ────────────────────────────────────────────────
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_inputs(price_df=None, positions=None) -> Dict[str, str]:
+    """
+    Content hashes of a run's inputs, so runs on identical data can be matched.
+
+    Args:
+        price_df: Price frame used by the run
+        positions: UniswapV3Position objects (list or dict) or a PositionBook
+    """
+    hashes = {}
+    if price_df is not None:
+        import pandas as pd
+        hashes['price_data'] = hash_bytes(pd.util.hash_pandas_object(price_df, index=True).values.tobytes())
+    if positions is not None:
+        from uniswap.position_book import PositionBook
+        book = positions if isinstance(positions, PositionBook) else PositionBook.from_positions(positions)
+        data = book.data.tobytes()
+        if book.pool_index is not None:
+            data += book.pool_index.tobytes()
+        hashes['positions'] = hash_bytes(data)
+    return hashes
+
+
+def _jsonable(value):
+    """Convert numpy scalars (and other non-JSON values) in summaries to plain Python."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, 'item') and callable(value.item):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(_jsonable(value or {}), sort_keys=True)
+
+
+def timing_from_metrics(metrics_dict: Dict) -> Dict:
+    """Condense RunMetrics.as_dict() (or a run_metrics.json) into total and per-stage wall times."""
+    if not metrics_dict:
+        return {}
+    timing = {'total_wall_s': metrics_dict.get('total_wall_s'), 'total_cpu_s': metrics_dict.get('total_cpu_s')}
+    for name, stage in metrics_dict.get('stages', {}).items():
+        timing[f"stage:{name}"] = stage.get('wall_s')
+    return timing
+
+
+# ────────────────────────────────────────────────
+# Catalog
+# ────────────────────────────────────────────────
+
+class RunCatalog:
+    """
+    Usage:
+        catalog = RunCatalog(get_catalog_path(base_output_dir))
+        catalog.record_run(run_id, 'simulator', run_dir, params={...}, summary={...})
+        for run in catalog.list_runs(driver='sim4', params={'n_positions': 500}):
+            ...
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_TIMEOUT_S):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {CATALOG_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def record_run(self, run_id: str, driver: str, run_dir: str, params: Dict = None,
+                   input_hashes: Dict = None, summary: Dict = None, timing: Dict = None,
+                   artifacts: Dict = None, status: str = 'completed', created_at: str = None) -> None:
+        """Insert or replace the catalog row for a run."""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, driver, run_dir, created_at, recorded_at, status, "
+                "params, input_hashes, summary, timing, artifacts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, driver, os.path.abspath(run_dir) if run_dir else None, created_at or now, now, status,
+                 _dumps(params), _dumps(input_hashes), _dumps(summary), _dumps(timing), _dumps(artifacts)))
+
+    def update_run(self, run_id: str, **sections: Dict) -> None:
+        """Merge keys into JSON sections of an existing run, e.g. update_run(run_id, artifacts={...})."""
+        run = self.get_run(run_id)
+        if run is None:
+            raise KeyError(run_id)
+        with self._conn:
+            for section, values in sections.items():
+                if section not in SECTIONS:
+                    raise ValueError(f"Unknown section {section!r}; choose from {SECTIONS}")
+                merged = {**run[section], **_jsonable(values)}
+                self._conn.execute(f"UPDATE runs SET {section} = ? WHERE run_id = ?", (_dumps(merged), run_id))
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        run = dict(row)
+        for section in SECTIONS:
+            run[section] = json.loads(run[section]) if run[section] else {}
+        return run
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def has_run(self, run_id: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is not None
+
+    def list_runs(self, driver: str = None, params: Dict = None, status: str = None,
+                  limit: int = None, sweep_tasks: bool = True) -> List[Dict]:
+        """
+        Runs matching the filters, newest first.
+
+        Args:
+            driver: Only runs from this driver
+            params: {name: value} that must all equal the run's recorded parameters
+            status: Only runs with this status
+            limit: Maximum number of runs
+            sweep_tasks: Include runs executed as sweep tasks (params.sweep_id set, see work_queue.py)
+        """
+        clauses, args = [], []
+        if not sweep_tasks:
+            clauses.append("json_extract(params, '$.sweep_id') IS NULL")
+        if driver is not None:
+            clauses.append("driver = ?")
+            args.append(driver)
+        if status is not None:
+            clauses.append("status = ?")
+            args.append(status)
+        for name, value in (params or {}).items():
+            clauses.append("json_extract(params, ?) = ?")
+            args.extend([f'$."{name}"', value])
+        sql = "SELECT * FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, run_id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [self._row_to_dict(row) for row in self._conn.execute(sql, args)]
+
+    def latest_run_id(self, driver: str = None, sweep_tasks: bool = False) -> Optional[str]:
+        """Newest run's id; runs that were sweep tasks are skipped unless sweep_tasks is set."""
+        runs = self.list_runs(driver=driver, limit=1, sweep_tasks=sweep_tasks)
+        return runs[0]['run_id'] if runs else None
+
+    def diff_runs(self, run_a: str, run_b: str, sections=SECTIONS) -> List[Dict]:
+        """
+        Keys whose values differ between two runs.
+
+        Returns:
+            List of {section, key, a, b, delta} dicts (delta only for numeric pairs).
+        """
+        a, b = self.get_run(run_a), self.get_run(run_b)
+        for run_id, run in ((run_a, a), (run_b, b)):
+            if run is None:
+                raise KeyError(run_id)
+        rows = []
+        for section in sections:
+            for key in sorted(set(a[section]) | set(b[section])):
+                va, vb = a[section].get(key), b[section].get(key)
+                if va == vb:
+                    continue
+                numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (va, vb))
+                rows.append({'section': section, 'key': key, 'a': va, 'b': vb,
+                             'delta': vb - va if numeric else None})
+        return rows
+
+    # ────────────────────────────────────────────────
+    # Backfill from existing run directories
+    # ────────────────────────────────────────────────
+
+    def backfill(self, base_output_dir: str, overwrite: bool = False) -> List[str]:
+        """
+        Catalog run directories under base_output_dir that have no row yet.
+
+        Summaries come from summary.json, or summary.txt (key: value lines) for
+        older runs, timings from run_metrics.json, and the driver from
+        run_metrics.json or the artifacts present.
+
+        Returns:
+            Run ids added.
+        """
+        added = []
+        for name in sorted(os.listdir(base_output_dir)):
+            run_dir = os.path.join(base_output_dir, name)
+            if not os.path.isdir(run_dir) or (not overwrite and self.has_run(name)):
+                continue
+            run = describe_run_dir(run_dir)
+            if run is None:
+                continue
+            self.record_run(name, run_dir=run_dir, **run)
+            added.append(name)
+        return added
+
+
+def parse_summary_txt(path: str) -> Dict:
+    """Parse a `key: value` summary file, converting numeric values."""
+    summary = {}
+    with open(path) as f:
+        for line in f:
+            if ':' not in line or line.startswith('='):
+                continue
+            key, value = (part.strip() for part in line.split(':', 1))
+            for cast in (int, float):
+                try:
+                    value = cast(value)
+                    break
+                except ValueError:
+                    continue
+            summary[key.lower().replace(' ', '_').replace('%', 'pct')] = value
+    return summary
+
+
+def _created_at(run_dir: str) -> str:
+    # Run ids end in a timestamp (run_YYYYMMDD_HHMMSS, tradefi_adjusted_YYYYMMDD_HHMM)
+    parts = os.path.basename(run_dir).split('_')
+    for fmt in ('%Y%m%d_%H%M', '%Y%m%d_%H%M%S'):
+        try:
+            return datetime.strptime('_'.join(parts[-2:]), fmt).isoformat(timespec='seconds')
+        except ValueError:
+            continue
+    return datetime.fromtimestamp(os.path.getmtime(run_dir)).isoformat(timespec='seconds')
+
+
+def describe_run_dir(run_dir: str) -> Optional[Dict]:
+    """Build record_run() keyword arguments from the files in a run directory (None if it is not a run)."""
+    entries = set(os.listdir(run_dir))
+    metrics = {}
+    if 'run_metrics.json' in entries:
+        with open(os.path.join(run_dir, 'run_metrics.json')) as f:
+            metrics = json.load(f)
+
+    if metrics.get('driver'):
+        driver = metrics['driver']
+    elif 'hybrid_adjusted_timeseries.csv' in entries and 'liquidation_timeseries.csv' in entries:
+        driver = 'charts'
+    elif 'hybrid_adjusted_timeseries.csv' in entries:
+        driver = 'sim4'
+    elif 'daily_records' in entries or 'liquidation_timeseries.csv' in entries:
+        driver = 'simulator'
+    else:
+        return None
+
+    summary = {}
+    if 'summary.json' in entries:
+        with open(os.path.join(run_dir, 'summary.json')) as f:
+            typed = json.load(f)
+        summary = {k: v for k, v in typed.items()
+                   if k not in ('driver', 'run_id', 'metrics', 'params', 'created_at', 'schema_version')}
+        summary.update(typed.get('metrics', {}))
+    elif 'summary.txt' in entries:
+        summary = parse_summary_txt(os.path.join(run_dir, 'summary.txt'))
+    elif 'liquidation_timeseries.csv' in entries:
+        import csv
+        with open(os.path.join(run_dir, 'liquidation_timeseries.csv'), newline='') as f:
+            rows = list(csv.DictReader(f))
+        summary = {'total_dates': len(rows),
+                   'total_liquidations_all': sum(int(r['number_of_liquidations']) for r in rows)}
+
+    artifacts = {entry: os.path.abspath(os.path.join(run_dir, entry)) for entry in sorted(entries)}
+    return {
+        'driver': driver,
+        'summary': summary,
+        'timing': timing_from_metrics(metrics),
+        'artifacts': artifacts,
+        'status': 'backfilled',
+        'created_at': _created_at(run_dir),
+    }
+
+
+def record_run(base_output_dir: str, run_id: str, driver: str, run_dir: str, **kwargs) -> Optional[str]:
+    """
+    Record a finished run in the catalog under base_output_dir. A catalog
+    failure is reported but never fails the run itself.
+
+    Returns:
+        Catalog path, or None if recording failed.
+    """
+    path = get_catalog_path(base_output_dir)
+    try:
+        with RunCatalog(path) as catalog:
+            catalog.record_run(run_id, driver, run_dir, **kwargs)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: could not record run {run_id} in {path}: {e}")
+        return None
+    return path
+
+
+# ────────────────────────────────────────────────
+# CLI
+# ────────────────────────────────────────────────
+
+def _parse_param(text: str):
+    name, _, value = text.partition('=')
+    for cast in (int, float):
+        try:
+            return name, cast(value)
+        except ValueError:
+            continue
+    return name, value
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Query the simulation run catalog")
+    parser.add_argument('--output-dir', default='../output', help="Base output directory holding runs.sqlite")
+    parser.add_argument('--catalog', help="Catalog path (default: <output-dir>/runs.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_cmd = commands.add_parser('list', help="List runs, newest first")
+    list_cmd.add_argument('--driver')
+    list_cmd.add_argument('--param', action='append', default=[], metavar='NAME=VALUE')
+    list_cmd.add_argument('--limit', type=int)
+
+    show_cmd = commands.add_parser('show', help="Show everything recorded for a run")
+    show_cmd.add_argument('run_id')
+
+    diff_cmd = commands.add_parser('diff', help="Show recorded values that differ between two runs")
+    diff_cmd.add_argument('run_a')
+    diff_cmd.add_argument('run_b')
+
+    backfill_cmd = commands.add_parser('backfill', help="Catalog existing run directories")
+    backfill_cmd.add_argument('--overwrite', action='store_true')
+
+    args = parser.parse_args(argv)
+    with RunCatalog(args.catalog or get_catalog_path(args.output_dir)) as catalog:
+        if args.command == 'list':
+            runs = catalog.list_runs(driver=args.driver, params=dict(map(_parse_param, args.param)),
+                                     limit=args.limit)
+            print(f"{'run_id':<36} {'driver':<10} {'created_at':<20} {'liquidations':>12} {'wall_s':>9}")
+            for run in runs:
+                liquidations = run['summary'].get('total_liquidations_all', '')
+                wall = run['timing'].get('total_wall_s')
+                print(f"{run['run_id']:<36} {run['driver'] or '':<10} {run['created_at'] or '':<20} "
+                      f"{liquidations:>12} {f'{wall:.1f}' if wall is not None else '':>9}")
+        elif args.command == 'show':
+            run = catalog.get_run(args.run_id)
+            if run is None:
+                raise SystemExit(f"Unknown run {args.run_id}")
+            print(json.dumps(run, indent=2))
+        elif args.command == 'diff':
+            for row in catalog.diff_runs(args.run_a, args.run_b):
+                delta = f"  ({row['delta']:+g})" if row['delta'] is not None else ''
+                print(f"{row['section']:<13} {row['key']:<40} {row['a']!s:>20} -> {row['b']!s:<20}{delta}")
+        elif args.command == 'backfill':
+            added = catalog.backfill(args.output_dir, overwrite=args.overwrite)
+            print(f"Added {len(added)} runs to {catalog.path}")
+            for run_id in added:
+                print(f"  {run_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ Run manager for managing simulation output directories and run IDs.
 import os
 from datetime import datetime
 
+from run_catalog import RunCatalog, get_catalog_path
+
 
 def generate_run_id():
     """Generate a unique run ID based on current timestamp.
@@ -57,6 +59,11 @@ def get_timeseries_csv_path(run_base_dir: str):
 def get_latest_run_id(base_output_dir: str = 'output'):
     """Get the most recent run ID from the output directory.
 
+    Looked up in the run catalog (runs.sqlite) as the newest simulator run,
+    ignoring runs executed as sweep tasks. Only when there is no catalog are
+    the run_* directories scanned; runs written before the catalog existed
+    can be added with `run_catalog.py backfill`.
+
     Args:
         base_output_dir: Base output directory
 
@@ -66,14 +73,15 @@ def get_latest_run_id(base_output_dir: str = 'output'):
     if not os.path.exists(base_output_dir):
         return None
 
+    catalog_path = get_catalog_path(base_output_dir)
+    if os.path.exists(catalog_path):
+        with RunCatalog(catalog_path) as catalog:
+            return catalog.latest_run_id(driver='simulator')
+
     run_dirs = [d for d in os.listdir(base_output_dir)
                 if os.path.isdir(os.path.join(base_output_dir, d))
                 and d.startswith('run_')]
-
-    if not run_dirs:
-        return None
-
-    return sorted(run_dirs)[-1]
+    return sorted(run_dirs)[-1] if run_dirs else None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+"""
+Typed, versioned run summaries (summary.json) and a cross-run loader.
+
+Every driver (simulator.run_simulation, sim4, hybrid_stress_sim, charts.py)
+writes a summary.json next to its other artifacts. The fields shared by all
+simulators are typed columns. Driver-specific statistics go under `metrics`
+and run parameters under `params`. Non-finite floats are stored as null so the
+file is strict JSON.
+
+load_summaries() reads any number of these files into one DataFrame with one
+row per run, e.g. for comparing a parameter sweep:
+
+    df = load_summaries('../output')
+    df.groupby('params.safety_buffer')['total_liquidations_all'].mean()
+"""
+
+import glob
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Union
+
+SUMMARY_FILENAME = 'summary.json'
+SUMMARY_SCHEMA_VERSION = 1
+
+
+def _plain(value):
+    """numpy scalars → Python; NaN / ±inf → None."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, 'item') and callable(value.item):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _as_int(value) -> Optional[int]:
+    value = _plain(value)
+    return None if value is None else int(value)
+
+
+def _as_float(value) -> Optional[float]:
+    value = _plain(value)
+    return None if value is None else float(value)
+
+
+@dataclass
+class RunSummary:
+    """
+    Summary of one run. Drivers that do not simulate positions (charts.py)
+    leave the simulation fields as None and report through `metrics`.
+    """
+    driver: str
+    run_id: str
+    total_dates: Optional[int] = None
+    total_positions: Optional[int] = None
+    total_liquidations_all: Optional[int] = None
+    unique_positions_ever_liquidated: Optional[int] = None
+    avg_health_factor_all: Optional[float] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    schema_version: int = SUMMARY_SCHEMA_VERSION
+
+    _INT_FIELDS = ('total_dates', 'total_positions', 'total_liquidations_all', 'unique_positions_ever_liquidated')
+    _FLOAT_FIELDS = ('avg_health_factor_all',)
+
+    def __post_init__(self):
+        for name in self._INT_FIELDS:
+            setattr(self, name, _as_int(getattr(self, name)))
+        for name in self._FLOAT_FIELDS:
+            setattr(self, name, _as_float(getattr(self, name)))
+        self.metrics = _plain(dict(self.metrics))
+        self.params = _plain(dict(self.params))
+
+    @classmethod
+    def from_summary(cls, driver: str, run_id: str, summary: Dict, params: Dict = None) -> "RunSummary":
+        """
+        Build from a driver's summary dict: known keys become typed fields, the rest
+        go to `metrics` (strings and other non-numeric values are dropped).
+        """
+        known = {f.name for f in fields(cls)}
+        typed = {k: v for k, v in summary.items() if k in known}
+        metrics = {k: v for k, v in summary.items()
+                   if k not in known and isinstance(_plain(v), (int, float, type(None)))}
+        return cls(driver=driver, run_id=run_id, metrics=metrics, params=params or {}, **typed)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def write(self, output_dir: str, filename: str = SUMMARY_FILENAME) -> str:
+        """Write as JSON into output_dir and return the file path."""
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, allow_nan=False)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "RunSummary":
+        with open(path) as f:
+            data = json.load(f)
+        version = data.get('schema_version')
+        if version is None or version > SUMMARY_SCHEMA_VERSION:
+            raise ValueError(f"{path}: unsupported summary schema version {version}")
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+def find_summaries(base_output_dir: str) -> list:
+    """summary.json paths of all runs directly under base_output_dir."""
+    return sorted(glob.glob(os.path.join(base_output_dir, '*', SUMMARY_FILENAME)))
+
+
+def load_summaries(source: Union[str, Iterable[str]]):
+    """
+    Load many run summaries into one DataFrame, one row per run indexed by run_id.
+
+    Args:
+        source: A base output directory (every <run>/summary.json below it) or an
+            iterable of summary.json paths.
+
+    Returns:
+        DataFrame with the typed fields as columns and metrics / params flattened
+        as 'metrics.<name>' / 'params.<name>' columns.
+    """
+    import pandas as pd
+
+    paths = find_summaries(source) if isinstance(source, str) else list(source)
+    records = []
+    for path in paths:
+        record = RunSummary.load(path).to_dict()
+        record['summary_path'] = os.path.abspath(path)
+        records.append(record)
+
+    df = pd.json_normalize(records, sep='.')
+    if df.empty:
+        return df
+    for name in RunSummary._INT_FIELDS:
+        df[name] = df[name].astype('Int64')
+    for name in RunSummary._FLOAT_FIELDS:
+        df[name] = df[name].astype('float64')
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df.set_index('run_id')
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python run_summary.py [base_output_dir]
+    runs = load_summaries(sys.argv[1] if len(sys.argv) > 1 else '../output')
+    print(f"{len(runs)} runs")
+    if len(runs):
+        print(runs[['driver', 'created_at', 'total_dates', 'total_positions', 'total_liquidations_all',
+                    'avg_health_factor_all']].to_string())
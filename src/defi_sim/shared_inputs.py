@@ -0,0 +1,318 @@
+"""
+Zero-copy sharing of simulation inputs with worker processes.
+
+The position book and the price series are published once into a single
+block, either a multiprocessing.shared_memory segment or a memory-mapped file
+under the run directory. Workers receive a small picklable SharedInputsHandle
+and attach to the block as read-only NumPy views. Nothing proportional to the
+book size is pickled or copied per worker, so startup cost and RSS stay flat as
+the pool grows.
+
+Usage:
+    with publish_inputs(book, price_df) as shared:
+        with ProcessPoolExecutor(initializer=init_worker, initargs=(shared.handle,)) as pool:
+            results = list(pool.map(some_task, day_ranges))
+
+    def some_task(day_range):
+        book, prices = worker_inputs()
+        ...
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from uniswap.position_book import PositionBook
+
+SHARED_INPUTS_FILENAME = 'shared_inputs.bin'
+
+# Block layout: 8-byte magic, 8-byte JSON header length, JSON header, then 64-byte aligned arrays
+_MAGIC = b'DSIMSHM1'
+_PREFIX = struct.Struct('<8sQ')
+_ALIGN = 64
+
+
+@dataclass(frozen=True)
+class SharedInputsHandle:
+    """Picklable reference to published inputs: kind is 'shm' (location = segment name) or 'mmap' (file path)."""
+    kind: str
+    location: str
+    size: int
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def price_arrays(price_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Flatten a data_loader price frame into date (int64 ns, UTC) / open / close arrays."""
+    dates = pd.DatetimeIndex(price_df['date'])
+    if dates.tz is not None:
+        dates = dates.tz_convert('UTC').tz_localize(None)
+    return {
+        'date_ns': np.ascontiguousarray(dates.as_unit('ns').asi8, dtype=np.int64),
+        'open_price': np.ascontiguousarray(price_df['open_price'].to_numpy(dtype=np.float64)),
+        'close_price': np.ascontiguousarray(price_df['close_price'].to_numpy(dtype=np.float64)),
+    }
+
+
+def _layout(arrays: Dict[str, np.ndarray]) -> Tuple[bytes, Dict[str, Tuple[int, int]], int]:
+    """Return (encoded header, {name: (offset, nbytes)}, total size) for the arrays."""
+    # The header records offsets, which depend on the header's own length: iterate until stable
+    header_len = 0
+    while True:
+        offset = _align(_PREFIX.size + header_len)
+        entries, spans = {}, {}
+        for name, array in arrays.items():
+            entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            spans[name] = (offset, array.nbytes)
+            offset = _align(offset + array.nbytes)
+        header = json.dumps(entries).encode()
+        if len(header) <= header_len:
+            return header.ljust(header_len), spans, max(offset, 1)
+        header_len = len(header) + 64
+
+
+def _write(buffer, arrays: Dict[str, np.ndarray]) -> None:
+    header, spans, _ = _layout(arrays)
+    view = memoryview(buffer).cast('B')
+    _PREFIX.pack_into(view, 0, _MAGIC, len(header))
+    view[_PREFIX.size:_PREFIX.size + len(header)] = header
+    for name, array in arrays.items():
+        offset, nbytes = spans[name]
+        view[offset:offset + nbytes] = np.ascontiguousarray(array).view(np.uint8).ravel()
+
+
+def _read(buffer) -> Dict[str, np.ndarray]:
+    view = memoryview(buffer).cast('B').toreadonly()
+    magic, header_len = _PREFIX.unpack_from(view, 0)
+    if magic != _MAGIC:
+        raise ValueError("buffer does not contain published simulation inputs")
+    entries = json.loads(bytes(view[_PREFIX.size:_PREFIX.size + header_len]).decode())
+    arrays = {}
+    for name, entry in entries.items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(view, dtype=dtype, count=count, offset=entry['offset']).reshape(entry['shape'])
+    return arrays
+
+
+class SharedInputs:
+    """
+    Owner of a published block. Close it (or use it as a context manager) once
+    all workers are done; for shared memory this also unlinks the segment.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], run_dir: Optional[str] = None):
+        """
+        Args:
+            arrays: Named contiguous arrays to publish.
+            run_dir: If given, publish into a memory-mapped file in this directory
+                instead of a shared memory segment.
+        """
+        _, _, size = _layout(arrays)
+        self._shm = None
+        self._mmap = None
+        if run_dir is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            _write(self._shm.buf, arrays)
+            self.handle = SharedInputsHandle('shm', self._shm.name, size)
+        else:
+            os.makedirs(run_dir, exist_ok=True)
+            path = os.path.join(run_dir, SHARED_INPUTS_FILENAME)
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            with open(path, 'r+b') as f:
+                self._mmap = mmap.mmap(f.fileno(), size)
+            _write(self._mmap, arrays)
+            self._mmap.flush()
+            self.handle = SharedInputsHandle('mmap', path, size)
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class AttachedInputs:
+    """A worker's read-only view of published inputs."""
+
+    def __init__(self, handle: SharedInputsHandle):
+        self.handle = handle
+        self._shm = None
+        self._mmap = None
+        if handle.kind == 'shm':
+            self._shm = _attach_shared_memory(handle.location)
+            buffer = self._shm.buf
+        elif handle.kind == 'mmap':
+            with open(handle.location, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), handle.size, access=mmap.ACCESS_READ)
+            buffer = self._mmap
+        else:
+            raise ValueError(f"Unknown shared inputs kind {handle.kind!r}")
+        self.arrays = _read(buffer)
+
+    @property
+    def book(self) -> Optional[PositionBook]:
+        if 'book' not in self.arrays:
+            return None
+        return PositionBook.from_buffer(self.arrays['book'])
+
+    @property
+    def prices(self) -> Dict[str, np.ndarray]:
+        return {name: self.arrays[name] for name in ('date_ns', 'open_price', 'close_price') if name in self.arrays}
+
+    def close(self) -> None:
+        # Views into the buffer must be dropped before the buffer can be released
+        self.arrays = {}
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach without registering the segment with the resource tracker (the publisher owns it)."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    # Older Pythons register every attach, and the tracker may unlink the segment
+    # when an attaching process exits. Skip the registration instead.
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda res_name, rtype: None if rtype == 'shared_memory' else register(res_name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def publish_inputs(book: PositionBook = None, price_df: pd.DataFrame = None,
+                   run_dir: Optional[str] = None, extra_arrays: Dict[str, np.ndarray] = None) -> SharedInputs:
+    """
+    Publish the position book and price series for worker processes.
+
+    Args:
+        book: PositionBook to share (stored in its to_bytes() format).
+        price_df: data_loader-style frame with date, open_price and close_price columns.
+        run_dir: Use a memory-mapped file in this directory instead of shared memory.
+        extra_arrays: Any other named arrays workers need.
+
+    Returns:
+        SharedInputs owner; pass owner.handle to workers.
+    """
+    arrays = {}
+    if book is not None:
+        arrays['book'] = np.frombuffer(book.to_bytes(), dtype=np.uint8)
+    if price_df is not None:
+        arrays.update(price_arrays(price_df))
+    if extra_arrays:
+        arrays.update({name: np.ascontiguousarray(a) for name, a in extra_arrays.items()})
+    return SharedInputs(arrays, run_dir=run_dir)
+
+
+# ────────────────────────────────────────────────
+# Process-pool helpers
+# ────────────────────────────────────────────────
+
+_worker_inputs: Optional[AttachedInputs] = None
+
+
+def init_worker(handle: SharedInputsHandle) -> None:
+    """ProcessPoolExecutor / Pool initializer: attach once per worker process."""
+    global _worker_inputs
+    _worker_inputs = AttachedInputs(handle)
+
+
+def worker_inputs() -> Tuple[Optional[PositionBook], Dict[str, np.ndarray]]:
+    """Inside a worker: the shared (book, prices) attached by init_worker."""
+    if _worker_inputs is None:
+        raise RuntimeError("init_worker() has not been called in this process")
+    return _worker_inputs.book, _worker_inputs.prices
+
+
+def fixed_ltv_day_range(day_range: Tuple[int, int], lender=None) -> Dict[str, np.ndarray]:
+    """
+    Worker task: daily liquidation counts and average HF for days [start, stop)
+    under the AaveSimulator fixed-LTV rule, computed on the shared inputs.
+    """
+    from aave.aave_original import AaveSimulator
+    from kernels.backend import get_backend
+
+    lender = lender or AaveSimulator()
+    backend = get_backend()
+    book, prices = worker_inputs()
+    start, stop = day_range
+    liquidations = np.zeros(stop - start, dtype=np.int64)
+    avg_hf = np.empty(stop - start)
+    for day in range(start, stop):
+        value_open = backend.position_value(book, prices['open_price'][day])
+        value_close = backend.position_value(book, prices['close_price'][day])
+        hf = backend.health_factor(value_close, value_open * lender.ltv_max, lender.liquidation_threshold)
+        liquidations[day - start] = int(np.count_nonzero(hf < 1.0))
+        finite = hf[np.isfinite(hf)]
+        avg_hf[day - start] = finite.mean() if finite.size else np.inf
+    return {'start': start, 'liquidations': liquidations, 'avg_health_factor': avg_hf}
+
+
+def run_sharded_days(task, handle: SharedInputsHandle, n_days: int, n_workers: int = None,
+                     chunk_days: int = 64):
+    """
+    Fan a per-day-range task out over a process pool attached to shared inputs.
+
+    Args:
+        task: Picklable function taking (start, stop) and returning a result.
+        handle: SharedInputsHandle from publish_inputs().
+        n_days: Total number of days.
+        n_workers: Pool size (default: os.cpu_count()).
+        chunk_days: Days per task.
+
+    Returns:
+        List of task results in day order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    ranges = [(start, min(start + chunk_days, n_days)) for start in range(0, n_days, chunk_days)]
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker, initargs=(handle,)) as pool:
+        return list(pool.map(task, ranges))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    import data_loader
+    from position_loader import create_position_book
+
+    random.seed(0)
+    book = create_position_book(n_positions=100_000)
+    price_df = data_loader.df
+
+    start = time.perf_counter()
+    with publish_inputs(book, price_df) as shared:
+        print(f"Published {len(book):,} positions + {len(price_df)} days "
+              f"({shared.handle.size / 1e6:.1f} MB) as {shared.handle}")
+        results = run_sharded_days(fixed_ltv_day_range, shared.handle, len(price_df), n_workers=4)
+    liquidations = np.concatenate([r['liquidations'] for r in results])
+    print(f"Total liquidations: {liquidations.sum():,} in {time.perf_counter() - start:.2f}s")
@@ -1,14 +1,19 @@
 import os
 from typing import Dict
 
+import numpy as np
+
+from aave.policies import DayContext, FixedLTVPolicy, LenderPolicy
 from src.position_loader import create_positions
 from run_manager import setup_run_directories, get_timeseries_csv_path
+from instrumentation import NULL_METRICS, create_run_metrics
+from result_cube import RESULT_CUBE_FILENAME, ResultCubeWriter
+from run_catalog import RunCatalog, hash_inputs, record_run, timing_from_metrics
+from run_summary import RunSummary
+from src.data_loader import CRASH_WINDOWS
 
-# -------------------  Define crashes to analyze -------------------
-crashes = {
-    'May 2021 Crash': ('2021-05-01', '2021-06-30'),
-    'FTX Nov 2022': ('2022-11-01', '2022-11-30'),
-}
+# -------------------  Crashes to analyze (shared with cascade.py) -------------------
+crashes = CRASH_WINDOWS
 
 # Simulator-level constant
 positions_in_pool = 500
@@ -36,13 +41,56 @@ def load_price_df():
             "data_loader.py must exist and expose a dataframe `df` with 'date' and 'price' columns") from e
 
 
-def prepare_aave_simulator():
-    """Instantiate and return an AaveSimulator."""
-    from aave.aave_original import AaveSimulator
-    return AaveSimulator()
+def prepare_lender_policy() -> LenderPolicy:
+    """The lender applied to every position: the DeFi baseline (plain AaveSimulator parameters)."""
+    return FixedLTVPolicy()
+
+
+DAILY_CSV_FIELDNAMES = [
+    'position_id', 'seed_price', 'position_value_at_seed', 'loan_amount',
+    'close_price', 'position_value_at_close', 'hold_value',
+    'impermanent_loss', 'impermanent_loss_pct',
+    'health_factor', 'should_liquidate', 'repay_amount', 'collateral_to_take'
+]
+
+
+def build_daily_csv_row(pid, open_price, close_price, pos_value_open, pos_value_close, loan,
+                        hold_value, il, hf, should_liquidate, repay_amount, collateral_to_take) -> Dict:
+    """Format one position's results for the daily CSV (see DAILY_CSV_FIELDNAMES)."""
+    return {
+        'position_id': pid,
+        'seed_price': f"{open_price:.4f}",
+        'position_value_at_seed': f"{pos_value_open:.2f}",
+        'loan_amount': f"{loan:.2f}",
+        'close_price': f"{close_price:.4f}",
+        'position_value_at_close': f"{pos_value_close:.2f}",
+        'hold_value': f"{hold_value:.2f}",
+        'impermanent_loss': f"{il:.6f}",
+        'impermanent_loss_pct': f"{il * 100:.2f}",
+        'health_factor': f"{hf:.6f}" if hf != float('inf') else 'inf',
+        'should_liquidate': 'Yes' if should_liquidate else 'No',
+        'repay_amount': f"{repay_amount:.2f}",
+        'collateral_to_take': f"{collateral_to_take:.2f}",
+    }
+
 
+def write_daily_csv(csv_filename: str, daily_csv_rows) -> None:
+    """Write one trading day's position-level rows to a CSV file.
 
-def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../output') -> Dict:
+    Args:
+        csv_filename: Path of the trading_day_YYYYMMDD.csv file
+        daily_csv_rows: List of row dicts keyed by DAILY_CSV_FIELDNAMES
+    """
+    import csv
+
+    with open(csv_filename, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=DAILY_CSV_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(daily_csv_rows)
+
+
+def run_full_simulation(policy: LenderPolicy, position_objs, price_df, output_dir: str = '../output',
+                        metrics=NULL_METRICS, result_cube_path: str = None) -> Dict:
     """Run simulation over all dates in the price dataframe.
 
     Each trading day:
@@ -51,13 +99,20 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
     3. Generate detailed CSV file for the day with position-level data
     4. Tear down all positions and loans at end of day
 
+    Loans are sized and liquidations decided by `policy` (see aave/policies.py),
+    over all positions at once. The simulator has no shock grid, so stress
+    policies see an empty stress matrix and lend their plain Aave loan.
+
+    Each step is timed as a separate stage in `metrics` (see instrumentation.py).
+    If result_cube_path is given, per-position health factor, impermanent loss and
+    liquidation flags are also written to a memory-mapped result cube (see result_cube.py).
+
     Returns a dict with:
         - timeseries: list of dicts, one per date with:
             {date, open_price, close_price, total_liquidations, unique_liquidated, avg_health_factor}
         - summary: dict with aggregate stats over all dates
     """
     import os
-    import csv
 
     timeseries = []
 
@@ -70,6 +125,10 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
+    cube = None
+    if result_cube_path:
+        cube = ResultCubeWriter(result_cube_path, list(price_df['date']), list(position_objs))
+
     # loop over each date in the price dataframe
     for idx, (_, row) in enumerate(price_df.iterrows()):
         date = row['date']
@@ -77,78 +136,69 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
         close_price = float(row['close_price'])
 
         # --- DURING DAY: Run liquidation checks at closing price ---
-        total_liquidations_day = 0
         liquidated_today = set()
-        hf_sum_day = 0.0
-        hf_count_day = 0
-
-        daily_csv_rows = []
-
-        # loop over all positions for the trading day
-        for pid, pos in position_objs.items():
-            pos_value_open = pos.compute_position_value(open_price)
-            pos_value_close = pos.compute_position_value(close_price)
-            loan = sim.borrow(pos_value_open) # look up the loan amount for this position
-
-            # Calculate hold value and impermanent loss
-            hold_value = pos.compute_hold_value(close_price)
-            il = pos.compute_impermanent_loss(close_price)
-
-            # Make a liquidation decision and compute a health factor
-            decision = sim.decide_liquidation(pos_value_close, loan)
-            hf = decision.get('health_factor', float('inf'))
-            should_liquidate = decision.get('should_liquidate', False)
-            #  Get penalties, if any
-            repay_amount = decision.get('repay_amount', 0.0)
-            collateral_to_take = decision.get('collateral_to_take', 0.0)
-
-            if hf != float('inf'):
-                hf_sum_day += hf
-                hf_count_day += 1
-                hf_sum_all += hf
-                hf_count_all += 1
-
-            if should_liquidate:
-                total_liquidations_day += 1
-                total_liquidations_all += 1
+
+        # --- VALUATION: value every position at open and close ---
+        with metrics.stage('valuation'):
+            valuations = []
+            for pid, pos in position_objs.items():
+                # Open value, close value, hold value and impermanent loss in one pass
+                valuations.append((pid, *pos.evaluate(open_price, close_price)))
+        metrics.count('valuation', positions=len(valuations))
+
+        # --- LENDER: size loans at open, decide liquidations at close ---
+        with metrics.stage('lender_decisions'):
+            values_open = np.array([v[1] for v in valuations], dtype=np.float64)
+            values_close = np.array([v[2] for v in valuations], dtype=np.float64)
+            policy.begin_day(DayContext(idx, open_price, close_price, np.empty(0)))
+            loans = policy.size_loans(values_open, np.empty((len(valuations), 0)))
+            decisions = policy.decide(values_close, loans)
+
+            # Summed in position order, as the per-position loop did
+            finite_hf = decisions.health_factor[np.isfinite(decisions.health_factor)].tolist()
+            hf_sum_day = sum(finite_hf)
+            hf_count_day = len(finite_hf)
+            hf_sum_all = sum(finite_hf, hf_sum_all)
+            hf_count_all += hf_count_day
+
+            for i in np.flatnonzero(decisions.should_liquidate):
+                pid = valuations[i][0]
                 liquidated_today.add(pid)
                 positions_ever_liquidated.add(pid)
-
-            # Build row for daily CSV
-            csv_row = {
-                'position_id': pid,
-                'seed_price': f"{open_price:.4f}",
-                'position_value_at_seed': f"{pos_value_open:.2f}",
-                'loan_amount': f"{loan:.2f}",
-                'close_price': f"{close_price:.4f}",
-                'position_value_at_close': f"{pos_value_close:.2f}",
-                'hold_value': f"{hold_value:.2f}",
-                'impermanent_loss': f"{il:.6f}",
-                'impermanent_loss_pct': f"{il * 100:.2f}",
-                'health_factor': f"{hf:.6f}" if hf != float('inf') else 'inf',
-                'should_liquidate': 'Yes' if should_liquidate else 'No',
-                'repay_amount': f"{repay_amount:.2f}",
-                'collateral_to_take': f"{collateral_to_take:.2f}",
-            }
-            daily_csv_rows.append(csv_row)
+            total_liquidations_day = int(np.count_nonzero(decisions.should_liquidate))
+            total_liquidations_all += total_liquidations_day
+        metrics.count('lender_decisions', positions=len(valuations))
+
+        # --- FORMAT: build rows for the daily CSV ---
+        with metrics.stage('csv_format'):
+            daily_csv_rows = []
+            for (pid, pos_value_open, pos_value_close, hold_value, il), loan, hf, should_liquidate, repay, collateral \
+                    in zip(valuations, loans.tolist(), decisions.health_factor.tolist(),
+                           decisions.should_liquidate.tolist(), decisions.repay_amount.tolist(),
+                           decisions.collateral_to_take.tolist()):
+                csv_row = build_daily_csv_row(pid, open_price, close_price, pos_value_open, pos_value_close,
+                                              loan, hold_value, il, hf, should_liquidate, repay, collateral)
+                daily_csv_rows.append(csv_row)
+        metrics.count('csv_format', positions=len(daily_csv_rows))
+
+        # --- RESULT CUBE: store this day's row of per-position results ---
+        if cube is not None:
+            with metrics.stage('cube_write'):
+                cube.write_day(idx, decisions.health_factor, [il for *_, il in valuations],
+                               decisions.should_liquidate)
+            metrics.count('cube_write', positions=len(valuations))
 
         # --- EXPORT: Generate daily CSV file ---
         date_str = date.strftime('%Y%m%d')
         csv_filename = os.path.join(output_dir, f"trading_day_{date_str}.csv")
 
-        try:
-            with open(csv_filename, 'w', newline='') as csvfile:
-                fieldnames = [
-                    'position_id', 'seed_price', 'position_value_at_seed', 'loan_amount',
-                    'close_price', 'position_value_at_close', 'hold_value',
-                    'impermanent_loss', 'impermanent_loss_pct',
-                    'health_factor', 'should_liquidate', 'repay_amount', 'collateral_to_take'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(daily_csv_rows)
-        except Exception as e:
-            print(f"Error writing daily CSV for {date_str}: {e}")
+        with metrics.stage('csv_write'):
+            try:
+                write_daily_csv(csv_filename, daily_csv_rows)
+            except Exception as e:
+                print(f"Error writing daily CSV for {date_str}: {e}")
+        if metrics.enabled:
+            metrics.count_file('csv_write', csv_filename)
 
         avg_hf_day = (hf_sum_day / hf_count_day) if hf_count_day > 0 else float('inf')
 
@@ -167,6 +217,9 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
         if (idx + 1) % 100 == 0:
             print(f"Processed {idx + 1} days...")
 
+    if cube is not None:
+        cube.close()
+
     avg_hf_all = (hf_sum_all / hf_count_all) if hf_count_all > 0 else float('inf')
 
     summary = {
@@ -176,6 +229,7 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
         'unique_positions_ever_liquidated': len(positions_ever_liquidated),
         'avg_health_factor_all': avg_hf_all,
         'output_dir': output_dir,
+        'result_cube_path': result_cube_path,
     }
 
     return {
@@ -184,36 +238,79 @@ def run_full_simulation(sim, position_objs, price_df, output_dir: str = '../outp
     }
 
 
-def run_simulation(n_positions, output_dir: str = '../output', run_id: str = None):
+def run_simulation(n_positions, output_dir: str = '../output', run_id: str = None,
+                   collect_metrics: bool = None, profile: str = None, result_cube: bool = False,
+                   sweep_id: str = None):
     """High-level entrypoint: create positions, load prices, and run full historical simulation.
 
     Args:
         n_positions: Number of positions to create
         output_dir: Base output directory
         run_id: Run ID for organizing outputs (if None, generates one)
+        collect_metrics: Record per-stage timings to run_metrics.json (default: on, see instrumentation.py)
+        profile: Optional profile capture mode, 'cprofile' or 'pyinstrument'
+        result_cube: Also write per-position daily results to <run>/results.cube
+        sweep_id: Sweep this run is a task of (recorded in params; see work_queue.py)
 
-    Returns a dict with timeseries and summary stats, and run_id.
+    Returns a dict with timeseries and summary stats, run_id and the run's metrics.
     """
     # Set up run directories
     run_id, daily_records_dir, charts_dir, run_base_dir = setup_run_directories(output_dir, run_id)
-
-    # Open all positions
-    positions = prepare_positions(n_positions)
-
-    # Load historical data
-    price_df = load_price_df()
-
-    # Setup Aave Lending Simulator
-    lender = prepare_aave_simulator()
-
-    # Run simulation over all dates and all positions
-    result = run_full_simulation(lender, positions, price_df, output_dir=daily_records_dir)
+    metrics = create_run_metrics('simulator', run_id, enabled=collect_metrics, profile=profile)
+
+    with metrics.profiling(run_base_dir):
+        # Open all positions
+        with metrics.stage('setup'):
+            positions = prepare_positions(n_positions)
+
+            # Load historical data
+            price_df = load_price_df()
+
+            # Lender policy (FixedLTVPolicy: the plain Aave lender)
+            lender = prepare_lender_policy()
+
+        # Run simulation over all dates and all positions
+        cube_path = os.path.join(run_base_dir, RESULT_CUBE_FILENAME) if result_cube else None
+        result = run_full_simulation(lender, positions, price_df, output_dir=daily_records_dir, metrics=metrics,
+                                     result_cube_path=cube_path)
+
+    metrics_path = metrics.write(run_base_dir)
+
+    # Typed summary.json, and the finished run in the run catalog (<output_dir>/runs.sqlite)
+    params = {
+        'n_positions': n_positions,
+        'n_days': len(price_df),
+        'start_date': str(price_df['date'].iloc[0]) if len(price_df) else None,
+        'end_date': str(price_df['date'].iloc[-1]) if len(price_df) else None,
+        'ltv_max': lender.aave.ltv_max,
+        'liquidation_threshold': lender.aave.liquidation_threshold,
+        'close_factor': lender.aave.close_factor,
+        'liquidation_bonus': lender.aave.liquidation_bonus,
+    }
+    if sweep_id is not None:
+        params['sweep_id'] = sweep_id
+    summary = {k: v for k, v in result['summary'].items() if k not in ('output_dir', 'result_cube_path')}
+    summary_path = RunSummary.from_summary('simulator', run_id, summary, params).write(run_base_dir)
+    artifacts = {
+        'summary_json': summary_path,
+        'daily_records': daily_records_dir,
+        'run_metrics': metrics_path,
+        'result_cube': cube_path,
+    }
+    catalog_path = record_run(output_dir, run_id, 'simulator', run_base_dir,
+                              params=params,
+                              input_hashes=hash_inputs(price_df, positions),
+                              summary=summary,
+                              timing=timing_from_metrics(metrics.as_dict()),
+                              artifacts=artifacts)
 
     # Add run metadata to result
     result['run_id'] = run_id
     result['daily_records_dir'] = daily_records_dir
     result['charts_dir'] = charts_dir
     result['run_base_dir'] = run_base_dir
+    result['metrics'] = metrics
+    result['catalog_path'] = catalog_path
 
     return result
 
@@ -329,6 +426,7 @@ if __name__ == "__main__":
     daily_records_dir = result['daily_records_dir']
     charts_dir = result['charts_dir']
     run_base_dir = result['run_base_dir']
+    metrics = result['metrics']
 
     print(f"\n===== RUN ID: {run_id} =====")
     print("===== SIMULATION SUMMARY =====")
@@ -341,19 +439,34 @@ if __name__ == "__main__":
     # Generate and save the price-liquidation chart
     timeseries_csv_path = get_timeseries_csv_path(run_base_dir)
     price_liq_chart_path = os.path.join(charts_dir, 'price_liquidation_chart.png')
-    generate_price_liquidation_chart(timeseries, output_file=price_liq_chart_path)
+    with metrics.stage('chart:price_liquidation_chart'):
+        generate_price_liquidation_chart(timeseries, output_file=price_liq_chart_path)
+    metrics.count_file('chart:price_liquidation_chart', price_liq_chart_path)
 
     # Export timeseries to CSV
-    export_timeseries_to_csv(timeseries, output_file=timeseries_csv_path)
+    with metrics.stage('timeseries_csv_write'):
+        export_timeseries_to_csv(timeseries, output_file=timeseries_csv_path)
+    metrics.count_file('timeseries_csv_write', timeseries_csv_path)
 
     # Call chart generation
     print(f"\nGenerating analysis charts in {charts_dir}...")
     from src.defi_sim.generate_analysis_charts import main as generate_charts_main
 
-    generate_charts_main(output_dir=daily_records_dir, output_charts_dir=charts_dir)
+    generate_charts_main(output_dir=daily_records_dir, output_charts_dir=charts_dir, metrics=metrics)
+
+    # Rewrite the metrics file now that the chart stages are included
+    metrics_path = metrics.write(run_base_dir)
+    metrics.print_report()
+
+    if result['catalog_path']:
+        with RunCatalog(result['catalog_path']) as catalog:
+            catalog.update_run(run_id, timing=timing_from_metrics(metrics.as_dict()),
+                               artifacts={'charts': charts_dir, 'timeseries_csv': timeseries_csv_path})
 
     print(f"\n===== SIMULATION COMPLETE =====")
     print(f"Run ID: {run_id}")
     print(f"Daily records: {daily_records_dir}")
     print(f"Charts: {charts_dir}")
     print(f"Timeseries CSV: {timeseries_csv_path}")
+    if metrics_path:
+        print(f"Run metrics: {metrics_path}")
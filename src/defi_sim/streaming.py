@@ -0,0 +1,307 @@
+"""
+Streaming liquidation monitor: live prices in, threshold crossings out.
+
+With its loan fixed, a position's health factor (AaveSimulator rule:
+value * liquidation_threshold / loan) is non-decreasing in the ETH price,
+because a Uniswap v3 position's value is. Each position therefore has one
+critical price per alert level, below which it is in that level:
+
+    liquidation   HF < 1                              (AaveSimulator.decide_liquidation)
+    warning       HF < warning_hf
+    stress        worst HF over the shock grid < 1    (the worst shock is the largest drop)
+
+Each level is a defi_sim.liquidation_index.LiquidationIndex: the critical
+prices from PositionBook.price_for_value, kept sorted. A tick from price p0 to
+p1 then flips exactly the positions whose critical price lies between the two. Those are found by binary search,
+so a tick costs O(log n + crossings) instead of revaluing the whole book.
+Only the flipped positions are revalued, with the backend kernels, to report
+their health factors.
+
+Price sources are plain iterators or async iterators of (timestamp, price):
+
+    monitor = LiquidationMonitor.from_open_price(book, open_price)
+    for events in monitor.run(follow_file('ticks.csv')):
+        for record in events.records(monitor.book):
+            print(record)
+
+    async for events in monitor.arun(socket_prices('localhost', 9000)):
+        ...
+
+Run this module for a throughput check on a synthetic random-walk feed:
+    python -m defi_sim.streaming --positions 100000 --ticks 200000
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from aave.aave_original import AaveSimulator
+from defi_sim.liquidation_index import LiquidationIndex
+from kernels.backend import get_backend
+from uniswap.position_book import PositionBook
+
+
+class MonitorLevel(NamedTuple):
+    """A position is in the level when HF at price * (1 + shock_pct / 100) is below health_factor."""
+    name: str
+    health_factor: float
+    shock_pct: float = 0.0
+
+
+# Stress shock: the largest drop of the simulators' shock grid (regime_comparison.SHOCK_LEVELS_PCT)
+DEFAULT_LEVELS = (
+    MonitorLevel('liquidation', 1.0),
+    MonitorLevel('warning', 1.05),
+    MonitorLevel('stress', 1.0, -15.0),
+)
+
+
+class TickEvents(NamedTuple):
+    """Threshold crossings caused by one tick (parallel arrays, one entry per crossing)."""
+    tick: int
+    timestamp: object
+    price: float
+    position_index: np.ndarray   # book column of the position
+    level: np.ndarray            # index into LiquidationMonitor.levels
+    entered: np.ndarray          # True: fell below the level's threshold; False: recovered
+    health_factor: np.ndarray    # HF at this tick's price
+    worst_stress_hf: np.ndarray  # HF at the stress level's shocked price
+
+    def __len__(self) -> int:
+        return len(self.position_index)
+
+    def records(self, book: PositionBook, levels: Sequence[MonitorLevel] = DEFAULT_LEVELS) -> List[dict]:
+        """One dict per crossing, with position ids and level names."""
+        return [{
+            'tick': self.tick,
+            'timestamp': self.timestamp,
+            'price': self.price,
+            'position_id': book.position_id(int(i)),
+            'level': levels[int(lv)].name,
+            'entered': bool(entered),
+            'health_factor': float(hf),
+            'worst_stress_hf': float(worst),
+        } for i, lv, entered, hf, worst in zip(self.position_index, self.level, self.entered,
+                                                self.health_factor, self.worst_stress_hf)]
+
+
+class LiquidationMonitor:
+    """
+    Tracks which positions are in each alert level as prices stream in.
+
+    Loans are fixed between ticks; change them with set_loans(), which moves only
+    the positions given within each level's index (no re-sort of the book).
+    """
+
+    def __init__(self, book: PositionBook, loans, aave: AaveSimulator = None,
+                 levels: Sequence[MonitorLevel] = DEFAULT_LEVELS, backend=None):
+        """
+        Args:
+            book: Positions to monitor
+            loans: Outstanding loan per position (USDC)
+            aave: Lender parameters (liquidation threshold for the HF)
+            levels: Alert levels; the HF reported as worst_stress_hf uses the
+                first level with a negative shock_pct (or the price itself)
+            backend: Backend name or module for revaluing crossed positions
+        """
+        self.book = book
+        self.aave = aave or AaveSimulator()
+        self.levels = tuple(levels)
+        self.backend = get_backend(backend) if backend is None or isinstance(backend, str) else backend
+        self.loans = np.array(np.broadcast_to(np.asarray(loans, dtype=np.float64), (len(book),)))
+        stress = [lv.shock_pct for lv in self.levels if lv.shock_pct < 0]
+        self.stress_factor = 1 + (stress[0] if stress else 0.0) / 100
+
+        self.price: Optional[float] = None
+        self.tick = 0
+        self.in_level = np.zeros((len(self.levels), len(book)), dtype=bool)
+        self.indexes = [LiquidationIndex(book, self.loans, self.aave, level.health_factor, level.shock_pct)
+                        for level in self.levels]
+
+    @classmethod
+    def from_open_price(cls, book: PositionBook, open_price: float, aave: AaveSimulator = None,
+                        **kwargs) -> "LiquidationMonitor":
+        """Monitor loans of aave.borrow(value at open_price) per position, as the simulators take them."""
+        aave = aave or AaveSimulator()
+        loans = book.position_value(open_price, kwargs.get('backend')) * aave.ltv_max
+        return cls(book, loans, aave, **kwargs)
+
+    def set_loans(self, indices, loans) -> None:
+        """Change the loans of some positions and update their level membership at the current price."""
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        self.loans[indices] = loans
+        for k, index in enumerate(self.indexes):
+            index.update_loans(indices, loans)
+            if self.price is not None:
+                self.in_level[k, indices] = self.price < index.critical_prices[indices]
+
+    # ────────────────────────────────────────────────
+    # Ticks
+    # ────────────────────────────────────────────────
+
+    def health_factors(self, price: float = None, indices=None) -> Tuple[np.ndarray, np.ndarray]:
+        """(HF, worst stress HF) at `price` (default: the last tick) for all positions or `indices`."""
+        price = self.price if price is None else price
+        book = self.book if indices is None else PositionBook(self.book.data[:, indices])
+        loans = self.loans if indices is None else self.loans[indices]
+        lt = self.aave.liquidation_threshold
+        hf = self.backend.health_factor(self.backend.position_value(book, price), loans, lt)
+        shocked = price * self.stress_factor
+        if shocked > 0:
+            worst = self.backend.health_factor(self.backend.position_value(book, shocked), loans, lt)
+        else:
+            worst = np.where(loans > 0, 0.0, np.inf)
+        return hf, worst
+
+    def update(self, price: float, timestamp=None) -> TickEvents:
+        """
+        Apply one tick. The first tick reports every position already in a level
+        as entered; later ticks report only positions that crossed a threshold.
+        """
+        price = float(price)
+        crossed_idx, crossed_level = [], []
+        for k, index in enumerate(self.indexes):
+            cols = index.liquidated_at(price) if self.price is None else index.crossed(self.price, price)
+            if len(cols):
+                crossed_idx.append(cols)
+                crossed_level.append(np.full(len(cols), k, dtype=np.int8))
+
+        if crossed_idx:
+            position_index = np.concatenate(crossed_idx)
+            level = np.concatenate(crossed_level)
+            entered = ~self.in_level[level, position_index]
+            self.in_level[level, position_index] = entered
+            hf, worst = self.health_factors(price, position_index)
+        else:
+            position_index = np.empty(0, dtype=np.int64)
+            level = np.empty(0, dtype=np.int8)
+            entered = np.empty(0, dtype=bool)
+            hf = worst = np.empty(0)
+
+        events = TickEvents(self.tick, timestamp, price, position_index, level, entered, hf, worst)
+        self.price = price
+        self.tick += 1
+        return events
+
+    def counts(self) -> dict:
+        """Positions currently in each level."""
+        return {level.name: int(np.count_nonzero(self.in_level[k])) for k, level in enumerate(self.levels)}
+
+    def run(self, ticks: Iterable) -> Iterator[TickEvents]:
+        """Consume (timestamp, price) pairs or bare prices; yield the ticks that produced crossings."""
+        for tick in ticks:
+            timestamp, price = tick if isinstance(tick, tuple) else (None, tick)
+            events = self.update(price, timestamp)
+            if len(events):
+                yield events
+
+    async def arun(self, ticks: AsyncIterator) -> AsyncIterator[TickEvents]:
+        """Async version of run() for asyncio price streams."""
+        async for tick in ticks:
+            timestamp, price = tick if isinstance(tick, tuple) else (None, tick)
+            events = self.update(price, timestamp)
+            if len(events):
+                yield events
+
+
+# ────────────────────────────────────────────────
+# Price sources
+# ────────────────────────────────────────────────
+
+def parse_tick(line: str) -> Optional[Tuple[Optional[str], float]]:
+    """'price' or 'timestamp,price' → (timestamp, price); None for blank, header or malformed lines."""
+    parts = [p.strip() for p in line.strip().split(',')]
+    try:
+        price = float(parts[-1])
+    except ValueError:
+        return None
+    return (parts[0] if len(parts) > 1 else None), price
+
+
+def replay_prices(price_df, column: str = 'close_price') -> Iterator[Tuple[object, float]]:
+    """Replay a data_loader price frame as (date, price) ticks."""
+    yield from zip(price_df['date'], price_df[column].to_numpy(dtype=np.float64))
+
+
+def follow_file(path: str, poll_interval: float = 0.1, from_start: bool = True,
+                idle_timeout: Optional[float] = None) -> Iterator[Tuple[Optional[str], float]]:
+    """
+    Tail a tick file ('price' or 'timestamp,price' lines) like `tail -f`.
+
+    Args:
+        from_start: Replay existing lines first (otherwise start at the end)
+        idle_timeout: Stop after this many seconds without a new line (None: follow forever)
+    """
+    with open(path) as f:
+        if not from_start:
+            f.seek(0, 2)
+        idle_since = time.monotonic()
+        while True:
+            line = f.readline()
+            if line and line.endswith('\n'):
+                idle_since = time.monotonic()
+                tick = parse_tick(line)
+                if tick is not None:
+                    yield tick
+                continue
+            if line:
+                f.seek(f.tell() - len(line))  # partial line: wait for the writer to finish it
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                return
+            time.sleep(poll_interval)
+
+
+async def socket_prices(host: str, port: int) -> AsyncIterator[Tuple[Optional[str], float]]:
+    """Ticks from a TCP feed sending one 'price' or 'timestamp,price' line per tick, until it closes."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            tick = parse_tick(line.decode())
+            if tick is not None:
+                yield tick
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def random_walk_prices(start_price: float, n_ticks: int, tick_vol: float = 0.001,
+                       seed: int = 0) -> np.ndarray:
+    """Synthetic geometric random-walk ticks (tick_vol = std of log return per tick)."""
+    rng = np.random.default_rng(seed)
+    return start_price * np.exp(np.cumsum(rng.normal(0.0, tick_vol, n_ticks)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    from position_loader import create_position_book
+
+    parser = argparse.ArgumentParser(description="Streaming monitor throughput check")
+    parser.add_argument('--positions', type=int, default=100_000)
+    parser.add_argument('--ticks', type=int, default=200_000)
+    parser.add_argument('--open-price', type=float, default=2500.0)
+    parser.add_argument('--tick-vol', type=float, default=0.001)
+    args = parser.parse_args()
+
+    random.seed(42)
+    book = create_position_book(args.positions)
+    t0 = time.perf_counter()
+    monitor = LiquidationMonitor.from_open_price(book, args.open_price)
+    setup = time.perf_counter() - t0
+
+    prices = random_walk_prices(args.open_price, args.ticks, args.tick_vol)
+    n_events = 0
+    t0 = time.perf_counter()
+    for events in monitor.run(prices):
+        n_events += len(events)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{args.positions} positions indexed in {setup:.3f}s")
+    print(f"{args.ticks} ticks in {elapsed:.3f}s: {args.ticks / elapsed:,.0f} ticks/s, {n_events} crossings")
+    print(f"Final price {prices[-1]:.2f}, positions per level: {monitor.counts()}")
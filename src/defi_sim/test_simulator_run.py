@@ -20,11 +20,11 @@ print(f"Average health factor: {summary['avg_health_factor_all']:.4f}")
 
 print("\nFirst 5 dates:")
 for i, row in enumerate(timeseries[:5]):
-    print(f"  {row['date']} | price={row['price']:.2f} | liq={row['total_liquidations']}")
+    print(f"  {row['date']} | close={row['close_price']:.2f} | liq={row['total_liquidations']}")
 
 print("\nLast 5 dates:")
 for i, row in enumerate(timeseries[-5:]):
-    print(f"  {row['date']} | price={row['price']:.2f} | liq={row['total_liquidations']}")
+    print(f"  {row['date']} | close={row['close_price']:.2f} | liq={row['total_liquidations']}")
 
 print("\nTest complete!")
 
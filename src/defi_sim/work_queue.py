@@ -0,0 +1,708 @@
+"""
+SQLite work queue for simulation sweeps across worker processes and hosts.
+
+A sweep is a list of tasks, each one driver call (run_simulation or
+run_hybrid_stress_simulation) with its parameters and an explicit seed. Tasks
+live in one SQLite file, and any number of worker processes claim tasks from it:
+
+    with WorkQueue(get_queue_path('../output')) as queue:
+        queue.submit_sweep('lt_sweep', 'simulator', [{'n_positions': n} for n in (500, 1000, 2000)],
+                           base_seed=42, output_dir='../output')
+    run_workers(get_queue_path('../output'), n_workers=4)
+
+The journal mode is chosen when the queue file is created and kept for its
+lifetime:
+
+    - local (default): WAL. Fastest, but WAL coordinates through shared memory,
+      so every worker must run on the host that holds the file.
+    - shared: rollback journal, which locks with ordinary file locks. Put the
+      output directory on storage every host mounts (NFS, SMB, ... with working
+      POSIX locks) and start workers on each host against the same queue file.
+      Sweep output directories are stored relative to the queue file, so hosts
+      may mount the share at different paths. Leases compare wall-clock times
+      from different hosts, so their clocks must agree (NTP) to well within the
+      lease length.
+
+CLI (one worker loop per process):
+    python work_queue.py submit lt_sweep --driver sim4 --grid n_positions=500,1000 --repeats 4 --seed 42
+    python work_queue.py --output-dir /mnt/sweeps submit lt_sweep --shared --grid n_positions=500,1000
+    python work_queue.py --output-dir /mnt/sweeps work --workers 8 --wait     (on every host)
+    python work_queue.py status [lt_sweep]
+
+Claiming is a single BEGIN IMMEDIATE transaction, so a task goes to exactly
+one worker in either mode.
+A claim is a lease that the worker renews while the task runs. A task whose
+worker died is claimed again once the lease expires, until max_attempts is
+used up. Completing and failing only apply while the caller still holds the
+lease, so a late duplicate can never overwrite a result.
+
+Each task seeds random and numpy from its own seed before the driver runs.
+The same sweep therefore gives the same per-task summaries on any worker, in
+any order. The runs themselves are recorded in the catalog with the sweep id
+in their params, so latest-run lookups skip them.
+
+Completions stream into the run catalog: the sweep has its own row (driver
+'sweep') whose summary holds count/mean/std/min/max of every numeric summary
+metric over the finished tasks. Running totals are kept while tasks finish.
+When the last task is done the aggregate is recomputed in task order, so the
+final row is identical across reruns. The row is written while the queue's
+write lock is held, so it always reflects the latest task states, and a
+catalog error is raised to the worker instead of being dropped.
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from importlib import import_module
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Workers import the simulation drivers as the IDE source roots do
+SRC_DIR = Path(__file__).resolve().parent.parent
+for _path in (SRC_DIR / 'defi_sim', SRC_DIR.parent, SRC_DIR):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+from run_catalog import RunCatalog, get_catalog_path
+
+QUEUE_FILENAME = 'work_queue.sqlite'
+QUEUE_SCHEMA_VERSION = 1
+
+DEFAULT_LEASE_S = 600.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_S = 2.0
+
+TASK_STATUSES = ('pending', 'running', 'done', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    sweep_id    TEXT PRIMARY KEY,
+    output_dir  TEXT,
+    base_seed   INTEGER,
+    created_at  TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id       TEXT PRIMARY KEY,
+    sweep_id      TEXT NOT NULL,
+    driver        TEXT NOT NULL,
+    params        TEXT NOT NULL,
+    seed          INTEGER NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    worker        TEXT,
+    claimed_at    REAL,
+    lease_expires REAL,
+    finished_at   REAL,
+    run_id        TEXT,
+    summary       TEXT,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_sweep ON tasks (sweep_id, status);
+CREATE TABLE IF NOT EXISTS sweep_metrics (
+    sweep_id  TEXT NOT NULL,
+    metric    TEXT NOT NULL,
+    count     INTEGER NOT NULL,
+    total     REAL NOT NULL,
+    total_sq  REAL NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    PRIMARY KEY (sweep_id, metric)
+);
+"""
+
+
+def get_queue_path(base_output_dir: str = '../output') -> str:
+    return os.path.join(base_output_dir, QUEUE_FILENAME)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _plain(value):
+    # numpy scalars in driver summaries
+    if hasattr(value, 'item') and callable(value.item):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value or {}, sort_keys=True, default=_plain)
+
+
+def derive_seeds(base_seed: int, n: int) -> List[int]:
+    """n independent 32-bit task seeds from one base seed (numpy SeedSequence spawning)."""
+    import numpy as np
+
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(base_seed).spawn(n)]
+
+
+def numeric_metrics(summary: Dict) -> Dict[str, float]:
+    """The finite int/float values of a task summary (booleans excluded)."""
+    metrics = {}
+    for key, value in summary.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if math.isfinite(value):
+            metrics[key] = float(value)
+    return metrics
+
+
+def aggregate_summaries(summaries: Sequence[Dict]) -> Dict[str, Dict]:
+    """Per-metric count, mean, std (population), min and max over task summaries, in the given order."""
+    columns: Dict[str, List[float]] = {}
+    for summary in summaries:
+        for key, value in numeric_metrics(summary).items():
+            columns.setdefault(key, []).append(value)
+    aggregate = {}
+    for key, values in columns.items():
+        mean = math.fsum(values) / len(values)
+        variance = math.fsum((v - mean) ** 2 for v in values) / len(values)
+        aggregate[key] = {'count': len(values), 'mean': mean, 'std': math.sqrt(variance),
+                          'min': min(values), 'max': max(values)}
+    return aggregate
+
+
+# ────────────────────────────────────────────────
+# Queue
+# ────────────────────────────────────────────────
+
+class WorkQueue:
+    """
+    Usage:
+        queue = WorkQueue(get_queue_path(base_output_dir))
+        queue.submit_sweep('sweep_a', 'sim4', [{'n_positions': 500}] * 8, base_seed=7)
+        task = queue.claim(worker_id)
+        ...
+        queue.complete(task['task_id'], worker_id, run_id, summary)
+
+    Args:
+        shared: Create the queue for workers on several hosts (rollback journal)
+            instead of one (WAL). An existing queue keeps the mode it was created
+            with; None opens it as it is, and a conflicting value is a ValueError.
+    """
+
+    def __init__(self, path: str, timeout: float = 60.0, shared: Optional[bool] = None):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Transactions are managed explicitly (BEGIN IMMEDIATE takes the write lock up front)
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        try:
+            self.shared = self._open_journal(shared)
+        except Exception:
+            self._conn.close()
+            raise
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {QUEUE_SCHEMA_VERSION}")
+
+    def _open_journal(self, shared: Optional[bool]) -> bool:
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            mode = 'DELETE' if shared else 'WAL'
+            self._conn.execute(f"PRAGMA journal_mode = {mode}")
+            return bool(shared)
+        is_shared = self._conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != 'wal'
+        if shared is not None and shared != is_shared:
+            kind = 'shared (multi-host)' if is_shared else 'local (single-host)'
+            raise ValueError(f"Queue {self.path} was created as {kind}")
+        return is_shared
+
+    def _resolve_dir(self, output_dir: Optional[str]) -> Optional[str]:
+        # Sweep output directories are stored relative to the queue file
+        if output_dir is None:
+            return None
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(self.path)), output_dir))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _write(self):
+        return _WriteTransaction(self._conn)
+
+    # ── Submitting ──
+
+    def submit(self, sweep_id: str, task_id: str, driver: str, params: Dict, seed: int,
+               max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        """
+        Add one task. Submitting a task_id again is a no-op if it is the same
+        task, and a ValueError if driver, params or seed differ.
+
+        Returns:
+            True if the task was added.
+        """
+        with self._write() as conn:
+            return self._insert_task(conn, sweep_id, task_id, driver, params, seed, max_attempts)
+
+    def _insert_task(self, conn, sweep_id, task_id, driver, params, seed, max_attempts) -> bool:
+        if driver not in DRIVERS and ':' not in driver:
+            raise ValueError(f"Unknown driver {driver!r}; choose from {sorted(DRIVERS)} or 'module:function'")
+        params_json = _dumps(params)
+        existing = conn.execute("SELECT sweep_id, driver, params, seed FROM tasks WHERE task_id = ?",
+                                (task_id,)).fetchone()
+        if existing is not None:
+            if tuple(existing) != (sweep_id, driver, params_json, int(seed)):
+                raise ValueError(f"Task {task_id} already exists with a different definition")
+            return False
+        conn.execute("INSERT INTO tasks (task_id, sweep_id, driver, params, seed, max_attempts) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", (task_id, sweep_id, driver, params_json, int(seed), max_attempts))
+        return True
+
+    def submit_sweep(self, sweep_id: str, driver: str, params_list: Sequence[Dict], base_seed: int = 0,
+                     seeds: Sequence[int] = None, output_dir: str = '../output',
+                     max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[str]:
+        """
+        Add one task per params dict, with task ids <sweep_id>_t0000, ...
+
+        Args:
+            seeds: Explicit per-task seeds; by default derived from base_seed, so
+                resubmitting the same sweep reproduces the same tasks
+            output_dir: Base output directory for the task runs and the catalog
+                (stored relative to the queue file)
+
+        Returns:
+            Ids of all tasks of the sweep (including ones already queued).
+        """
+        if seeds is None:
+            seeds = derive_seeds(base_seed, len(params_list))
+        if len(seeds) != len(params_list):
+            raise ValueError("seeds and params_list must have the same length")
+        task_ids = [f"{sweep_id}_t{i:04d}" for i in range(len(params_list))]
+        try:
+            stored_dir = os.path.relpath(os.path.abspath(output_dir), os.path.dirname(os.path.abspath(self.path)))
+        except ValueError:
+            stored_dir = os.path.abspath(output_dir)  # another drive on Windows
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO sweeps (sweep_id, output_dir, base_seed, created_at) "
+                         "VALUES (?, ?, ?, ?)", (sweep_id, stored_dir, base_seed,
+                                                 datetime.now().isoformat(timespec='seconds')))
+            for task_id, params, seed in zip(task_ids, params_list, seeds):
+                self._insert_task(conn, sweep_id, task_id, driver, params, seed, max_attempts)
+        return task_ids
+
+    # ── Claiming ──
+
+    def claim(self, worker_id: str, lease_s: float = DEFAULT_LEASE_S) -> Optional[Dict]:
+        """
+        Claim the next pending task, or a running task whose lease expired.
+        Expired tasks that used up their attempts are marked failed instead.
+
+        Returns:
+            The task as a dict (params decoded, plus the sweep's output_dir), or None.
+        """
+        now = time.time()
+        with self._write() as conn:
+            expired = conn.execute(
+                "SELECT task_id, sweep_id FROM tasks WHERE status = 'running' AND lease_expires < ? "
+                "AND attempts >= max_attempts", (now,)).fetchall()
+            for row in expired:
+                conn.execute("UPDATE tasks SET status = 'failed', finished_at = ?, "
+                             "error = 'lease expired on last attempt' WHERE task_id = ?", (now, row['task_id']))
+            row = conn.execute(
+                "SELECT task_id FROM tasks WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY task_id LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET status = 'running', worker = ?, attempts = attempts + 1, "
+                             "claimed_at = ?, lease_expires = ? WHERE task_id = ?",
+                             (worker_id, now, now + lease_s, row['task_id']))
+            for sweep_id in sorted({r['sweep_id'] for r in expired}):
+                self._publish(sweep_id)
+        return self.get_task(row['task_id']) if row is not None else None
+
+    def renew(self, task_id: str, worker_id: str, lease_s: float = DEFAULT_LEASE_S) -> bool:
+        """Extend the lease of a running task; False if worker_id no longer holds it."""
+        with self._write() as conn:
+            cursor = conn.execute("UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND worker = ? "
+                                  "AND status = 'running'", (time.time() + lease_s, task_id, worker_id))
+            return cursor.rowcount == 1
+
+    # ── Finishing ──
+
+    def complete(self, task_id: str, worker_id: str, run_id: str, summary: Dict) -> bool:
+        """
+        Record a task's result and fold it into the sweep aggregate. Ignored
+        (returns False) unless worker_id still holds the task.
+        """
+        summary_json = _dumps(summary)
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', finished_at = ?, run_id = ?, summary = ?, error = NULL "
+                "WHERE task_id = ? AND worker = ? AND status = 'running'",
+                (time.time(), run_id, summary_json, task_id, worker_id))
+            if cursor.rowcount != 1:
+                return False
+            sweep_id = conn.execute("SELECT sweep_id FROM tasks WHERE task_id = ?", (task_id,)).fetchone()[0]
+            for metric, value in numeric_metrics(json.loads(summary_json)).items():
+                conn.execute(
+                    "INSERT INTO sweep_metrics VALUES (?, ?, 1, ?, ?, ?, ?) "
+                    "ON CONFLICT (sweep_id, metric) DO UPDATE SET count = count + 1, total = total + excluded.total, "
+                    "total_sq = total_sq + excluded.total_sq, min_value = MIN(min_value, excluded.min_value), "
+                    "max_value = MAX(max_value, excluded.max_value)",
+                    (sweep_id, metric, value, value * value, value, value))
+            self._publish(sweep_id)
+        return True
+
+    def fail(self, task_id: str, worker_id: str, error: str) -> Optional[str]:
+        """
+        Record a failed attempt. The task goes back to pending while it has
+        attempts left, otherwise it is marked failed.
+
+        Returns:
+            The new status, or None if worker_id no longer holds the task.
+        """
+        with self._write() as conn:
+            row = conn.execute("SELECT sweep_id, attempts, max_attempts FROM tasks WHERE task_id = ? "
+                               "AND worker = ? AND status = 'running'", (task_id, worker_id)).fetchone()
+            if row is None:
+                return None
+            status = 'pending' if row['attempts'] < row['max_attempts'] else 'failed'
+            conn.execute("UPDATE tasks SET status = ?, worker = NULL, lease_expires = NULL, finished_at = ?, "
+                         "error = ? WHERE task_id = ?",
+                         (status, time.time() if status == 'failed' else None, error, task_id))
+            if status == 'failed':
+                self._publish(row['sweep_id'])
+        return status
+
+    # ── Queries ──
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict:
+        task = dict(row)
+        task['params'] = json.loads(task['params'])
+        task['summary'] = json.loads(task['summary']) if task['summary'] else None
+        task['output_dir'] = self._resolve_dir(task['output_dir'])
+        return task
+
+    def get_task(self, task_id: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT t.*, s.output_dir FROM tasks t LEFT JOIN sweeps s USING (sweep_id) "
+                                 "WHERE task_id = ?", (task_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def tasks(self, sweep_id: str = None, status: str = None) -> List[Dict]:
+        query = "SELECT t.*, s.output_dir FROM tasks t LEFT JOIN sweeps s USING (sweep_id)"
+        clauses, values = [], []
+        if sweep_id is not None:
+            clauses.append("sweep_id = ?")
+            values.append(sweep_id)
+        if status is not None:
+            clauses.append("status = ?")
+            values.append(status)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return [self._row_to_dict(row) for row in self._conn.execute(query + " ORDER BY task_id", values)]
+
+    def sweep_ids(self) -> List[str]:
+        return [row[0] for row in self._conn.execute("SELECT sweep_id FROM sweeps ORDER BY created_at, sweep_id")]
+
+    def progress(self, sweep_id: str = None) -> Dict[str, int]:
+        """Task counts per status (all four statuses present) plus 'total'."""
+        query = "SELECT status, COUNT(*) FROM tasks"
+        values = ()
+        if sweep_id is not None:
+            query += " WHERE sweep_id = ?"
+            values = (sweep_id,)
+        counts = dict.fromkeys(TASK_STATUSES, 0)
+        counts.update(self._conn.execute(query + " GROUP BY status", values).fetchall())
+        counts['total'] = sum(counts[s] for s in TASK_STATUSES)
+        return counts
+
+    def running_aggregate(self, sweep_id: str) -> Dict[str, Dict]:
+        """The streaming per-metric aggregate over the tasks finished so far."""
+        aggregate = {}
+        for row in self._conn.execute("SELECT * FROM sweep_metrics WHERE sweep_id = ? ORDER BY metric", (sweep_id,)):
+            mean = row['total'] / row['count']
+            variance = max(row['total_sq'] / row['count'] - mean * mean, 0.0)
+            aggregate[row['metric']] = {'count': row['count'], 'mean': mean, 'std': math.sqrt(variance),
+                                        'min': row['min_value'], 'max': row['max_value']}
+        return aggregate
+
+    def sweep_aggregate(self, sweep_id: str) -> Dict[str, Dict]:
+        """The per-metric aggregate over all finished tasks, computed exactly in task order."""
+        return aggregate_summaries([task['summary'] for task in self.tasks(sweep_id, status='done')])
+
+    def publish(self, sweep_id: str) -> Optional[str]:
+        """
+        Write the sweep's row to the run catalog in its output_dir: task
+        progress and the aggregate as flat '<metric>_<stat>' summary keys.
+        Status 'running' while tasks remain, then 'completed' (or 'partial'
+        when some tasks failed).
+
+        Returns:
+            Catalog path, or None for an unknown sweep.
+        """
+        with self._write():
+            return self._publish(sweep_id)
+
+    def _publish(self, sweep_id: str) -> Optional[str]:
+        # Called inside a write transaction: no task can change state until the row is written
+        row = self._conn.execute("SELECT * FROM sweeps WHERE sweep_id = ?", (sweep_id,)).fetchone()
+        if row is None:
+            return None
+        progress = self.progress(sweep_id)
+        finished = progress['pending'] == 0 and progress['running'] == 0
+        aggregate = self.sweep_aggregate(sweep_id) if finished else self.running_aggregate(sweep_id)
+        summary = {'tasks_total': progress['total'], 'tasks_done': progress['done'],
+                   'tasks_failed': progress['failed']}
+        for metric, stats in aggregate.items():
+            for stat, value in stats.items():
+                summary[f"{metric}_{stat}"] = value
+        drivers = sorted({r[0] for r in self._conn.execute("SELECT DISTINCT driver FROM tasks WHERE sweep_id = ?",
+                                                           (sweep_id,))})
+        status = 'running' if not finished else ('completed' if progress['failed'] == 0 else 'partial')
+        path = get_catalog_path(self._resolve_dir(row['output_dir']))
+        with RunCatalog(path) as catalog:
+            catalog.record_run(sweep_id, 'sweep', None,
+                               params={'drivers': drivers, 'base_seed': row['base_seed'],
+                                       'queue': os.path.abspath(self.path)},
+                               summary=summary, status=status, created_at=row['created_at'])
+        return path
+
+
+class _WriteTransaction:
+    # BEGIN IMMEDIATE ... COMMIT, rolled back on error
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
+
+
+# ────────────────────────────────────────────────
+# Drivers
+# ────────────────────────────────────────────────
+
+def _run_simulator(task: Dict) -> Tuple[str, Dict]:
+    from simulator import run_simulation
+
+    result = run_simulation(output_dir=task['output_dir'], run_id=task['task_id'], sweep_id=task['sweep_id'],
+                            **task['params'])
+    summary = {k: v for k, v in result['summary'].items() if k not in ('output_dir', 'result_cube_path')}
+    return result['run_id'], summary
+
+
+def _run_sim4(task: Dict) -> Tuple[str, Dict]:
+    from sim4 import run_hybrid_stress_simulation
+
+    result = run_hybrid_stress_simulation(output_dir_base=os.path.join(task['output_dir'], task['task_id']),
+                                          sweep_id=task['sweep_id'], **task['params'])
+    return os.path.basename(result['output_dir']), result['summary']
+
+
+# Driver name → fn(task) returning (run_id, summary). The task dict has params,
+# seed, task_id, sweep_id and output_dir; runs it records should carry the
+# sweep_id. A task driver may also be 'module:function' with the same signature.
+DRIVERS: Dict[str, Callable] = {
+    'simulator': _run_simulator,
+    'sim4': _run_sim4,
+}
+
+
+def resolve_driver(name: str) -> Callable:
+    if name in DRIVERS:
+        return DRIVERS[name]
+    module, _, function = name.partition(':')
+    return getattr(import_module(module), function)
+
+
+def seed_task(seed: int) -> None:
+    """Seed the generators the drivers draw from (positions use random, noise uses numpy)."""
+    import random
+
+    import numpy as np
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def run_task(task: Dict) -> Tuple[str, Dict]:
+    """Run a claimed task in this process: seed, then call its driver."""
+    seed_task(task['seed'])
+    return resolve_driver(task['driver'])(task)
+
+
+# ────────────────────────────────────────────────
+# Workers
+# ────────────────────────────────────────────────
+
+class _LeaseKeeper(threading.Thread):
+    # Renews a task's lease from its own connection while the driver runs
+    def __init__(self, queue_path: str, task_id: str, worker_id: str, lease_s: float):
+        super().__init__(daemon=True)
+        self.queue_path, self.task_id, self.worker_id, self.lease_s = queue_path, task_id, worker_id, lease_s
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        with WorkQueue(self.queue_path) as queue:
+            while not self._stop_event.wait(self.lease_s / 3):
+                if not queue.renew(self.task_id, self.worker_id, self.lease_s):
+                    return
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def run_worker(queue_path: str, worker_id: str = None, lease_s: float = DEFAULT_LEASE_S,
+               max_tasks: int = None, poll_s: float = DEFAULT_POLL_S, wait: bool = False) -> int:
+    """
+    Claim and run tasks until the queue is drained (or max_tasks are done).
+
+    Args:
+        wait: Keep polling every poll_s seconds when nothing is claimable while
+            tasks are still running elsewhere (their leases may expire)
+
+    Returns:
+        Number of tasks this worker completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    with WorkQueue(queue_path) as queue:
+        while max_tasks is None or completed < max_tasks:
+            task = queue.claim(worker_id, lease_s)
+            if task is None:
+                progress = queue.progress()
+                if wait and (progress['pending'] or progress['running']):
+                    time.sleep(poll_s)
+                    continue
+                break
+
+            print(f"[{worker_id}] {task['task_id']} ({task['driver']}, attempt {task['attempts']}, "
+                  f"seed {task['seed']})")
+            keeper = _LeaseKeeper(queue_path, task['task_id'], worker_id, lease_s)
+            keeper.start()
+            try:
+                run_id, summary = run_task(task)
+            except Exception:
+                keeper.stop()
+                status = queue.fail(task['task_id'], worker_id, traceback.format_exc())
+                print(f"[{worker_id}] {task['task_id']} failed → {status}")
+                continue
+            keeper.stop()
+            try:
+                recorded = queue.complete(task['task_id'], worker_id, run_id, summary)
+            except (sqlite3.Error, OSError):
+                # The catalog could not be updated, so the completion was rolled back: retry the task
+                status = queue.fail(task['task_id'], worker_id, traceback.format_exc())
+                print(f"[{worker_id}] {task['task_id']}: could not record the result → {status}")
+                continue
+            if recorded:
+                completed += 1
+            else:
+                print(f"[{worker_id}] {task['task_id']}: lease lost, result discarded")
+    return completed
+
+
+def run_workers(queue_path: str, n_workers: int = None, **worker_kwargs) -> List[int]:
+    """
+    Run n_workers worker processes on this host (default: one per CPU); returns
+    each one's completed count. For a shared queue, start this on every host.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    n_workers = n_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(partial(run_worker, queue_path, **worker_kwargs)) for _ in range(n_workers)]
+        return [future.result() for future in futures]
+
+
+# ────────────────────────────────────────────────
+# CLI
+# ────────────────────────────────────────────────
+
+def _parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            continue
+    return text
+
+
+def expand_grid(grid: Dict[str, Sequence], repeats: int = 1) -> List[Dict]:
+    """Cartesian product of parameter values, each combination repeated (with its own seed) repeats times."""
+    from itertools import product
+
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in product(*(grid[name] for name in names))]
+    return [dict(combo) for combo in combos for _ in range(repeats)]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Submit, run and monitor simulation sweeps")
+    parser.add_argument('--output-dir', default='../output', help="Base output directory for runs and the catalog")
+    parser.add_argument('--queue', help="Queue path (default: <output-dir>/work_queue.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit_cmd = commands.add_parser('submit', help="Queue a parameter grid as a sweep")
+    submit_cmd.add_argument('sweep_id')
+    submit_cmd.add_argument('--driver', default='simulator', help=f"{sorted(DRIVERS)} or module:function")
+    submit_cmd.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...')
+    submit_cmd.add_argument('--repeats', type=int, default=1, help="Seeds per grid point")
+    submit_cmd.add_argument('--seed', type=int, default=0, help="Base seed the task seeds are derived from")
+    submit_cmd.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS)
+    submit_cmd.add_argument('--shared', action='store_true',
+                            help="Create the queue for workers on several hosts (output dir on shared storage)")
+
+    work_cmd = commands.add_parser('work', help="Run workers until the queue is drained")
+    work_cmd.add_argument('--workers', type=int, default=1)
+    work_cmd.add_argument('--lease', type=float, default=DEFAULT_LEASE_S, help="Lease length in seconds")
+    work_cmd.add_argument('--wait', action='store_true', help="Wait for tasks running on other workers")
+
+    status_cmd = commands.add_parser('status', help="Task counts and the aggregate per sweep")
+    status_cmd.add_argument('sweep_id', nargs='?')
+
+    args = parser.parse_args(argv)
+    queue_path = args.queue or get_queue_path(args.output_dir)
+    if args.command == 'submit':
+        grid = {}
+        for item in args.grid:
+            name, _, values = item.partition('=')
+            grid[name] = [_parse_value(v) for v in values.split(',')]
+        with WorkQueue(queue_path, shared=args.shared or None) as queue:
+            task_ids = queue.submit_sweep(args.sweep_id, args.driver, expand_grid(grid, args.repeats),
+                                          base_seed=args.seed, output_dir=args.output_dir,
+                                          max_attempts=args.max_attempts)
+        print(f"Sweep {args.sweep_id}: {len(task_ids)} tasks in {queue_path}"
+              + (" (shared)" if queue.shared else ""))
+    elif args.command == 'work':
+        kwargs = {'lease_s': args.lease, 'wait': args.wait}
+        if args.workers == 1:
+            completed = [run_worker(queue_path, **kwargs)]
+        else:
+            completed = run_workers(queue_path, args.workers, **kwargs)
+        print(f"Completed {sum(completed)} tasks ({', '.join(map(str, completed))} per worker)")
+    elif args.command == 'status':
+        with WorkQueue(queue_path) as queue:
+            for sweep_id in [args.sweep_id] if args.sweep_id else queue.sweep_ids():
+                progress = queue.progress(sweep_id)
+                print(f"{sweep_id}: " + ", ".join(f"{progress[s]} {s}" for s in TASK_STATUSES)
+                      + f" of {progress['total']}")
+                for metric, stats in queue.sweep_aggregate(sweep_id).items():
+                    print(f"  {metric:<36} mean {stats['mean']:>14.6g}  std {stats['std']:>12.4g}  "
+                          f"min {stats['min']:>12.6g}  max {stats['max']:>12.6g}  (n={stats['count']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,10 @@ from datetime import datetime
 from position_loader import create_positions, N_POSITIONS
 from uniswap.il_v3 import UniswapV3Position
 from aave.aave_original import AaveSimulator
+from aave.policies import StressAdjustedPolicy
+from uniswap.position_book import PositionBook
+from regime_comparison import run_regime_comparison
+from defi_sim.run_summary import RunSummary
 
 # ────────────────────────────────────────────────
 # Step 1: Upfront Preparation (run once)
@@ -44,36 +48,6 @@ LIQUIDATION_THRESHOLD = 1.0
 LTV_MAX = 0.65                # max possible LTV; stress test reduces effective LTV
 
 
-def project_health_under_shock(
-        pos: UniswapV3Position,
-        initial_price: float,
-        shock_pct: float,
-        loan_amount: float,
-        aave: AaveSimulator
-) -> float:
-    shocked_price = initial_price * (1 + shock_pct / 100)
-    if shocked_price <= 0:
-        return 0.0
-    shocked_value = pos.compute_position_value(shocked_price)
-    hf = aave.calculate_health_factor(shocked_value, loan_amount)
-    return hf
-
-
-def compute_worst_projected_hf(
-        pos: UniswapV3Position,
-        open_price: float,
-        loan_amount: float,
-        aave: AaveSimulator
-) -> float:
-    if loan_amount <= 0:
-        return float('inf')
-    projected_hfs = [
-        project_health_under_shock(pos, open_price, shock, loan_amount, aave)
-        for shock in SHOCK_LEVELS_PCT
-    ]
-    return min(projected_hfs) if projected_hfs else float('inf')
-
-
 # ────────────────────────────────────────────────
 # Main Simulation
 # ────────────────────────────────────────────────
@@ -90,86 +64,61 @@ def run_hybrid_stress_simulation(
     positions = prepare_positions_pool(n_positions)
     aave = AaveSimulator()
 
-    timeseries = []
-    total_liquidations_all = 0
-    positions_ever_liquidated = set()
+    # The lender: stress-adjusted loan cap, applied to all positions as array math
+    policy = StressAdjustedPolicy(aave, ltv_max=LTV_MAX, safety_buffer=SAFETY_BUFFER,
+                                  liquidation_threshold=LIQUIDATION_THRESHOLD)
 
     print(f"Simulating {len(price_df)} days with {len(positions)} positions...")
     print(f"Output directory: {output_dir}")
 
-    for idx, row in price_df.iterrows():
-        date = row['date']
-        open_price = float(row['open_price'])
-        close_price = float(row['close_price'])
-        price_change_pct = ((close_price - open_price) / open_price * 100) if open_price > 0 else 0.0
-
-        daily_liquidations = 0
-        liquidated_today = set()
-        hf_values = []
-
-        for pos in positions:
-            pos_value_open = pos.compute_position_value(open_price)
-            if pos_value_open <= 0:
-                continue
-
-            provisional_loan = aave.borrow(pos_value_open)
-
-            # Stress test with provisional loan to estimate risk
-            worst_hf = compute_worst_projected_hf(pos, open_price, provisional_loan, aave)
-
-            # Adjust loan amount downward for stressed positions
-            loan_amount = provisional_loan
-            if worst_hf < float('inf') and worst_hf > 0:
-                stress_factor = 1.0 / (worst_hf + SAFETY_BUFFER)
-                safe_loan = pos_value_open * LTV_MAX / stress_factor
-                loan_amount = min(provisional_loan, safe_loan)
-
-            pos_value_close = pos.compute_position_value(close_price)
-            actual_hf = aave.calculate_health_factor(pos_value_close, loan_amount)
-
-            if actual_hf != float('inf'):
-                hf_values.append(actual_hf)
-
-            # Liquidation check (now benefits from reduced loan_amount)
-            should_liquidate = actual_hf < LIQUIDATION_THRESHOLD
-
-            if should_liquidate:
-                daily_liquidations += 1
-                liquidated_today.add(pos.position_id)
-                positions_ever_liquidated.add(pos.position_id)
-
-        avg_hf = np.mean(hf_values) if hf_values else float('inf')
-        total_liquidations_all += daily_liquidations
-
-        timeseries.append({
-            'date': date,
-            'open_price': open_price,
-            'close_price': close_price,
-            'price_change_pct': price_change_pct,
-            'liquidations_tradfi_adjusted': daily_liquidations,
-            'avg_health_factor': avg_hf,
-            'worst_health_factor': worst_hf,
-            'unique_liquidated_today': len(liquidated_today)
-        })
-
-        if idx % 100 == 0:
-            print(f"{date.date()} | Liq: {daily_liquidations} | Avg HF: {avg_hf:.3f} | Worst HF: {worst_hf:.3f}")
-
+    book = PositionBook.from_positions(positions)
+    result = run_regime_comparison(book, price_df, [policy], shocks_pct=SHOCK_LEVELS_PCT)
+    daily = result['timeseries'][policy.name]
+    policy_summary = result['summary'][policy.name]
+
+    open_prices = price_df['open_price'].to_numpy(dtype=float)
+    close_prices = price_df['close_price'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_change_pct = np.where(open_prices > 0, (close_prices - open_prices) / open_prices * 100, 0.0)
+
+    ts_df = pd.DataFrame({
+        'date': price_df['date'].to_numpy(),
+        'open_price': open_prices,
+        'close_price': close_prices,
+        'price_change_pct': price_change_pct,
+        'liquidations_tradfi_adjusted': daily['liquidations'].to_numpy(),
+        'avg_health_factor': daily['avg_health_factor'].to_numpy(),
+        # Average over positions of the worst projected HF under the shock grid
+        'worst_health_factor': daily['avg_worst_hf'].to_numpy(),
+        'unique_liquidated_today': daily['liquidations'].to_numpy(),
+    })
+
+    worst_hf = ts_df['worst_health_factor']
     summary = {
         'total_dates': len(price_df),
         'total_positions': len(positions),
-        'total_liquidations_all': total_liquidations_all,
-        'unique_positions_ever_liquidated': len(positions_ever_liquidated),
-        'avg_health_factor_all': np.mean([r['avg_health_factor'] for r in timeseries if r['avg_health_factor'] != float('inf')]),
-        'wc_health_factor_all': np.mean([r['worst_health_factor'] for r in timeseries if r['worst_health_factor'] !=
-                                         float('inf')]),
+        'total_liquidations_all': policy_summary['total_liquidations_all'],
+        'unique_positions_ever_liquidated': policy_summary['unique_positions_ever_liquidated'],
+        'avg_health_factor_all': policy_summary['avg_health_factor_all'],
+        'wc_health_factor_all': np.mean(worst_hf[worst_hf != float('inf')]),
     }
 
-    ts_df = pd.DataFrame(timeseries)
     ts_path = os.path.join(output_dir, "hybrid_adjusted_timeseries.csv")
     ts_df.to_csv(ts_path, index=False)
     print(f"Timeseries saved: {ts_path}")
 
+    params = {
+        'n_positions': n_positions,
+        'n_days': len(price_df),
+        'shock_levels_pct': SHOCK_LEVELS_PCT.tolist(),
+        'safety_buffer': SAFETY_BUFFER,
+        'ltv_max': LTV_MAX,
+        'liquidation_threshold': LIQUIDATION_THRESHOLD,
+    }
+    summary_path = RunSummary.from_summary('hybrid_stress_sim', os.path.basename(output_dir), summary,
+                                           params).write(output_dir)
+    print(f"Summary saved to: {summary_path}")
+
     return {
         'timeseries_df': ts_df,
         'summary': summary,
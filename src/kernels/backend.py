@@ -0,0 +1,190 @@
+"""
+Runtime selection of the compute backend for position and lender kernels.
+
+Backends are modules exposing the same functions (position_amounts,
+position_value, hold_value, impermanent_loss, evaluate, health_factor,
+decide_liquidation, worst_shock_hf) over a uniswap.position_book.PositionBook:
+
+    - 'numba': fused JIT-compiled loops (kernels/numba_backend.py), used when numba is installed
+    - 'numpy': plain array math (kernels/numpy_backend.py), always available
+
+Select with get_backend('numpy'), set_backend(...) or the DEFI_SIM_BACKEND
+environment variable; the default 'auto' prefers numba.
+
+'v2' (uniswap/il_v2.py) is an opt-in approximation with the same API: full-range
+valuation that ignores position ranges. It is never picked by 'auto' and is not
+part of the equivalence check.
+
+test_kernels.py checks every numba kernel against the NumPy backend, including
+out-of-range positions, non-positive loans and shocks to non-positive prices:
+    python -m pytest test_kernels.py
+
+Run this module to cross-check every available backend against the scalar
+UniswapV3Position / AaveSimulator math:
+    python -m kernels.backend
+"""
+
+import importlib
+import os
+import random
+from typing import Dict, List
+
+import numpy as np
+
+BACKEND_ENV_VAR = 'DEFI_SIM_BACKEND'
+BACKEND_MODULES = {
+    'numba': 'kernels.numba_backend',
+    'numpy': 'kernels.numpy_backend',
+}
+AUTO_ORDER = ('numba', 'numpy')
+# Same API, different (approximate) results: only used when asked for by name
+APPROXIMATE_BACKEND_MODULES = {
+    'v2': 'uniswap.il_v2',
+}
+
+_loaded = {}
+_default_name = None
+
+
+def _load(name: str):
+    modules = {**BACKEND_MODULES, **APPROXIMATE_BACKEND_MODULES}
+    if name not in modules:
+        raise ValueError(f"Unknown backend {name!r}; choose from {sorted(modules)} or 'auto'")
+    if name not in _loaded:
+        _loaded[name] = importlib.import_module(modules[name])
+    return _loaded[name]
+
+
+def available_backends() -> List[str]:
+    """Names of the backends that can be imported in this environment."""
+    names = []
+    for name in BACKEND_MODULES:
+        try:
+            _load(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name: str = None):
+    """
+    Return a backend module.
+
+    Args:
+        name: 'numba', 'numpy', 'v2' or 'auto'. Defaults to set_backend(), then the
+            DEFI_SIM_BACKEND environment variable, then 'auto'.
+            A requested backend that cannot be imported falls back to NumPy.
+    """
+    if name is None:
+        name = _default_name or os.environ.get(BACKEND_ENV_VAR, 'auto')
+    name = name.lower()
+
+    if name == 'auto':
+        for candidate in AUTO_ORDER:
+            try:
+                return _load(candidate)
+            except ImportError:
+                continue
+
+    try:
+        return _load(name)
+    except ImportError:
+        print(f"Warning: backend {name!r} not available. Falling back to the NumPy backend.")
+        print("Install with: pip install numba")
+        return _load('numpy')
+
+
+def set_backend(name: str = None) -> None:
+    """Set the process-wide default backend (None restores env/auto selection)."""
+    global _default_name
+    if name is not None:
+        get_backend(name)  # validate early
+    _default_name = name
+
+
+def check_equivalence(positions, prices, shocks_pct, aave=None, rtol: float = 1e-12) -> Dict[str, Dict[str, float]]:
+    """
+    Cross-check every available backend against the scalar reference implementation.
+
+    Args:
+        positions: List of UniswapV3Position objects
+        prices: Prices to evaluate at (open price = prices[i], close price = prices[i + 1])
+        shocks_pct: Shock levels (percent) for the worst-HF kernel
+        aave: AaveSimulator supplying the lender parameters
+        rtol: Relative tolerance
+
+    Returns:
+        {backend_name: {kernel_name: max relative error}}
+
+    Raises:
+        AssertionError if any kernel differs from the reference by more than rtol.
+    """
+    from aave.aave_original import AaveSimulator
+    from uniswap.position_book import PositionBook
+
+    aave = aave or AaveSimulator()
+    book = PositionBook.from_positions(positions)
+
+    def rel_err(actual, expected):
+        actual, expected = np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64)
+        both_inf = np.isinf(actual) & np.isinf(expected) & (np.sign(actual) == np.sign(expected))
+        diff = np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-300)
+        diff = np.where(both_inf, 0.0, diff)
+        return float(diff.max()) if diff.size else 0.0
+
+    report = {}
+    for name in available_backends():
+        backend = _load(name)
+        errors = {}
+        for open_price, close_price in zip(prices[:-1], prices[1:]):
+            ref_open = [p.compute_position_value(open_price) for p in positions]
+            ref_close = [p.compute_position_value(close_price) for p in positions]
+            ref_hold = [p.compute_hold_value(close_price) for p in positions]
+            ref_il = [p.compute_impermanent_loss(close_price) for p in positions]
+            loans = [aave.borrow(v) for v in ref_open]
+            ref_decisions = [aave.decide_liquidation(v, loan) for v, loan in zip(ref_close, loans)]
+
+            value_open, value_close, hold_close, il_close = backend.evaluate(book, open_price, close_price)
+            liquidate, hf, repay, collateral = backend.decide_liquidation(
+                value_close, loans, aave.liquidation_threshold, aave.close_factor, aave.liquidation_bonus)
+            worst = backend.worst_shock_hf(book, open_price, shocks_pct, loans, aave.liquidation_threshold)
+            ref_worst = [min(aave.calculate_health_factor(p.compute_position_value(open_price * (1 + s / 100)), loan)
+                             for s in shocks_pct) for p, loan in zip(positions, loans)]
+
+            checks = {
+                'position_value': (backend.position_value(book, close_price), ref_close),
+                'hold_value': (backend.hold_value(book, close_price), ref_hold),
+                'impermanent_loss': (backend.impermanent_loss(book, close_price), ref_il),
+                'evaluate': (np.concatenate([value_open, value_close, hold_close, il_close]),
+                             np.concatenate([ref_open, ref_close, ref_hold, ref_il])),
+                'health_factor': (hf, [d['health_factor'] for d in ref_decisions]),
+                'repay_amount': (repay, [d['repay_amount'] for d in ref_decisions]),
+                'collateral_to_take': (collateral, [d['collateral_to_take'] for d in ref_decisions]),
+                'worst_shock_hf': (worst, ref_worst),
+            }
+            if list(liquidate) != [d['should_liquidate'] for d in ref_decisions]:
+                raise AssertionError(f"{name}: liquidation decisions differ at close price {close_price}")
+            for kernel, (actual, expected) in checks.items():
+                errors[kernel] = max(errors.get(kernel, 0.0), rel_err(actual, expected))
+
+        for kernel, err in errors.items():
+            if err > rtol:
+                raise AssertionError(f"{name}.{kernel} differs from the scalar reference (max rel err {err:.3e})")
+        report[name] = errors
+    return report
+
+
+if __name__ == "__main__":
+    from position_loader import create_positions
+
+    random.seed(42)
+    positions = create_positions(n_positions=2000)
+    # Walk through, below and above every position's range
+    prices = [2500.0, 2450.0, 1200.0, 900.0, 3100.0, 4800.0, 2500.0, 2600.0]
+    shocks = np.array([-15, -12, -9, -6, -3, 0, 3, 6, 9, 12, 15])
+
+    print(f"Default backend: {get_backend().NAME}")
+    for backend_name, errors in check_equivalence(positions, prices, shocks).items():
+        worst_err = max(errors.values())
+        print(f"{backend_name:<6} OK  (max rel err {worst_err:.2e} over {len(errors)} kernels)")
@@ -0,0 +1,192 @@
+"""
+Numba compute backend for the position and lender kernels.
+
+Same functions and results as kernels/numpy_backend.py. Each kernel is a single
+JIT-compiled loop over the book, so derived quantities (value, hold value, IL,
+worst shocked HF) are computed per position in registers. The NumPy version
+allocates a temporary array at every step instead.
+
+Importing this module raises ImportError when numba is not installed;
+kernels/backend.py then falls back to the NumPy backend.
+"""
+
+import math
+
+import numpy as np
+from numba import njit
+
+NAME = 'numba'
+
+
+# ────────────────────────────────────────────────
+# Scalar helpers (inlined into the loops below)
+# ────────────────────────────────────────────────
+
+@njit(cache=True, inline='always')
+def _value_at(price, liquidity, sqrt_lower, sqrt_upper):
+    # Clipping sqrt(price) to the range reproduces the three branches of get_amounts
+    sqrt_price = min(max(math.sqrt(price), sqrt_lower), sqrt_upper)
+    amount_eth = liquidity * (1 / sqrt_price - 1 / sqrt_upper)
+    amount_usdc = liquidity * (sqrt_price - sqrt_lower)
+    return amount_eth * price + amount_usdc
+
+
+# ────────────────────────────────────────────────
+# Kernels
+# ────────────────────────────────────────────────
+
+@njit(cache=True, nogil=True)
+def _amounts_kernel(prices, liquidity, sqrt_lower, sqrt_upper, out_eth, out_usdc):
+    for i in range(liquidity.shape[0]):
+        sqrt_price = min(max(math.sqrt(prices[i]), sqrt_lower[i]), sqrt_upper[i])
+        out_eth[i] = liquidity[i] * (1 / sqrt_price - 1 / sqrt_upper[i])
+        out_usdc[i] = liquidity[i] * (sqrt_price - sqrt_lower[i])
+
+
+@njit(cache=True, nogil=True)
+def _value_kernel(prices, liquidity, sqrt_lower, sqrt_upper, out):
+    for i in range(liquidity.shape[0]):
+        out[i] = _value_at(prices[i], liquidity[i], sqrt_lower[i], sqrt_upper[i])
+
+
+@njit(cache=True, nogil=True)
+def _hold_kernel(prices, actual_eth, actual_usdc, out):
+    for i in range(actual_eth.shape[0]):
+        out[i] = actual_eth[i] * prices[i] + actual_usdc[i]
+
+
+@njit(cache=True, nogil=True)
+def _il_kernel(prices, liquidity, sqrt_lower, sqrt_upper, actual_eth, actual_usdc, out):
+    for i in range(liquidity.shape[0]):
+        value = _value_at(prices[i], liquidity[i], sqrt_lower[i], sqrt_upper[i])
+        hold = actual_eth[i] * prices[i] + actual_usdc[i]
+        out[i] = value / hold - 1 if hold != 0 else 0.0
+
+
+@njit(cache=True, nogil=True)
+def _evaluate_kernel(open_prices, close_prices, liquidity, sqrt_lower, sqrt_upper, actual_eth, actual_usdc,
+                     out_value_open, out_value_close, out_hold_close, out_il_close):
+    for i in range(liquidity.shape[0]):
+        out_value_open[i] = _value_at(open_prices[i], liquidity[i], sqrt_lower[i], sqrt_upper[i])
+        value_close = _value_at(close_prices[i], liquidity[i], sqrt_lower[i], sqrt_upper[i])
+        hold_close = actual_eth[i] * close_prices[i] + actual_usdc[i]
+        out_value_close[i] = value_close
+        out_hold_close[i] = hold_close
+        out_il_close[i] = value_close / hold_close - 1 if hold_close != 0 else 0.0
+
+
+@njit(cache=True, nogil=True)
+def _health_factor_kernel(values, loans, liquidation_threshold, out):
+    for i in range(values.shape[0]):
+        out[i] = values[i] * liquidation_threshold / loans[i] if loans[i] > 0 else np.inf
+
+
+@njit(cache=True, nogil=True)
+def _decide_kernel(values, loans, liquidation_threshold, close_factor, liquidation_bonus,
+                   out_liquidate, out_hf, out_repay, out_collateral):
+    for i in range(values.shape[0]):
+        hf = values[i] * liquidation_threshold / loans[i] if loans[i] > 0 else np.inf
+        out_hf[i] = hf
+        if hf < 1.0:
+            repay = loans[i] * close_factor
+            out_liquidate[i] = True
+            out_repay[i] = repay
+            out_collateral[i] = repay * (1 + liquidation_bonus)
+        else:
+            out_liquidate[i] = False
+            out_repay[i] = 0.0
+            out_collateral[i] = 0.0
+
+
+@njit(cache=True, nogil=True)
+def _worst_shock_kernel(open_prices, shock_factors, loans, liquidation_threshold,
+                        liquidity, sqrt_lower, sqrt_upper, out):
+    for i in range(liquidity.shape[0]):
+        loan = loans[i]
+        if loan <= 0:
+            out[i] = np.inf
+            continue
+        worst = np.inf
+        for s in range(shock_factors.shape[0]):
+            shocked_price = shock_factors[s] * open_prices[i]
+            if shocked_price <= 0:
+                hf = 0.0
+            else:
+                hf = _value_at(shocked_price, liquidity[i], sqrt_lower[i], sqrt_upper[i]) * liquidation_threshold / loan
+            if hf < worst:
+                worst = hf
+        out[i] = worst
+
+
+# ────────────────────────────────────────────────
+# Backend API (same signatures as numpy_backend)
+# ────────────────────────────────────────────────
+
+def _prices(price, n):
+    """Broadcast a scalar or per-position price to a length-n view without copying."""
+    return np.broadcast_to(np.asarray(price, dtype=np.float64), (n,))
+
+
+def position_amounts(book, price):
+    n = len(book)
+    amount_eth = np.empty(n)
+    amount_usdc = np.empty(n)
+    _amounts_kernel(_prices(price, n), book.liquidity, book.sqrt_lower, book.sqrt_upper, amount_eth, amount_usdc)
+    return amount_eth, amount_usdc
+
+
+def position_value(book, price):
+    n = len(book)
+    out = np.empty(n)
+    _value_kernel(_prices(price, n), book.liquidity, book.sqrt_lower, book.sqrt_upper, out)
+    return out
+
+
+def hold_value(book, price):
+    n = len(book)
+    out = np.empty(n)
+    _hold_kernel(_prices(price, n), book.actual_eth, book.actual_usdc, out)
+    return out
+
+
+def impermanent_loss(book, price):
+    n = len(book)
+    out = np.empty(n)
+    _il_kernel(_prices(price, n), book.liquidity, book.sqrt_lower, book.sqrt_upper,
+               book.actual_eth, book.actual_usdc, out)
+    return out
+
+
+def evaluate(book, open_price, close_price):
+    n = len(book)
+    value_open, value_close, hold_close, il_close = np.empty(n), np.empty(n), np.empty(n), np.empty(n)
+    _evaluate_kernel(_prices(open_price, n), _prices(close_price, n), book.liquidity, book.sqrt_lower,
+                     book.sqrt_upper, book.actual_eth, book.actual_usdc,
+                     value_open, value_close, hold_close, il_close)
+    return value_open, value_close, hold_close, il_close
+
+
+def health_factor(values, loans, liquidation_threshold):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(values.shape[0])
+    _health_factor_kernel(values, np.asarray(loans, dtype=np.float64), float(liquidation_threshold), out)
+    return out
+
+
+def decide_liquidation(values, loans, liquidation_threshold, close_factor, liquidation_bonus):
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    should_liquidate = np.empty(n, dtype=np.bool_)
+    hf, repay, collateral = np.empty(n), np.empty(n), np.empty(n)
+    _decide_kernel(values, np.asarray(loans, dtype=np.float64), float(liquidation_threshold),
+                   float(close_factor), float(liquidation_bonus), should_liquidate, hf, repay, collateral)
+    return should_liquidate, hf, repay, collateral
+
+
+def worst_shock_hf(book, open_price, shocks_pct, loans, liquidation_threshold):
+    n = len(book)
+    out = np.empty(n)
+    shock_factors = 1 + np.asarray(shocks_pct, dtype=np.float64) / 100
+    _worst_shock_kernel(_prices(open_price, n), shock_factors, np.asarray(loans, dtype=np.float64),
+                        float(liquidation_threshold), book.liquidity, book.sqrt_lower, book.sqrt_upper, out)
+    return out
@@ -0,0 +1,95 @@
+"""
+NumPy compute backend for the position and lender kernels.
+
+Array versions of UniswapV3Position.get_amounts / compute_position_value /
+compute_hold_value / compute_impermanent_loss and of the AaveSimulator health
+factor and liquidation rules. Prices may be a scalar or one price per position.
+
+Out-of-range prices are handled by clipping sqrt(price) to
+[sqrt_lower, sqrt_upper], which reproduces the three branches of get_amounts
+exactly.
+"""
+
+import numpy as np
+
+NAME = 'numpy'
+
+
+def position_amounts(book, price):
+    """(amount_eth, amount_usdc) arrays for every position in the book."""
+    sqrt_price = np.clip(np.sqrt(price), book.sqrt_lower, book.sqrt_upper)
+    amount_eth = book.liquidity * (1 / sqrt_price - 1 / book.sqrt_upper)
+    amount_usdc = book.liquidity * (sqrt_price - book.sqrt_lower)
+    return amount_eth, amount_usdc
+
+
+def position_value(book, price):
+    amount_eth, amount_usdc = position_amounts(book, price)
+    return amount_eth * price + amount_usdc
+
+
+def hold_value(book, price):
+    return book.actual_eth * price + book.actual_usdc
+
+
+def impermanent_loss(book, price):
+    value = position_value(book, price)
+    hold = hold_value(book, price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(hold != 0, value / hold - 1, 0.0)
+
+
+def evaluate(book, open_price, close_price):
+    """
+    Value every position at open and close in one pass.
+
+    Returns:
+        (value_open, value_close, hold_close, il_close)
+    """
+    value_open = position_value(book, open_price)
+    value_close = position_value(book, close_price)
+    hold_close = hold_value(book, close_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        il_close = np.where(hold_close != 0, value_close / hold_close - 1, 0.0)
+    return value_open, value_close, hold_close, il_close
+
+
+def health_factor(values, loans, liquidation_threshold):
+    """HF = value * liquidation_threshold / loan, +inf where loan <= 0."""
+    values = np.asarray(values, dtype=np.float64)
+    loans = np.asarray(loans, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(loans > 0, values * liquidation_threshold / loans, np.inf)
+
+
+def decide_liquidation(values, loans, liquidation_threshold, close_factor, liquidation_bonus):
+    """
+    Batch AaveSimulator.decide_liquidation.
+
+    Returns:
+        (should_liquidate, health_factor, repay_amount, collateral_to_take)
+    """
+    hf = health_factor(values, loans, liquidation_threshold)
+    should_liquidate = hf < 1.0
+    repay = np.where(should_liquidate, np.asarray(loans, dtype=np.float64) * close_factor, 0.0)
+    collateral = repay * (1 + liquidation_bonus)
+    return should_liquidate, hf, repay, collateral
+
+
+def worst_shock_hf(book, open_price, shocks_pct, loans, liquidation_threshold):
+    """
+    Worst HF over the shocked prices open_price * (1 + shock / 100), per position.
+
+    Matches compute_worst_projected_hf in direct mode: a non-positive shocked
+    price projects HF 0, a non-positive loan gives +inf.
+    """
+    shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+    loans = np.asarray(loans, dtype=np.float64)
+    open_prices = np.broadcast_to(np.asarray(open_price, dtype=np.float64), (len(book),))
+    shocked_prices = np.multiply.outer(1 + shocks_pct / 100, open_prices)    # (n_shocks, n_positions)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = position_value(book, shocked_prices)
+        hfs = np.where(loans > 0, values * liquidation_threshold / loans, np.inf)
+    hfs = np.where(shocked_prices > 0, hfs, 0.0)
+    worst = hfs.min(axis=0) if len(shocks_pct) else np.full(len(book), np.inf)
+    return np.where(loans > 0, worst, np.inf)
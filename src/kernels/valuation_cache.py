@@ -0,0 +1,149 @@
+"""
+Bounded LRU cache of per-book valuation vectors.
+
+Stress shocks are relative to the open price, so the same shocked prices recur
+across policies, sweep iterations and reruns in one process. A sweep also often
+revalues an identical position book under different lender parameters. The
+cache keys each position_value vector by (book fingerprint, backend, price):
+
+    cache = get_valuation_cache()
+    values = cache.position_value(book, price, backend)
+    print(cache.stats())     # hits, misses, hit_rate, evictions, entries, bytes
+
+The fingerprint is a hash of the book's arrays, so equal books built separately
+(e.g. the same seed in two sweep iterations) share entries. It is computed once
+per book object. A book changed in place afterwards must be passed to
+invalidate(). Cached vectors are read-only. Only scalar prices are cached;
+per-position price arrays are computed directly.
+"""
+
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ValuationCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = None):
+        """
+        Args:
+            max_bytes: Evict least recently used vectors beyond this many bytes
+            max_entries: Optional limit on the number of cached vectors
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._fingerprints = weakref.WeakKeyDictionary()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ────────────────────────────────────────────────
+    # Keys
+    # ────────────────────────────────────────────────
+
+    def fingerprint(self, book) -> str:
+        """Content hash of the book's position arrays (and pool tags), cached per book object."""
+        digest = self._fingerprints.get(book)
+        if digest is None:
+            h = hashlib.blake2b(digest_size=16)
+            h.update(np.ascontiguousarray(book.data).tobytes())
+            if book.pool_index is not None:
+                h.update(np.ascontiguousarray(book.pool_index).tobytes())
+            digest = h.hexdigest()
+            self._fingerprints[book] = digest
+        return digest
+
+    def invalidate(self, book) -> None:
+        """Forget the fingerprint of a book that was modified in place."""
+        self._fingerprints.pop(book, None)
+
+    # ────────────────────────────────────────────────
+    # Lookup
+    # ────────────────────────────────────────────────
+
+    def get_or_compute(self, key: Tuple, compute) -> np.ndarray:
+        """Cached vector for key, or compute() stored (read-only) under key."""
+        values = self._entries.get(key)
+        if values is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return values
+        self.misses += 1
+        values = np.asarray(compute())
+        values.flags.writeable = False
+        self._entries[key] = values
+        self.nbytes += values.nbytes
+        self._evict()
+        return values
+
+    def position_value(self, book, price, backend=None) -> np.ndarray:
+        """backend.position_value(book, price), from the cache for scalar prices."""
+        from kernels.backend import get_backend
+
+        backend = get_backend(backend) if backend is None or isinstance(backend, str) else backend
+        if np.ndim(price) != 0:
+            return backend.position_value(book, price)
+        price = float(price)
+        return self.get_or_compute((self.fingerprint(book), backend.NAME, 'value', price),
+                                   lambda: backend.position_value(book, price))
+
+    def _evict(self) -> None:
+        while self._entries and (self.nbytes > self.max_bytes or
+                                 (self.max_entries is not None and len(self._entries) > self.max_entries)):
+            _, values = self._entries.popitem(last=False)
+            self.nbytes -= values.nbytes
+            self.evictions += 1
+
+    # ────────────────────────────────────────────────
+    # Stats
+    # ────────────────────────────────────────────────
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self, since: Dict = None) -> Dict:
+        """
+        Counters and current size. With since (an earlier stats() result), hits,
+        misses, hit_rate and evictions cover only the lookups made after it.
+        """
+        since = since or {}
+        hits = self.hits - since.get('hits', 0)
+        misses = self.misses - since.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'evictions': self.evictions - since.get('evictions', 0),
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = self.misses = self.evictions = 0
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+
+_shared_cache = None
+
+
+def get_valuation_cache() -> ValuationCache:
+    """The process-wide cache shared by policies and sweep iterations."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ValuationCache()
+    return _shared_cache
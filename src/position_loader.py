@@ -1,6 +1,10 @@
 from typing import List
 import random
+
+import numpy as np
+
 from uniswap.il_v3 import UniswapV3Position
+from uniswap.position_book import PositionBook
 
 # ────────────────────────────────────────────────
 # Simulation parameters (module-level defaults)
@@ -12,7 +16,8 @@ MIN_RANGE_WIDTH = 0.10   # ±10%
 MAX_RANGE_WIDTH = 0.60   # ±60%
 INITIAL_ETH_PRICE = 2500.0  # Realistic mid-Jan 2026 assumption
 
-__all__ = ["create_positions", "N_POSITIONS", "MIN_FUNDING", "MAX_FUNDING", "INITIAL_ETH_PRICE"]
+__all__ = ["create_positions", "create_position_book", "create_multi_pool_book", "N_POSITIONS", "MIN_FUNDING",
+           "MAX_FUNDING", "INITIAL_ETH_PRICE"]
 
 def create_positions(
         n_positions: int = N_POSITIONS,
@@ -52,6 +57,80 @@ def create_positions(
     return results
 
 
+def create_position_book(
+        n_positions: int = N_POSITIONS,
+        min_funding: float = MIN_FUNDING,
+        max_funding: float = MAX_FUNDING,
+        min_range_width: float = MIN_RANGE_WIDTH,
+        max_range_width: float = MAX_RANGE_WIDTH,
+        initial_eth_price: float = INITIAL_ETH_PRICE,
+        id_prefix: str = "id#",
+) -> PositionBook:
+    """
+    Create the same positions as create_positions, stored as a compact PositionBook.
+
+    Draws the same random numbers in the same order, so after random.seed(s) both
+    functions describe identical positions; no UniswapV3Position objects are built.
+    """
+    eth_max = np.empty(n_positions)
+    usdc_max = np.empty(n_positions)
+    range_width = np.empty(n_positions)
+
+    for i in range(n_positions):
+        total_funding = random.uniform(min_funding, max_funding)
+        eth_ratio = random.uniform(0.3, 0.7)
+        eth_max_value = total_funding * eth_ratio
+        usdc_max[i] = total_funding * (1 - eth_ratio)
+        eth_max[i] = eth_max_value / initial_eth_price
+        range_width[i] = random.uniform(min_range_width, max_range_width)
+
+    return PositionBook.from_deposits(eth_max, usdc_max, range_width, id_prefix=id_prefix)
+
+
+def create_multi_pool_book(
+        registry,
+        asset_prices,
+        n_positions: int = N_POSITIONS,
+        pool_weights=None,
+        min_funding: float = MIN_FUNDING,
+        max_funding: float = MAX_FUNDING,
+        min_range_width: float = MIN_RANGE_WIDTH,
+        max_range_width: float = MAX_RANGE_WIDTH,
+        id_prefix: str = "id#",
+) -> PositionBook:
+    """
+    Create positions spread over the pools of a uniswap.pools.PoolRegistry.
+
+    Each position picks a pool (weighted by pool_weights, uniform by default), a
+    USD funding and a base/quote split as in create_positions, and converts them
+    to maximum base and quote amounts at asset_prices (USD, in registry.assets
+    order). Ranges are centered on the pool price base_usd / quote_usd, so every
+    position starts in range. As in a v3 mint, the deposit is the most liquidity
+    both maxima allow at that price.
+    """
+    asset_prices = np.asarray(asset_prices, dtype=np.float64)
+    base_usd = asset_prices[registry.base_index]
+    quote_usd = asset_prices[registry.quote_index]
+
+    pool_index = np.empty(n_positions, dtype=np.int32)
+    base_max = np.empty(n_positions)
+    quote_max = np.empty(n_positions)
+    range_width = np.empty(n_positions)
+    pools = range(len(registry))
+
+    for i in range(n_positions):
+        pool = random.choices(pools, weights=pool_weights)[0]
+        total_funding = random.uniform(min_funding, max_funding)
+        base_ratio = random.uniform(0.3, 0.7)
+        pool_index[i] = pool
+        base_max[i] = total_funding * base_ratio / base_usd[pool]
+        quote_max[i] = total_funding * (1 - base_ratio) / quote_usd[pool]
+        range_width[i] = random.uniform(min_range_width, max_range_width)
+
+    return PositionBook.from_deposits(base_max, quote_max, range_width, id_prefix=id_prefix, pool_index=pool_index,
+                                      initial_price=(base_usd / quote_usd)[pool_index])
+
+
 if __name__ == "__main__":
     # Example usage when run as a script (no side effects on import)
     positions = create_positions(n_positions=10)
@@ -0,0 +1,88 @@
+"""
+Days x assets price matrix (USD) for multi-pool simulations.
+
+data_loader.df holds one asset (ETH). A PriceMatrix aligns any number of
+per-asset price frames on their common dates and stores the open and close
+prices as two (n_days, n_assets) float64 arrays, in the column order of a
+uniswap.pools.PoolRegistry. One row is everything a pool-tagged book needs
+for a day:
+
+    matrix = PriceMatrix.from_frames(registry, {'ETH': data_loader.df, 'WBTC': wbtc_df})
+    for day in range(len(matrix)):
+        evaluation = registry.evaluate_usd(book, matrix.open[day], matrix.close[day])
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from uniswap.pools import PoolRegistry
+
+# Assets priced at 1 USD unless a frame is given for them
+STABLE_ASSETS = ('USDC', 'USDT', 'DAI', 'USD')
+
+
+@dataclass
+class PriceMatrix:
+    dates: pd.DatetimeIndex
+    assets: Sequence[str]
+    open: np.ndarray    # (n_days, n_assets)
+    close: np.ndarray   # (n_days, n_assets)
+
+    def __post_init__(self):
+        self.assets = list(self.assets)
+        shape = (len(self.dates), len(self.assets))
+        if self.open.shape != shape or self.close.shape != shape:
+            raise ValueError(f"open and close must have shape {shape}")
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def column(self, asset: str) -> int:
+        return self.assets.index(asset)
+
+    def asset_frame(self, asset: str) -> pd.DataFrame:
+        """One asset as a data_loader-style frame (date, open_price, close_price)."""
+        k = self.column(asset)
+        return pd.DataFrame({'date': self.dates, 'open_price': self.open[:, k], 'close_price': self.close[:, k]})
+
+    @classmethod
+    def from_frames(cls, registry: PoolRegistry, frames: Dict[str, pd.DataFrame],
+                    stable_assets: Sequence[str] = STABLE_ASSETS) -> "PriceMatrix":
+        """
+        Align per-asset frames (date, open_price, close_price columns) on their common dates.
+
+        Assets of the registry without a frame are priced at 1 when they are in
+        stable_assets. Any other missing asset raises KeyError.
+        """
+        missing = [a for a in registry.assets if a not in frames and a not in stable_assets]
+        if missing:
+            raise KeyError(f"No price data for assets {missing}")
+
+        series = {}
+        for asset, frame in frames.items():
+            indexed = frame.set_index(pd.to_datetime(frame['date']))
+            series[(asset, 'open')] = indexed['open_price']
+            series[(asset, 'close')] = indexed['close_price']
+        aligned = pd.concat(series, axis=1, join='inner').sort_index() if series else None
+        if aligned is None or aligned.empty:
+            raise ValueError("The price frames share no dates")
+
+        n_days = len(aligned)
+        open_prices = np.ones((n_days, len(registry.assets)))
+        close_prices = np.ones((n_days, len(registry.assets)))
+        for k, asset in enumerate(registry.assets):
+            if asset in frames:
+                open_prices[:, k] = aligned[(asset, 'open')].to_numpy(dtype=np.float64)
+                close_prices[:, k] = aligned[(asset, 'close')].to_numpy(dtype=np.float64)
+        return cls(aligned.index, registry.assets, open_prices, close_prices)
+
+    @classmethod
+    def from_data_loader(cls, registry: PoolRegistry = None) -> "PriceMatrix":
+        """ETH from data_loader.df, stablecoins at 1 (the assets of uniswap.pools.default_registry())."""
+        import data_loader
+        from uniswap.pools import default_registry
+
+        return cls.from_frames(registry or default_registry(), {'ETH': data_loader.df})
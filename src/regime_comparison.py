@@ -0,0 +1,286 @@
+# regime_comparison.py
+# DeFi vs TradFi comparison in one pass: every position is valued once per day
+# (open, close and the shocked open prices) and all lender policies are applied
+# to the same valuations, producing date-aligned per-policy timeseries.
+
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from aave.policies import POLICIES, DayContext, LenderPolicy
+from kernels.backend import get_backend
+from kernels.valuation_cache import ValuationCache
+from position_loader import create_position_book, N_POSITIONS
+from risk_factors import load_risk_factors, scale_shocks, vol_column
+from uniswap.fees import FeeModel
+from uniswap.greeks import approximation_error, delta_gamma_values
+from uniswap.position_book import PositionBook
+from defi_sim.instrumentation import NULL_METRICS, create_run_metrics
+from defi_sim.run_catalog import hash_inputs, record_run, timing_from_metrics
+from defi_sim.run_summary import RunSummary
+
+SHOCK_LEVELS_PCT = np.array([-15, -12, -9, -6, -3, 0, 3, 6, 9, 12, 15])
+
+# Per-policy daily fields, in CSV column order
+TIMESERIES_FIELDS = ['liquidations', 'avg_health_factor', 'avg_effective_ltv', 'reductions_applied', 'total_loans',
+                     'avg_worst_hf']
+
+VOLATILITY_WINDOW = 30  # realized volatility window behind DayContext.volatility
+
+# How the stress matrix is built: full revaluation at every shock, or the
+# delta-gamma polynomial from one greeks pass (uniswap.greeks)
+STRESS_MODES = ('exact', 'delta_gamma')
+
+
+def default_policies() -> List[LenderPolicy]:
+    """Every policy in aave.policies with its default parameters (fixed_ltv first, as the baseline)."""
+    return [policy_cls() for policy_cls in POLICIES.values()]
+
+
+def shocked_values(book: PositionBook, open_price: float, shocks_pct, backend=None,
+                   cache: Optional[ValuationCache] = None) -> np.ndarray:
+    """
+    Position values at each shocked open price, shape (n_positions, n_shocks).
+    Shocks that take the price to zero or below value the position at 0.
+    With a cache, each shocked price's vector is looked up there first.
+    """
+    backend = backend or get_backend()
+    factors = 1 + np.asarray(shocks_pct, dtype=np.float64) / 100
+    values = np.zeros((len(factors), len(book)))
+    for s, factor in enumerate(factors):
+        shocked_price = open_price * factor
+        if shocked_price > 0:
+            values[s] = (cache.position_value(book, shocked_price, backend) if cache is not None
+                         else backend.position_value(book, shocked_price))
+    return values.T
+
+
+def run_regime_comparison(book: PositionBook, price_df: pd.DataFrame, policies: List[LenderPolicy] = None,
+                          shocks_pct=SHOCK_LEVELS_PCT, backend=None, metrics=NULL_METRICS,
+                          shock_scaling: Optional[str] = None, fee_model: Optional[FeeModel] = None,
+                          volume=None, stress_mode: str = 'exact',
+                          valuation_cache: Optional[ValuationCache] = None) -> Dict:
+    """
+    Apply several lender policies to one position set over the price history.
+
+    Positions with no value at the open take no loan that day, as in sim4.
+
+    Args:
+        book: Positions to simulate
+        price_df: Frame with date, open_price and close_price columns
+        policies: LenderPolicy objects (default: default_policies())
+        shocks_pct: Shock grid (percent) for the stress matrix
+        backend: Compute backend name or module (default: kernels.backend.get_backend())
+        metrics: RunMetrics for per-stage timings
+        shock_scaling: Risk factor column (e.g. 'ewma_vol') that stretches the shock
+            grid each day via risk_factors.scale_shocks; None keeps the grid fixed
+        fee_model: Add swap fees accrued so far (held in USDC, unaffected by shocks)
+            to every position's collateral value; None values the liquidity only
+        volume: Daily total_volume aligned with price_df for the fee model
+            (default: data_loader.volume for data_loader.df)
+        stress_mode: 'exact' revalues every position at every shock; 'delta_gamma'
+            approximates the shocked values from each position's delta and gamma
+        valuation_cache: Look up open, close and shocked valuations in this cache
+            (e.g. kernels.valuation_cache.get_valuation_cache(), shared across a
+            sweep); its stats are recorded in metrics
+
+    Returns a dict with:
+        - timeseries: {policy name: DataFrame indexed by date with TIMESERIES_FIELDS}
+          (avg_worst_hf is NaN for policies without a worst_hf() stress projection)
+        - combined: one DataFrame with (policy, field) columns plus the prices
+        - summary: {policy name: aggregate stats}
+    """
+    if stress_mode not in STRESS_MODES:
+        raise ValueError(f"Unknown stress_mode {stress_mode!r}; choose from {STRESS_MODES}")
+    policies = policies if policies is not None else default_policies()
+    backend = get_backend(backend) if backend is None or isinstance(backend, str) else backend
+    n_days = len(price_df)
+    dates = pd.DatetimeIndex(price_df['date'])
+    open_prices = price_df['open_price'].to_numpy(dtype=np.float64)
+    close_prices = price_df['close_price'].to_numpy(dtype=np.float64)
+    shocks_pct = np.asarray(shocks_pct)
+    with metrics.stage('risk_factors'):
+        factors = load_risk_factors(price_df)
+        factor_arrays = {name: factors[name].to_numpy() for name in factors.columns if name != 'date'}
+    volatility = factor_arrays[vol_column(VOLATILITY_WINDOW)]
+
+    cache_start = valuation_cache.stats() if valuation_cache is not None else None
+    fees = fee_model.iter_cumulative(book, price_df, volume) if fee_model is not None else None
+    fees_open = np.zeros(len(book))  # fees accrued through the previous close
+
+    daily = {policy.name: {name: np.zeros(n_days) for name in TIMESERIES_FIELDS} for policy in policies}
+    ever_liquidated = {policy.name: np.zeros(len(book), dtype=bool) for policy in policies}
+
+    for day in range(n_days):
+        open_price, close_price = open_prices[day], close_prices[day]
+        risk = {name: values[day] for name, values in factor_arrays.items()}
+        day_shocks = scale_shocks(shocks_pct, risk[shock_scaling]) if shock_scaling else shocks_pct
+
+        with metrics.stage('valuation'):
+            if valuation_cache is not None:
+                values_open = valuation_cache.position_value(book, open_price, backend)
+                values_close = valuation_cache.position_value(book, close_price, backend)
+            else:
+                values_open, values_close, _, _ = backend.evaluate(book, open_price, close_price)
+            active = values_open > 0
+            if fees is not None:
+                fees_close = next(fees)
+                values_open = np.where(active, values_open + fees_open, values_open)
+                values_close = values_close + fees_close
+        metrics.count('valuation', positions=len(book))
+
+        with metrics.stage('stress_projection'):
+            if stress_mode == 'delta_gamma':
+                stress_matrix = delta_gamma_values(book, open_price, day_shocks)
+            else:
+                stress_matrix = shocked_values(book, open_price, day_shocks, backend, valuation_cache)
+            if fees is not None:
+                stress_matrix += np.where(active, fees_open, 0.0)[:, None]
+        metrics.count('stress_projection', positions=len(book))
+
+        context = DayContext(day, open_price, close_price, day_shocks, book, backend, volatility[day], risk)
+        for policy in policies:
+            with metrics.stage(f'policy:{policy.name}'):
+                policy.begin_day(context)
+                loans = np.where(active, policy.size_loans(values_open, stress_matrix), 0.0)
+                decisions = policy.decide(values_close, loans)
+
+                hf = decisions.health_factor[active]
+                finite_hf = hf[np.isfinite(hf)]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ltv = np.clip(loans[active] / values_open[active], 0, 1)
+                liquidated = decisions.should_liquidate & active
+
+                record = daily[policy.name]
+                record['liquidations'][day] = np.count_nonzero(liquidated)
+                record['avg_health_factor'][day] = finite_hf.mean() if finite_hf.size else np.inf
+                record['avg_effective_ltv'][day] = ltv.mean() if ltv.size else 0.0
+                # Positions lent less than the plain Aave loan
+                reduced = loans[active] < values_open[active] * policy.aave.ltv_max
+                record['reductions_applied'][day] = np.count_nonzero(reduced)
+                record['total_loans'][day] = loans.sum()
+                ever_liquidated[policy.name] |= liquidated
+                # The worst HF size_loans() already computed; policies without it are projected here
+                worst = getattr(policy, 'last_worst_hf', None)
+                if worst is None and hasattr(policy, 'worst_hf'):
+                    worst = policy.worst_hf(values_open, stress_matrix)
+                if worst is not None:
+                    worst = worst[active]
+                    worst = worst[np.isfinite(worst)]
+                    record['avg_worst_hf'][day] = worst.mean() if worst.size else np.inf
+                else:
+                    record['avg_worst_hf'][day] = np.nan
+            metrics.count(f'policy:{policy.name}', positions=len(book))
+
+        if fees is not None:
+            fees_open = fees_close  # tomorrow opens with everything accrued through today's close
+
+        if day % 100 == 0:
+            status = ' | '.join(f"{p.name}: {int(daily[p.name]['liquidations'][day])}" for p in policies)
+            print(f"{dates[day].date()} | Liq {status}")
+
+    if valuation_cache is not None:
+        metrics.cache_stats('valuation_cache', valuation_cache.stats(since=cache_start))
+
+    timeseries, summary = {}, {}
+    for policy in policies:
+        record = daily[policy.name]
+        df = pd.DataFrame(record, index=dates)
+        df['liquidations'] = df['liquidations'].astype(np.int64)
+        df['reductions_applied'] = df['reductions_applied'].astype(np.int64)
+        timeseries[policy.name] = df
+
+        finite_daily_hf = record['avg_health_factor'][np.isfinite(record['avg_health_factor'])]
+        summary[policy.name] = {
+            'total_dates': n_days,
+            'total_positions': len(book),
+            'total_liquidations_all': int(record['liquidations'].sum()),
+            'unique_positions_ever_liquidated': int(np.count_nonzero(ever_liquidated[policy.name])),
+            'avg_health_factor_all': float(finite_daily_hf.mean()) if finite_daily_hf.size else float('inf'),
+            'avg_effective_ltv_all': float(record['avg_effective_ltv'].mean()) if n_days else 0.0,
+            'total_reductions_applied': int(record['reductions_applied'].sum()),
+        }
+
+    combined = pd.concat(timeseries, axis=1, names=['policy', 'field'])
+    combined.insert(0, ('price', 'open_price'), open_prices)
+    combined.insert(1, ('price', 'close_price'), close_prices)
+    return {'timeseries': timeseries, 'combined': combined, 'summary': summary}
+
+
+def run_comparison(output_dir_base: str = "../output/comparison", n_positions: int = N_POSITIONS,
+                   policies: List[LenderPolicy] = None, collect_metrics: bool = None, profile: str = None,
+                   shock_scaling: Optional[str] = None, fee_model: Optional[FeeModel] = None,
+                   stress_mode: str = 'exact', valuation_cache: Optional[ValuationCache] = None) -> Dict:
+    """Driver: one position set, all policies, per-policy CSVs + a combined CSV + summary.json."""
+    import data_loader
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    output_dir = f"{output_dir_base}_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = os.path.basename(output_dir)
+
+    metrics = create_run_metrics('comparison', run_id, enabled=collect_metrics, profile=profile)
+    with metrics.profiling(output_dir):
+        with metrics.stage('setup'):
+            price_df = data_loader.df
+            book = create_position_book(n_positions)
+            policies = policies if policies is not None else default_policies()
+        result = run_regime_comparison(book, price_df, policies, metrics=metrics, shock_scaling=shock_scaling,
+                                       fee_model=fee_model, stress_mode=stress_mode,
+                                       valuation_cache=valuation_cache)
+
+    with metrics.stage('timeseries_csv_write'):
+        artifacts = {}
+        for name, df in result['timeseries'].items():
+            path = os.path.join(output_dir, f"{name}_timeseries.csv")
+            df.to_csv(path, index_label='date')
+            artifacts[f"{name}_timeseries_csv"] = path
+        combined = result['combined'].copy()
+        combined.columns = [f"{policy}.{field}" if policy != 'price' else field for policy, field in combined.columns]
+        combined_path = os.path.join(output_dir, "comparison_timeseries.csv")
+        combined.to_csv(combined_path, index_label='date')
+        artifacts['comparison_timeseries_csv'] = combined_path
+        if stress_mode == 'delta_gamma':
+            # Approximation error against full revaluation, at the last open price
+            error_path = os.path.join(output_dir, "delta_gamma_error.csv")
+            approximation_error(book, price_df['open_price'].iloc[-1], SHOCK_LEVELS_PCT).to_csv(error_path)
+            artifacts['delta_gamma_error_csv'] = error_path
+
+    print("\n===== COMPARISON SUMMARY =====")
+    for name, stats in result['summary'].items():
+        print(f"  {name:<16} liquidations={stats['total_liquidations_all']:>7}  "
+              f"avg HF={stats['avg_health_factor_all']:.4f}  avg LTV={stats['avg_effective_ltv_all']:.4f}")
+
+    params = {
+        'n_positions': n_positions,
+        'n_days': len(price_df),
+        'policies': [policy.name for policy in policies],
+        'shock_levels_pct': SHOCK_LEVELS_PCT.tolist(),
+        'shock_scaling': shock_scaling,
+        'fee_model': asdict(fee_model) if fee_model is not None else None,
+        'stress_mode': stress_mode,
+    }
+    flat_metrics = {f"{name}.{key}": value for name, stats in result['summary'].items() for key, value in stats.items()
+                    if key not in ('total_dates', 'total_positions')}
+    artifacts['summary_json'] = RunSummary(driver='comparison', run_id=run_id, total_dates=len(price_df),
+                                           total_positions=n_positions, metrics=flat_metrics,
+                                           params=params).write(output_dir)
+    artifacts['run_metrics'] = metrics.write(output_dir)
+    if artifacts['run_metrics']:
+        metrics.print_report()
+
+    record_run(os.path.dirname(output_dir) or '.', run_id, 'comparison', output_dir,
+               params=params, input_hashes=hash_inputs(price_df, book), summary=flat_metrics,
+               timing=timing_from_metrics(metrics.as_dict()), artifacts=artifacts)
+
+    result['output_dir'] = output_dir
+    result['metrics'] = metrics
+    return result
+
+
+if __name__ == "__main__":
+    run_comparison()
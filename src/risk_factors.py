@@ -0,0 +1,156 @@
+"""
+Risk factors precomputed over the price series for dynamic margin policies.
+
+One pass over the daily closes builds, for every day:
+    - rolling realized volatility over several windows (annualized)
+    - RiskMetrics-style EWMA volatility (annualized)
+    - drawdown from the running peak and the worst drawdown so far
+    - rolling quantiles of daily log returns (historical VaR-style tails)
+
+Every factor on day t uses closes up to day t-1 only. That is what is known at
+day t's open, when loans are sized, so policies can read the row directly with
+no look-ahead. Rolling std and EWMA are O(n) online updates, and drawdown is a
+running max. The rolling quantiles use pandas' skiplist, which is O(n log window).
+
+The frame is computed once per price series and cached in memory and on disk
+under data/.cache, keyed by a hash of the price data and the parameters:
+
+    factors = load_risk_factors(data_loader.df)
+    shocks = scale_shocks(SHOCK_LEVELS_PCT, factors['ewma_vol'].iloc[day])
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+VOL_WINDOWS = (7, 30, 90)
+EWMA_LAMBDA = 0.94  # RiskMetrics daily decay
+QUANTILE_WINDOW = 365
+RETURN_QUANTILES = (0.01, 0.05, 0.95, 0.99)
+ANNUALIZATION = 365  # crypto trades every day
+
+# Annualized volatility at which scale_shocks() leaves the shock grid unchanged
+REFERENCE_VOL = 0.75
+
+CACHE_DIR = Path(__file__).parent.parent / 'data' / '.cache'
+
+_memory_cache: Dict[str, pd.DataFrame] = {}
+
+
+def vol_column(window: int) -> str:
+    return f"vol_{window}d"
+
+
+def quantile_column(q: float, window: int = QUANTILE_WINDOW) -> str:
+    return f"return_q{round(q * 100):02d}_{window}d"
+
+
+def compute_risk_factors(price_df: pd.DataFrame, vol_windows: Sequence[int] = VOL_WINDOWS,
+                         ewma_lambda: float = EWMA_LAMBDA, quantile_window: int = QUANTILE_WINDOW,
+                         quantiles: Sequence[float] = RETURN_QUANTILES) -> pd.DataFrame:
+    """
+    Risk factors for each row of price_df, known at that row's open.
+
+    Args:
+        price_df: Frame with date and close_price columns (data_loader.df)
+        vol_windows: Rolling windows (days) for realized volatility
+        ewma_lambda: EWMA decay of squared returns
+        quantile_window: Rolling window (days) for the return quantiles
+        quantiles: Return quantiles to compute
+
+    Returns:
+        DataFrame on price_df's index with a date column, log_return (the previous
+        day's close-to-close return), vol_<w>d, ewma_vol, drawdown, max_drawdown and
+        return_q<pp>_<window>d columns. Values are NaN until their window has filled.
+    """
+    close = price_df['close_price'].astype(np.float64).reset_index(drop=True)
+    log_returns = np.log(close).diff()
+
+    factors = {'log_return': log_returns}
+    for window in vol_windows:
+        factors[vol_column(window)] = log_returns.rolling(window).std() * np.sqrt(ANNUALIZATION)
+    # EWMA variance: sigma2_t = lambda * sigma2_{t-1} + (1 - lambda) * r_t^2
+    ewma_var = (log_returns ** 2).ewm(alpha=1 - ewma_lambda, adjust=False, ignore_na=True).mean()
+    factors['ewma_vol'] = np.sqrt(ewma_var * ANNUALIZATION)
+    drawdown = close / close.cummax() - 1
+    factors['drawdown'] = drawdown
+    factors['max_drawdown'] = drawdown.cummin()
+    rolling = log_returns.rolling(quantile_window)
+    for q in quantiles:
+        factors[quantile_column(q, quantile_window)] = rolling.quantile(q)
+
+    # Shift by one day: the close-based factors of day t-1 are what day t's open knows
+    out = pd.DataFrame(factors).shift(1)
+    out.index = price_df.index
+    out.insert(0, 'date', price_df['date'].to_numpy())
+    return out
+
+
+def _cache_key(price_df: pd.DataFrame, params: Dict) -> str:
+    digest = hashlib.sha256(pd.util.hash_pandas_object(price_df[['date', 'close_price']], index=False).values.tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def load_risk_factors(price_df: pd.DataFrame = None, use_disk_cache: bool = True, **params) -> pd.DataFrame:
+    """
+    compute_risk_factors() with caching: in memory for the process, and on disk
+    (data/.cache/risk_factors_<key>.pkl) across runs.
+
+    Args:
+        price_df: Price frame (default: data_loader.df)
+        use_disk_cache: Read and write the on-disk cache
+        **params: Passed to compute_risk_factors (part of the cache key)
+    """
+    if price_df is None:
+        import data_loader
+        price_df = data_loader.df
+
+    defaults = {'vol_windows': list(VOL_WINDOWS), 'ewma_lambda': EWMA_LAMBDA,
+                'quantile_window': QUANTILE_WINDOW, 'quantiles': list(RETURN_QUANTILES)}
+    resolved = {**defaults, **{k: list(v) if isinstance(v, tuple) else v for k, v in params.items()}}
+    key = _cache_key(price_df, resolved)
+
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    path = CACHE_DIR / f"risk_factors_{key}.pkl"
+    factors = None
+    if use_disk_cache and path.exists():
+        try:
+            factors = pd.read_pickle(path)
+        except Exception as e:
+            print(f"Warning: ignoring unreadable risk factor cache {path}: {e}")
+    if factors is None:
+        factors = compute_risk_factors(price_df, **resolved)
+        if use_disk_cache:
+            try:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                factors.to_pickle(path)
+            except OSError as e:
+                print(f"Warning: could not write risk factor cache {path}: {e}")
+
+    _memory_cache[key] = factors
+    return factors
+
+
+def scale_shocks(shocks_pct, volatility: float, reference_vol: float = REFERENCE_VOL,
+                 bounds: Tuple[float, float] = (0.5, 3.0)) -> np.ndarray:
+    """
+    Stretch a shock grid by volatility / reference_vol, clipped to bounds.
+    A missing or non-positive volatility leaves the grid unchanged.
+    """
+    shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+    if volatility is None or not np.isfinite(volatility) or volatility <= 0:
+        return shocks_pct
+    return shocks_pct * float(np.clip(volatility / reference_vol, *bounds))
+
+
+if __name__ == "__main__":
+    factors = load_risk_factors()
+    print(factors.describe().T.to_string())
@@ -11,11 +11,18 @@ import pandas as pd
 from sklearn.linear_model import LinearRegression
 
 from aave.aave_original import AaveSimulator
+from aave.policies import SlidingLTVPolicy
 # ────────────────────────────────────────────────
 # Import your existing modules
 # ────────────────────────────────────────────────
 from position_loader import create_positions, N_POSITIONS
 from uniswap.il_v3 import UniswapV3Position
+from uniswap.position_book import PositionBook
+from regime_comparison import run_regime_comparison
+from defi_sim.artifacts import read_timeseries, resolve_artifact
+from defi_sim.instrumentation import create_run_metrics
+from defi_sim.run_catalog import hash_file, hash_inputs, record_run, timing_from_metrics
+from defi_sim.run_summary import RunSummary
 
 # ────────────────────────────────────────────────
 # Configuration
@@ -23,8 +30,9 @@ from uniswap.il_v3 import UniswapV3Position
 REGRESSION_MODE = True  # True → use regression + IL adj for projections (low liqs)
 # False → direct per-position value recompute (current/high liqs)
 IL_ADJUST_FACTOR = 0.5  # Scale for IL impact in regression mode (0.3-0.7 typical)
-HISTORICAL_CSV_PATH = "../output/run_20260111_122829/liquidation_timeseries.csv"  # Adjust to your actual file
-# path/name
+# Simulator run whose liquidation_timeseries.csv trains the regression (resolved via the run catalog)
+HISTORICAL_RUN_ID = "run_20260111_122829"
+HISTORICAL_CSV = "liquidation_timeseries.csv"
 
 SHOCK_LEVELS_PCT = np.array([-15, -12, -9, -6, -3, 0, 3, 6, 9, 12, 15])
 SAFETY_BUFFER = 0.6  # cushion (higher = less de-leveraging)
@@ -93,24 +101,35 @@ def compute_worst_projected_hf(
 
 def run_hybrid_stress_simulation(
         output_dir_base: str = "../output/tradefi_adjusted",
-        n_positions: int = N_POSITIONS
+        n_positions: int = N_POSITIONS,
+        collect_metrics: bool = None,
+        profile: str = None,
+        sweep_id: str = None
 ) -> Dict:
     global REGRESSION_MODE
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
     output_dir = f"{output_dir_base}_{timestamp}"
     os.makedirs(output_dir, exist_ok=True)
 
-    price_df = load_historical_data()
-    positions = prepare_positions_pool(n_positions)
-    aave = AaveSimulator()
+    # Per-stage timings → run_metrics.json (optional cProfile/pyinstrument capture)
+    metrics = create_run_metrics('sim4', os.path.basename(output_dir), enabled=collect_metrics, profile=profile)
+    metrics.start_profiling(output_dir)
+
+    with metrics.stage('setup'):
+        price_df = load_historical_data()
+        positions = prepare_positions_pool(n_positions)
+        book = PositionBook.from_positions(positions)
+        aave = AaveSimulator()
 
     # Fit regression model if in REGRESSION_MODE
     model = None
+    historical_csv_path = None
     if REGRESSION_MODE:
         try:
-            hist_df = pd.read_csv(HISTORICAL_CSV_PATH)
+            historical_csv_path = resolve_artifact(HISTORICAL_CSV, run_id=HISTORICAL_RUN_ID)
+            hist_df = read_timeseries(historical_csv_path)
             hist_df = hist_df.dropna(subset=['price_change', 'average_health_factor'])  # adjust column names if needed
-            print("Model data read from CSV:" + HISTORICAL_CSV_PATH)
+            print("Model data read from CSV:" + historical_csv_path)
 
             X = hist_df['price_change'].values.reshape(-1, 1)  # or 'price_change'
             y = hist_df['average_health_factor'].values
@@ -124,111 +143,55 @@ def run_hybrid_stress_simulation(
             print(f"Regression model fitted: slope={model.coef_[0]:.4f}, intercept={model.intercept_:.4f}")
             print(f"Training rows used: {len(X)}")
         except Exception as e:
-            print(f"Warning: Could not fit regression model from {HISTORICAL_CSV_PATH}: {e}")
+            print(f"Warning: Could not fit regression model from {historical_csv_path or HISTORICAL_RUN_ID}: {e}")
             print("Falling back to direct mode for this run.")
             REGRESSION_MODE = False  # disable if fit fails
 
-    timeseries = []
-    total_liquidations_all = 0
-    positions_ever_liquidated = set()
+    # The lender: sim4 sliding tiers + stress cap, applied to all positions as array math
+    policy = SlidingLTVPolicy(aave, ltv_max=LTV_MAX, safety_buffer=SAFETY_BUFFER,
+                              liquidation_threshold=LIQUIDATION_THRESHOLD,
+                              regression_model=model if REGRESSION_MODE else None,
+                              il_adjust_factor=IL_ADJUST_FACTOR)
 
     print(f"Simulating {len(price_df)} days with {len(positions)} positions...")
     print(f"Output directory: {output_dir}")
     print(f"Mode: {'Regression + IL adj' if REGRESSION_MODE else 'Direct per-position'}")
 
-    for idx, row in price_df.iterrows():
-        date = row['date']
-        open_price = float(row['open_price'])
-        close_price = float(row['close_price'])
-        price_change_pct = ((close_price - open_price) / open_price * 100) if open_price > 0 else 0.0
-
-        daily_liquidations = 0
-        liquidated_today = set()
-        hf_values = []
-        daily_ltvs = []                  # for avg effective LTV
-        reductions_applied = 0           # count of positions reduced
-
-        for pos in positions:
-            pos_value_open = pos.compute_position_value(open_price)
-            if pos_value_open <= 0:
-                continue
-
-            provisional_loan = aave.borrow(pos_value_open)
-
-            # Stress test → worst projected HF
-            worst_hf = compute_worst_projected_hf(pos, open_price, provisional_loan, aave, model)
-
-            # Adjust loan downward if stressed
-            loan_amount = provisional_loan
-            if worst_hf < float('inf') and worst_hf > 0:
-
-                max_allowed_ltv = LTV_MAX
-                if worst_hf < 1.2:
-                    max_allowed_ltv = 0.55
-                elif worst_hf < 1.0:
-                    max_allowed_ltv = 0.45
-                elif worst_hf < 0.8:
-                    max_allowed_ltv = 0.35
-
-                sliding_safe_loan = pos_value_open * max_allowed_ltv
-
-                stress_factor = 1.0 / (worst_hf + SAFETY_BUFFER)
-                stress_safe_loan = pos_value_open * LTV_MAX / stress_factor
-
-                safe_loan = min(sliding_safe_loan, stress_safe_loan)
-                loan_amount = min(provisional_loan, safe_loan)
-
-            # Log effective LTV and reduction
-            effective_ltv = min(max(loan_amount / pos_value_open if pos_value_open > 0 else 0, 0), 1)
-            daily_ltvs.append(effective_ltv)
-            if loan_amount < provisional_loan:
-                reductions_applied += 1
-
-            pos_value_close = pos.compute_position_value(close_price)
-            actual_hf = aave.calculate_health_factor(pos_value_close, loan_amount)
-
-            if actual_hf != float('inf'):
-                hf_values.append(actual_hf)
-
-            should_liquidate = actual_hf < LIQUIDATION_THRESHOLD
-
-            if should_liquidate:
-                daily_liquidations += 1
-                liquidated_today.add(pos.position_id)
-                positions_ever_liquidated.add(pos.position_id)
-
-        avg_hf = np.mean(hf_values) if hf_values else float('inf')
-        avg_ltv = np.mean(daily_ltvs) if daily_ltvs else 0.0
-        total_liquidations_all += daily_liquidations
-
-        timeseries.append({
-            'date': date,
-            'open_price': open_price,
-            'close_price': close_price,
-            'price_change_pct': price_change_pct,
-            'liquidations_tradfi_adjusted': daily_liquidations,
-            'avg_health_factor': avg_hf,
-            'avg_effective_ltv': avg_ltv,
-            'reductions_applied_today': reductions_applied,
-            'unique_liquidated_today': len(liquidated_today)
-        })
-
-        if idx % 100 == 0:
-            print(f"{date.date()} | Liq: {daily_liquidations} | Avg HF: {avg_hf:.3f} | Avg LTV: {avg_ltv:.3f} | Reductions: {reductions_applied}")
+    result = run_regime_comparison(book, price_df, [policy], shocks_pct=SHOCK_LEVELS_PCT, metrics=metrics)
+    daily = result['timeseries'][policy.name]
+    policy_summary = result['summary'][policy.name]
+
+    open_prices = price_df['open_price'].to_numpy(dtype=float)
+    close_prices = price_df['close_price'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_change_pct = np.where(open_prices > 0, (close_prices - open_prices) / open_prices * 100, 0.0)
+
+    ts_df = pd.DataFrame({
+        'date': price_df['date'].to_numpy(),
+        'open_price': open_prices,
+        'close_price': close_prices,
+        'price_change_pct': price_change_pct,
+        'liquidations_tradfi_adjusted': daily['liquidations'].to_numpy(),
+        'avg_health_factor': daily['avg_health_factor'].to_numpy(),
+        'avg_effective_ltv': daily['avg_effective_ltv'].to_numpy(),
+        'reductions_applied_today': daily['reductions_applied'].to_numpy(),
+        'unique_liquidated_today': daily['liquidations'].to_numpy(),
+    })
 
     summary = {
         'total_dates': len(price_df),
         'total_positions': len(positions),
-        'total_liquidations_all': total_liquidations_all,
-        'unique_positions_ever_liquidated': len(positions_ever_liquidated),
-        'avg_health_factor_all': np.mean([r['avg_health_factor'] for r in timeseries if r['avg_health_factor'] != float('inf')]),
-        'avg_effective_ltv_all': np.mean([r['avg_effective_ltv'] for r in timeseries]),
-        'total_reductions_applied': sum(r['reductions_applied_today'] for r in timeseries),
+        'total_liquidations_all': policy_summary['total_liquidations_all'],
+        'unique_positions_ever_liquidated': policy_summary['unique_positions_ever_liquidated'],
+        'avg_health_factor_all': policy_summary['avg_health_factor_all'],
+        'avg_effective_ltv_all': policy_summary['avg_effective_ltv_all'],
+        'total_reductions_applied': policy_summary['total_reductions_applied'],
     }
 
-    ts_df = pd.DataFrame(timeseries)
     ts_path = os.path.join(output_dir, "hybrid_adjusted_timeseries.csv")
-    ts_df.to_csv(ts_path, index=False)
+    with metrics.stage('timeseries_csv_write'):
+        ts_df.to_csv(ts_path, index=False)
+    metrics.count_file('timeseries_csv_write', ts_path)
 
     print(f"Timeseries saved: {ts_path}")
     # Print summary to console
@@ -243,10 +206,45 @@ def run_hybrid_stress_simulation(
         for k, v in summary.items():
             f.write(f"{k}: {v}\n")
     print(f"Summary saved to: {summary_path}")
+
+    # Typed, versioned summary.json for cross-run loaders (see defi_sim/run_summary.py)
+    params = {
+        'n_positions': n_positions,
+        'n_days': len(price_df),
+        'regression_mode': REGRESSION_MODE,
+        'il_adjust_factor': IL_ADJUST_FACTOR,
+        'shock_levels_pct': SHOCK_LEVELS_PCT.tolist(),
+        'safety_buffer': SAFETY_BUFFER,
+        'ltv_max': LTV_MAX,
+        'liquidation_threshold': LIQUIDATION_THRESHOLD,
+    }
+    if sweep_id is not None:
+        params['sweep_id'] = sweep_id  # run is a work_queue sweep task
+    run_id = os.path.basename(output_dir)
+    summary_json_path = RunSummary.from_summary('sim4', run_id, summary, params).write(output_dir)
+
+    metrics.stop_profiling()
+    metrics_path = metrics.write(output_dir)
+    if metrics_path:
+        metrics.print_report()
+        print(f"Run metrics saved to: {metrics_path}")
+
+    # Record the finished run in the run catalog next to the run directories
+    input_hashes = hash_inputs(price_df, positions)
+    if model is not None:
+        input_hashes['regression_csv'] = hash_file(historical_csv_path)
+    record_run(os.path.dirname(output_dir) or '.', run_id, 'sim4', output_dir,
+               params=params,
+               input_hashes=input_hashes,
+               summary=summary,
+               timing=timing_from_metrics(metrics.as_dict()),
+               artifacts={'timeseries_csv': ts_path, 'summary_txt': summary_path,
+                          'summary_json': summary_json_path, 'run_metrics': metrics_path})
     return {
         'timeseries_df': ts_df,
         'summary': summary,
-        'output_dir': output_dir
+        'output_dir': output_dir,
+        'metrics': metrics,
     }
 
 
@@ -0,0 +1,103 @@
+"""Cross-checks every numba kernel against the NumPy backend (skipped when numba is not installed)."""
+
+import random
+
+import numpy as np
+import pytest
+
+from kernels.backend import available_backends, get_backend
+from position_loader import create_position_book
+
+pytestmark = pytest.mark.skipif('numba' not in available_backends(), reason="numba is not installed")
+
+RTOL = 1e-12
+LIQUIDATION_THRESHOLD, CLOSE_FACTOR, LIQUIDATION_BONUS = 0.70, 0.5, 0.10
+
+# Walk through, far below and far above every position's range
+PRICES = [2500.0, 1800.0, 300.0, 1.0, 3100.0, 9000.0, 1e6]
+# -100% and beyond take the shocked price to zero or below
+SHOCKS_PCT = np.array([-250, -100, -15, -6, 0, 6, 15, 400], dtype=np.float64)
+
+
+@pytest.fixture(scope='module')
+def book():
+    random.seed(7)
+    return create_position_book(500)
+
+
+@pytest.fixture(scope='module')
+def backends():
+    return get_backend('numpy'), get_backend('numba')
+
+
+def _loans(values):
+    # Positive, zero and negative loans side by side
+    loans = values * 0.65
+    loans[::5] = 0.0
+    loans[1::5] = -loans[1::5]
+    return loans
+
+
+def assert_same(actual, expected):
+    actual, expected = np.asarray(actual), np.asarray(expected)
+    assert actual.shape == expected.shape
+    if expected.dtype == bool:
+        np.testing.assert_array_equal(actual, expected)
+    else:
+        # Also requires infinities (and their signs) in the same places
+        np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=0)
+
+
+@pytest.mark.parametrize('price', PRICES)
+def test_valuation_kernels(book, backends, price):
+    reference, numba = backends
+    for kernel in ('position_value', 'hold_value', 'impermanent_loss'):
+        assert_same(getattr(numba, kernel)(book, price), getattr(reference, kernel)(book, price))
+    for actual, expected in zip(numba.position_amounts(book, price), reference.position_amounts(book, price)):
+        assert_same(actual, expected)
+
+
+def test_per_position_prices(book, backends):
+    reference, numba = backends
+    prices = np.resize(PRICES, len(book))
+    assert_same(numba.position_value(book, prices), reference.position_value(book, prices))
+    assert_same(numba.impermanent_loss(book, prices), reference.impermanent_loss(book, prices))
+
+
+@pytest.mark.parametrize('open_price, close_price', list(zip(PRICES[:-1], PRICES[1:])))
+def test_evaluate(book, backends, open_price, close_price):
+    reference, numba = backends
+    for actual, expected in zip(numba.evaluate(book, open_price, close_price),
+                                reference.evaluate(book, open_price, close_price)):
+        assert_same(actual, expected)
+
+
+@pytest.mark.parametrize('open_price, close_price', list(zip(PRICES[:-1], PRICES[1:])))
+def test_lender_kernels(book, backends, open_price, close_price):
+    reference, numba = backends
+    values = reference.position_value(book, close_price)
+    loans = _loans(reference.position_value(book, open_price))
+
+    assert_same(numba.health_factor(values, loans, LIQUIDATION_THRESHOLD),
+                reference.health_factor(values, loans, LIQUIDATION_THRESHOLD))
+    decisions = numba.decide_liquidation(values, loans, LIQUIDATION_THRESHOLD, CLOSE_FACTOR, LIQUIDATION_BONUS)
+    expected = reference.decide_liquidation(values, loans, LIQUIDATION_THRESHOLD, CLOSE_FACTOR, LIQUIDATION_BONUS)
+    for actual, want in zip(decisions, expected):
+        assert_same(actual, want)
+    # Zero and negative loans never liquidate; a falling price liquidates some positive ones
+    assert not expected[0][loans <= 0].any()
+    if close_price < open_price:
+        assert expected[0].any()
+
+
+@pytest.mark.parametrize('open_price', PRICES)
+@pytest.mark.parametrize('shocks', [SHOCKS_PCT, SHOCKS_PCT[2:7], SHOCKS_PCT[:0]], ids=['to_zero', 'moderate', 'none'])
+def test_worst_shock_hf(book, backends, open_price, shocks):
+    reference, numba = backends
+    loans = _loans(reference.position_value(book, open_price))
+    expected = reference.worst_shock_hf(book, open_price, shocks, loans, LIQUIDATION_THRESHOLD)
+    assert_same(numba.worst_shock_hf(book, open_price, shocks, loans, LIQUIDATION_THRESHOLD), expected)
+    if shocks.size and shocks.min() <= -100:
+        # A shock to a non-positive price projects HF 0 for every position with a loan
+        np.testing.assert_array_equal(expected[loans > 0], 0.0)
+    assert np.isinf(expected[loans <= 0]).all()
@@ -0,0 +1,130 @@
+"""
+TradFi-style stress-test backtest over a simulator liquidation timeseries.
+
+For each day, the health factor is projected at every shock level as the
+regression baseline f(shock) plus the impermanent loss of a narrow ±10% v3
+position under that shock. The worst projection plus a buffer is the day's
+threshold. The day triggers when the realized health factor ends below it.
+
+All days and shocks are one (n_days, n_shocks) array computation. The regression
+depends only on the shock, so it is evaluated once per shock rather than once per
+day and shock:
+
+    df = load_run_timeseries('liquidation_timeseries.csv', run_id='run_20260111_122829')
+    result = run_stress_backtest(df)
+    print(backtest_summary(result))
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+# Discrete shock levels (% from current price), after the SEC Portfolio Margin valuation points
+SHOCK_LEVELS_PCT = np.array([-15, -12, -9, -6, -3, 0, 3, 6, 9, 12, 15])
+BUFFER = 0.1  # extra cushion on the worst projected health
+
+
+def fit_health_regression(df: pd.DataFrame) -> LinearRegression:
+    """Linear fit average_health_factor ≈ f(price_change) over the finite rows of a timeseries."""
+    x = df['price_change'].to_numpy(dtype=np.float64)
+    y = df['average_health_factor'].to_numpy(dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    return LinearRegression().fit(x[finite].reshape(-1, 1), y[finite])
+
+
+def v3_amounts(price, lower, upper, liquidity):
+    """Token amounts (amount0, amount1) of v3 liquidity in [lower, upper] at price; broadcasts."""
+    price, lower, upper, liquidity = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64)
+                                                           for a in (price, lower, upper, liquidity)))
+    valid = (price > 0) & (lower > 0) & (upper > 0) & (lower < upper)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_price = np.sqrt(np.clip(price, lower, upper))
+        amount0 = liquidity * (1 / sqrt_price - 1 / np.sqrt(upper))
+        amount1 = liquidity * (sqrt_price - np.sqrt(lower))
+    return np.where(valid, amount0, 0.0), np.where(valid, amount1, 0.0)
+
+
+def narrow_range_il(current_price, shocked_price, lower_factor: float = 0.9,
+                    upper_factor: float = 1.1) -> np.ndarray:
+    """
+    Impermanent loss (negative = loss) of a v3 position opened at current_price with
+    range [lower_factor, upper_factor] x current_price, at shocked_price. Broadcasts;
+    0 where the position or the hold value is empty.
+    """
+    current_price = np.asarray(current_price, dtype=np.float64)
+    shocked_price = np.asarray(shocked_price, dtype=np.float64)
+    lower, upper = current_price * lower_factor, current_price * upper_factor
+    # IL is a ratio, so unit liquidity gives the same result as any deposit size
+    amount0, amount1 = v3_amounts(current_price, lower, upper, 1.0)
+    pool0, pool1 = v3_amounts(shocked_price, lower, upper, 1.0)
+    pool_value = pool0 + pool1 * shocked_price
+    hold_value = amount0 + amount1 * shocked_price
+    with np.errstate(divide='ignore', invalid='ignore'):
+        il = pool_value / hold_value - 1
+    return np.where(np.isfinite(il) & (hold_value != 0), il, 0.0)
+
+
+def projected_health_matrix(open_prices, model: LinearRegression,
+                            shocks_pct=SHOCK_LEVELS_PCT) -> np.ndarray:
+    """Projected health factor for every day and shock, shape (n_days, n_shocks)."""
+    shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+    open_prices = np.asarray(open_prices, dtype=np.float64)[:, None]
+    baseline = model.predict(shocks_pct.reshape(-1, 1))
+    return baseline[None, :] + narrow_range_il(open_prices, open_prices * (1 + shocks_pct / 100))
+
+
+def run_stress_backtest(df: pd.DataFrame, model: LinearRegression = None, shocks_pct=SHOCK_LEVELS_PCT,
+                        buffer: float = BUFFER, log: bool = False) -> pd.DataFrame:
+    """
+    Backtest the stress-test trigger against a simulator liquidation timeseries.
+
+    Args:
+        df: Timeseries with date, open_price, close_price, price_change,
+            number_of_liquidations and average_health_factor columns
+        model: Health regression (default: fit_health_regression(df))
+        shocks_pct: Shock levels in percent
+        buffer: Added to the worst projected health to get the threshold
+        log: Print one line per day
+
+    Returns:
+        DataFrame with one row per day: date, open_price, close_price,
+        actual_health_factor, worst_projected_health, initial_threshold,
+        triggered, tradfi_liquidations and fixed_liquidations.
+    """
+    if model is None:
+        model = fit_health_regression(df)
+    worst = projected_health_matrix(df['open_price'], model, shocks_pct).min(axis=1)
+    threshold = worst + buffer
+    actual = df['average_health_factor'].to_numpy(dtype=np.float64)
+    triggered = actual < threshold
+
+    result = pd.DataFrame({
+        'date': df['date'].to_numpy(),
+        'open_price': df['open_price'].to_numpy(dtype=np.float64),
+        'close_price': df['close_price'].to_numpy(dtype=np.float64),
+        'actual_health_factor': actual,
+        'worst_projected_health': worst,
+        'initial_threshold': threshold,
+        'triggered': triggered,
+        'tradfi_liquidations': triggered.astype(np.int64),
+        'fixed_liquidations': df['number_of_liquidations'].to_numpy(),
+    })
+    if log:
+        for row in result.itertuples(index=False):
+            print(f"Date: {row.date}, Open: {row.open_price:.2f}, Close: {row.close_price:.2f}, "
+                  f"Actual H: {row.actual_health_factor:.4f}, Worst Projected H: {row.worst_projected_health:.4f}, "
+                  f"Initial Threshold: {row.initial_threshold:.4f} | Triggered: {row.triggered}")
+    return result
+
+
+def backtest_summary(result: pd.DataFrame) -> Dict:
+    """Days with fixed-LTV liquidations vs days the stress test triggered."""
+    fixed_count = int((result['fixed_liquidations'] > 0).sum())
+    tradfi_count = int((result['tradfi_liquidations'] > 0).sum())
+    return {
+        'fixed_count': fixed_count,
+        'tradfi_count': tradfi_count,
+        'reduction_pct': (fixed_count - tradfi_count) / fixed_count * 100 if fixed_count > 0 else 0.0,
+    }
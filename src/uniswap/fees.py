@@ -0,0 +1,123 @@
+"""
+Swap-fee accrual for LP positions, vectorized over the whole book and all days.
+
+compute_position_value counts only the liquidity's token amounts. A real
+position also earns its share of the pool's swap fees while the price is
+inside its range:
+
+    fees[d, i] = fee_rate[d] * liquidity[i] * in_range[d, i]
+    fee_rate[d] = pool_volume[d] * fee_tier / pool_liquidity[d]     (USD per unit of liquidity)
+
+pool_volume is the data file's daily total_volume times the pool's share of
+it. pool_liquidity is the pool's active liquidity: a full-range pool of
+pool_tvl_usd has liquidity TVL / (2 sqrt(p)), and concentration scales that
+for a v3 pool whose liquidity is bunched around the price. in_range is the
+fraction of the day the price spent in the range, assuming a log-linear path
+from open to close.
+
+Fees are taken as collected in USDC when earned and add to the collateral.
+Days are processed in (chunk_days, n_positions) blocks, so memory stays
+bounded and there is no Python loop over positions.
+"""
+
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from uniswap.position_book import PositionBook
+
+
+def in_range_fraction(book: PositionBook, open_prices, close_prices) -> np.ndarray:
+    """
+    Fraction of each day spent inside each position's range, shape (n_days, n_positions).
+    The price is taken to move log-linearly from open to close. A flat day counts
+    fully when the price is inside the range.
+    """
+    log_open = np.log(np.asarray(open_prices, dtype=np.float64))[:, None]
+    log_close = np.log(np.asarray(close_prices, dtype=np.float64))[:, None]
+    low, high = np.minimum(log_open, log_close), np.maximum(log_open, log_close)
+    log_lower = 2 * np.log(book.sqrt_lower)[None, :]
+    log_upper = 2 * np.log(book.sqrt_upper)[None, :]
+
+    overlap = np.clip(np.minimum(high, log_upper) - np.maximum(low, log_lower), 0.0, None)
+    span = high - low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(span > 0, overlap / span, ((low >= log_lower) & (low <= log_upper)).astype(np.float64))
+    return np.clip(fraction, 0.0, 1.0)
+
+
+@dataclass
+class FeeModel:
+    """
+    Pool fee assumptions.
+
+    Attributes:
+        fee_tier: Swap fee (0.003 = the 0.3% tier)
+        volume_share: Share of the market's daily total_volume traded through the pool
+        pool_tvl_usd: Pool TVL, for the pool's active liquidity
+        concentration: Active liquidity relative to a full-range pool of the same TVL
+    """
+    fee_tier: float = 0.003
+    volume_share: float = 0.005
+    pool_tvl_usd: float = 3e8
+    concentration: float = 4.0
+
+    def pool_liquidity(self, prices) -> np.ndarray:
+        """Active pool liquidity (in PositionBook liquidity units) at each price."""
+        return self.concentration * self.pool_tvl_usd / (2 * np.sqrt(np.asarray(prices, dtype=np.float64)))
+
+    def fee_rate(self, volume, prices) -> np.ndarray:
+        """Fee income per unit of in-range liquidity for each day (USD)."""
+        pool_volume = np.asarray(volume, dtype=np.float64) * self.volume_share
+        return pool_volume * self.fee_tier / self.pool_liquidity(prices)
+
+    def daily_fees(self, book: PositionBook, price_df: pd.DataFrame, volume) -> np.ndarray:
+        """Fees earned by every position on every day of price_df, shape (n_days, n_positions)."""
+        open_prices = price_df['open_price'].to_numpy(dtype=np.float64)
+        close_prices = price_df['close_price'].to_numpy(dtype=np.float64)
+        # Fees are valued at the day's average price (geometric mean of open and close)
+        rate = self.fee_rate(volume, np.sqrt(open_prices * close_prices))
+        return rate[:, None] * book.liquidity[None, :] * in_range_fraction(book, open_prices, close_prices)
+
+    def iter_cumulative(self, book: PositionBook, price_df: pd.DataFrame, volume=None,
+                        chunk_days: int = 128) -> Iterator[np.ndarray]:
+        """
+        Fees accrued through each day's close, one (n_positions,) array per day, computed
+        in blocks of chunk_days days.
+
+        Args:
+            volume: Daily total_volume aligned with price_df (default: data_loader.volume
+                when price_df is data_loader.df)
+        """
+        volume = _volume_for(price_df, volume)
+        carry = np.zeros(len(book))
+        for start in range(0, len(price_df), chunk_days):
+            stop = min(start + chunk_days, len(price_df))
+            block = np.cumsum(self.daily_fees(book, price_df.iloc[start:stop], volume[start:stop]), axis=0)
+            block += carry
+            carry = block[-1]
+            yield from block
+
+    def accrued(self, book: PositionBook, price_df: pd.DataFrame, volume=None) -> np.ndarray:
+        """Total fees per position over price_df."""
+        total = np.zeros(len(book))
+        for total in self.iter_cumulative(book, price_df, volume):
+            pass
+        return total
+
+
+def _volume_for(price_df: pd.DataFrame, volume: Optional[np.ndarray]) -> np.ndarray:
+    if volume is not None:
+        volume = np.asarray(volume, dtype=np.float64)
+        if len(volume) != len(price_df):
+            raise ValueError("volume must have one entry per price_df row")
+        return volume
+    import data_loader
+
+    if price_df is data_loader.df:
+        return data_loader.volume.to_numpy()
+    if 'total_volume' in price_df:
+        return price_df['total_volume'].to_numpy(dtype=np.float64)
+    raise ValueError("No volume given and price_df has no total_volume column")
@@ -0,0 +1,101 @@
+"""
+Price sensitivities (delta, gamma) of v3 LP positions, for the whole book.
+
+Differentiating UniswapV3Position.get_amounts' value x(p) * p + y(p) with respect
+to the price gives closed forms in each of the three regions:
+
+    below range  (p < p_a):  value = x_max * p                     delta = x_max        gamma = 0
+    in range:                value = L (2 sqrt(p) - p / sqrt(p_b) - sqrt(p_a))
+                             delta = L (1 / sqrt(p) - 1 / sqrt(p_b)) = amount_eth
+                             gamma = -L / (2 p^(3/2))
+    above range  (p > p_b):  value = y_max                         delta = 0            gamma = 0
+
+Delta is the ETH held, and gamma is the (always negative) curvature that makes
+IL. A shocked value is then approximated by the polynomial
+
+    value(p0 (1 + s)) ≈ value + delta * p0 s + gamma * (p0 s)^2 / 2
+
+which is exact for shocks that stay outside the range, close for small in-range
+moves, and loses accuracy when a shock crosses a range bound.
+approximation_error() measures that against the exact grid.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from uniswap.position_book import PositionBook
+
+
+class PositionGreeks(NamedTuple):
+    value: np.ndarray
+    delta: np.ndarray   # d value / d price (ETH)
+    gamma: np.ndarray   # d2 value / d price2
+
+
+def position_greeks(book: PositionBook, price) -> PositionGreeks:
+    """Value, delta and gamma of every position at price (scalar or per position)."""
+    price = np.asarray(price, dtype=np.float64)
+    sqrt_price = np.sqrt(price)
+    clipped = np.clip(sqrt_price, book.sqrt_lower, book.sqrt_upper)
+    amount_eth = book.liquidity * (1 / clipped - 1 / book.sqrt_upper)
+    amount_usdc = book.liquidity * (clipped - book.sqrt_lower)
+    in_range = (sqrt_price > book.sqrt_lower) & (sqrt_price < book.sqrt_upper)
+    gamma = np.where(in_range, -book.liquidity / (2 * price * sqrt_price), 0.0)
+    return PositionGreeks(amount_eth * price + amount_usdc, amount_eth, gamma)
+
+
+def delta_gamma_values(book: PositionBook, open_price: float, shocks_pct,
+                       greeks: PositionGreeks = None) -> np.ndarray:
+    """
+    Delta-gamma approximation of regime_comparison.shocked_values: position values
+    at each shocked open price, shape (n_positions, n_shocks). Shocks that take the
+    price to zero or below value the position at 0, and values are floored at 0.
+    """
+    if greeks is None:
+        greeks = position_greeks(book, open_price)
+    factors = 1 + np.asarray(shocks_pct, dtype=np.float64) / 100
+    # Built as (n_shocks, n_positions) rows, like shocked_values, and returned transposed
+    moves = np.multiply.outer(factors - 1, np.asarray(open_price, dtype=np.float64))
+    if moves.ndim == 1:
+        moves = moves[:, None]
+    values = greeks.value + moves * greeks.delta
+    values += (0.5 * moves ** 2) * greeks.gamma
+    np.maximum(values, 0.0, out=values)
+    values[factors <= 0] = 0.0
+    return values.T
+
+
+def approximation_error(book: PositionBook, open_price: float, shocks_pct, backend=None) -> pd.DataFrame:
+    """
+    Delta-gamma values against full revaluation at each shock.
+
+    Returns:
+        DataFrame indexed by shock (percent) with max_abs_error, mean_abs_error
+        (USD), max_rel_error (relative to the value at the open) and
+        crossing_fraction (share of positions whose shocked price is on the other
+        side of a range bound from the open price, where the approximation is weakest).
+    """
+    from regime_comparison import shocked_values
+
+    shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+    greeks = position_greeks(book, open_price)
+    approx = delta_gamma_values(book, open_price, shocks_pct, greeks)
+    exact = shocked_values(book, open_price, shocks_pct, backend)
+    abs_error = np.abs(approx - exact)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rel_error = np.where(greeks.value[:, None] > 0, abs_error / greeks.value[:, None], 0.0)
+
+    lower, upper = book.lower_price[:, None], book.upper_price[:, None]
+    open_prices = np.broadcast_to(np.asarray(open_price, dtype=np.float64), (len(book),))[:, None]
+    shocked = open_prices * (1 + shocks_pct / 100)[None, :]
+    crossing = ((open_prices < lower) != (shocked < lower)) | ((open_prices > upper) != (shocked > upper))
+
+    empty = len(book) == 0
+    return pd.DataFrame({
+        'max_abs_error': abs_error.max(axis=0) if not empty else np.zeros(len(shocks_pct)),
+        'mean_abs_error': abs_error.mean(axis=0) if not empty else np.zeros(len(shocks_pct)),
+        'max_rel_error': rel_error.max(axis=0) if not empty else np.zeros(len(shocks_pct)),
+        'crossing_fraction': crossing.mean(axis=0) if not empty else np.zeros(len(shocks_pct)),
+    }, index=pd.Index(shocks_pct, name='shock_pct'))
@@ -0,0 +1,154 @@
+"""
+Uniswap v2 / full-range constant-product math, array-aware.
+
+Pool reserves satisfy x * y = k, so at price p (USDC per ETH):
+
+    eth = sqrt(k / p),  usdc = sqrt(k * p),  value = 2 * sqrt(k * p)
+    IL(r) = 2 * sqrt(r) / (1 + r) - 1        for a balanced deposit, r = p / p0
+
+The module is also a compute backend (same functions as kernels/numpy_backend)
+that values every position of a PositionBook as a full-range position with
+the same deposit value at its initial price. It is cheaper than the
+concentrated-range math and ignores the range bounds, so it suits coarse
+sweeps and stress grids where range precision is not needed:
+
+    from uniswap import il_v2
+    evaluation = book.evaluate(open_price, close_price, backend=il_v2)
+    get_backend('v2')  # same module
+
+Run the module for the worked example (a 10% ETH drop).
+"""
+
+import numpy as np
+
+from kernels.numpy_backend import decide_liquidation, health_factor  # noqa: F401 (backend API)
+
+NAME = 'v2'
+
+
+def calculate_impermanent_loss(price_ratio):
+    """
+    Impermanent loss of a balanced (50/50 value) v2 or full-range v3 position,
+    IL = 2 * sqrt(r) / (1 + r) - 1 with r = new_price / old_price. Scalar or array;
+    negative = loss.
+    """
+    price_ratio = np.asarray(price_ratio, dtype=np.float64)
+    if np.any(price_ratio <= 0):
+        raise ValueError("Price ratio must be positive")
+    il = 2 * np.sqrt(price_ratio) / (1 + price_ratio) - 1
+    return il if il.ndim else float(il)
+
+
+def reserves_at_price(k, price):
+    """(eth, usdc) reserves of a constant-product pool with invariant k after arbitrage to price."""
+    k = np.asarray(k, dtype=np.float64)
+    price = np.asarray(price, dtype=np.float64)
+    return np.sqrt(k / price), np.sqrt(k * price)
+
+
+def lp_value(k, price):
+    """Value in USDC of the reserves at price: 2 * sqrt(k * price)."""
+    return 2 * np.sqrt(np.asarray(k, dtype=np.float64) * np.asarray(price, dtype=np.float64))
+
+
+# ────────────────────────────────────────────────
+# Backend API over a PositionBook (full-range approximation)
+# ────────────────────────────────────────────────
+
+def full_range_sqrt_k(book):
+    """
+    sqrt(k) of the full-range position equivalent to each book position: the one
+    worth the same at the position's initial price, 2 * sqrt(k * p0) = deposit value.
+    """
+    sqrt_initial = book.sqrt_initial
+    deposit_value = book.actual_eth * sqrt_initial ** 2 + book.actual_usdc
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_k = deposit_value / (2 * sqrt_initial)
+    return np.where(np.isfinite(sqrt_k), sqrt_k, 0.0)
+
+
+def position_amounts(book, price):
+    """(amount_eth, amount_usdc) arrays of the full-range equivalents at price."""
+    sqrt_k = full_range_sqrt_k(book)
+    sqrt_price = np.sqrt(price)
+    return sqrt_k / sqrt_price, sqrt_k * sqrt_price
+
+
+def position_value(book, price):
+    return 2 * full_range_sqrt_k(book) * np.sqrt(price)
+
+
+def hold_value(book, price):
+    return book.actual_eth * price + book.actual_usdc
+
+
+def impermanent_loss(book, price):
+    value = position_value(book, price)
+    hold = hold_value(book, price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(hold != 0, value / hold - 1, 0.0)
+
+
+def evaluate(book, open_price, close_price):
+    """
+    Value every position at open and close.
+
+    Returns:
+        (value_open, value_close, hold_close, il_close)
+    """
+    twice_sqrt_k = 2 * full_range_sqrt_k(book)
+    value_open = twice_sqrt_k * np.sqrt(open_price)
+    value_close = twice_sqrt_k * np.sqrt(close_price)
+    hold_close = hold_value(book, close_price)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        il_close = np.where(hold_close != 0, value_close / hold_close - 1, 0.0)
+    return value_open, value_close, hold_close, il_close
+
+
+def worst_shock_hf(book, open_price, shocks_pct, loans, liquidation_threshold):
+    """
+    Worst HF over the shocked prices open_price * (1 + shock / 100), per position
+    (conventions as in kernels.numpy_backend.worst_shock_hf). The full-range value
+    rises with price, so the worst shock is the lowest one.
+    """
+    shocks_pct = np.asarray(shocks_pct, dtype=np.float64)
+    loans = np.asarray(loans, dtype=np.float64)
+    if not len(shocks_pct):
+        return np.full(len(book), np.inf)
+    open_prices = np.broadcast_to(np.asarray(open_price, dtype=np.float64), (len(book),))
+    worst_prices = open_prices * (1 + shocks_pct.min() / 100)
+    values = position_value(book, np.maximum(worst_prices, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hfs = np.where(loans > 0, values * liquidation_threshold / loans, np.inf)
+    return np.where(loans > 0, np.where(worst_prices > 0, hfs, 0.0), np.inf)
+
+
+if __name__ == "__main__":
+    # LP deposits into an ETH/USDC pool
+    initial_eth_deposit = 3000.0
+    initial_usdc_deposit = 2000.0
+    # Price implied by the deposit ratios (balanced position), USDC per ETH
+    initial_price = initial_usdc_deposit / initial_eth_deposit
+    initial_value = initial_eth_deposit * initial_price + initial_usdc_deposit
+    print(f"Initial price (USDC per ETH): {initial_price:.4f}")
+    print(f"Initial LP position value: {initial_value:.2f} USDC")
+
+    k = initial_eth_deposit * initial_usdc_deposit
+    price_drop = 0.10
+    r = 1 - price_drop
+    new_price = initial_price * r
+    print(f"\nAfter {price_drop * 100:.0f}% ETH price drop:")
+    print(f"New price (USDC per ETH): {new_price:.4f}")
+    print(f"Price ratio r = {r:.2f}")
+
+    new_eth_reserve, new_usdc_reserve = reserves_at_price(k, new_price)
+    print(f"New pool reserves: {new_eth_reserve:.2f} ETH and {new_usdc_reserve:.2f} USDC")
+    pool_value_new = lp_value(k, new_price)
+    print(f"Pool position value at new price: {pool_value_new:.2f} USDC")
+    hold_value_new = initial_eth_deposit * new_price + initial_usdc_deposit
+    print(f"Hold strategy value at new price: {hold_value_new:.2f} USDC")
+
+    il_detailed = pool_value_new / hold_value_new - 1
+    print(f"\nImpermanent Loss (detailed): {il_detailed:.4f} or {il_detailed * 100:.2f}%")
+    il_formula = calculate_impermanent_loss(r)
+    print(f"Impermanent Loss (formula): {il_formula:.4f} or {il_formula * 100:.2f}%")
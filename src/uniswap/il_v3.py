@@ -1,4 +1,14 @@
 import math
+from typing import NamedTuple
+
+
+class PositionEvaluation(NamedTuple):
+    """Everything the simulators need about a position for one trading day."""
+    value_open: float        # position value at the open price (USDC)
+    value_close: float       # position value at the close price (USDC)
+    hold_close: float        # hold value at the close price (USDC)
+    impermanent_loss: float  # IL at the close price, as a decimal (negative = loss)
+
 
 class UniswapV3Position:
     """
@@ -6,8 +16,24 @@ class UniswapV3Position:
 
     This allows setting up the position with initial max deposits and range width,
     then computing the position's value at any given price (e.g., for use as collateral in Aave).
+
+    Instances use __slots__ (no per-instance __dict__). For large books use
+    uniswap.position_book.PositionBook, which stores positions as shared arrays.
     """
 
+    __slots__ = (
+        'position_id',
+        'initial_price',
+        'lower_price',
+        'upper_price',
+        'sqrt_initial',
+        'sqrt_lower',
+        'sqrt_upper',
+        'liquidity',
+        'actual_eth',
+        'actual_usdc',
+    )
+
     def __init__(self, id:str, initial_eth_max: float, initial_usdc_max: float, range_width: float):
         """
         Initialize the position.
@@ -103,3 +129,39 @@ class UniswapV3Position:
         position_value = self.compute_position_value(current_price)
         hold_value = self.compute_hold_value(current_price)
         return (position_value / hold_value) - 1 if hold_value != 0 else 0
+
+    def evaluate(self, open_price: float, close_price: float) -> PositionEvaluation:
+        """
+        Compute open value, close value, hold value and IL in one pass.
+        Equivalent to calling compute_position_value(open_price), compute_position_value(close_price),
+        compute_hold_value(close_price) and compute_impermanent_loss(close_price), but runs the
+        get_amounts math once per price (the separate calls run it twice at close_price).
+        Args:
+            open_price: Price at which the position is valued for borrowing.
+            close_price: Price at which the position is checked for liquidation.
+        Returns:
+            PositionEvaluation(value_open, value_close, hold_close, impermanent_loss)
+        """
+        liquidity, sqrt_lower, sqrt_upper = self.liquidity, self.sqrt_lower, self.sqrt_upper
+
+        # get_amounts(open_price) folded into a value
+        if open_price <= self.lower_price:
+            value_open = liquidity * (1 / sqrt_lower - 1 / sqrt_upper) * open_price
+        elif open_price >= self.upper_price:
+            value_open = liquidity * (sqrt_upper - sqrt_lower)
+        else:
+            sqrt_open = math.sqrt(open_price)
+            value_open = liquidity * (1 / sqrt_open - 1 / sqrt_upper) * open_price + liquidity * (sqrt_open - sqrt_lower)
+
+        # get_amounts(close_price) folded into a value
+        if close_price <= self.lower_price:
+            value_close = liquidity * (1 / sqrt_lower - 1 / sqrt_upper) * close_price
+        elif close_price >= self.upper_price:
+            value_close = liquidity * (sqrt_upper - sqrt_lower)
+        else:
+            sqrt_close = math.sqrt(close_price)
+            value_close = liquidity * (1 / sqrt_close - 1 / sqrt_upper) * close_price + liquidity * (sqrt_close - sqrt_lower)
+
+        hold_close = self.actual_eth * close_price + self.actual_usdc
+        il = (value_close / hold_close) - 1 if hold_close != 0 else 0
+        return PositionEvaluation(value_open, value_close, hold_close, il)
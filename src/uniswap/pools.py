@@ -0,0 +1,141 @@
+"""
+Pool registry for multi-pool position books.
+
+A PoolRegistry lists the assets (the columns of a price matrix, priced in USD)
+and the pools (base/quote asset pairs). A pool-tagged PositionBook stores each
+position's pool index. Valuation gathers every position's pool price and quote
+USD price in one indexed read, with no Python loop over pools:
+
+    pool_price = asset_usd[base] / asset_usd[quote]      # per pool, in quote units
+    price      = pool_price[book.pool_index]             # per position
+    value_usd  = backend.position_value(book, price) * asset_usd[quote][book.pool_index]
+
+Books without a pool_index are ETH/USDC positions in pool 0 of default_registry().
+"""
+
+from typing import Iterable, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from uniswap.il_v3 import PositionEvaluation
+
+
+class Pool(NamedTuple):
+    name: str
+    base: str           # the "eth" side of the position (token0)
+    quote: str          # the "usdc" side; prices and values are in this asset
+    fee_tier: float = 0.003
+
+
+class PoolRegistry:
+    """Assets and pools, with the base/quote asset of every pool as index arrays."""
+
+    def __init__(self, assets: Sequence[str] = (), pools: Iterable[Pool] = ()):
+        self.assets: List[str] = []
+        self.pools: List[Pool] = []
+        self._asset_index = {}
+        self._pool_index = {}
+        for asset in assets:
+            self.add_asset(asset)
+        for pool in pools:
+            self.add_pool(*pool)
+
+    def add_asset(self, asset: str) -> int:
+        if asset not in self._asset_index:
+            self._asset_index[asset] = len(self.assets)
+            self.assets.append(asset)
+        return self._asset_index[asset]
+
+    def add_pool(self, name: str, base: str, quote: str, fee_tier: float = 0.003) -> int:
+        """Register a pool (and its assets); returns its pool index."""
+        if name in self._pool_index:
+            raise ValueError(f"Pool {name!r} is already registered")
+        self.add_asset(base)
+        self.add_asset(quote)
+        self._pool_index[name] = len(self.pools)
+        self.pools.append(Pool(name, base, quote, fee_tier))
+        self._arrays = None
+        return self._pool_index[name]
+
+    def asset_index(self, asset: str) -> int:
+        return self._asset_index[asset]
+
+    def pool_index(self, name: str) -> int:
+        return self._pool_index[name]
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    @property
+    def base_index(self) -> np.ndarray:
+        return self._index_arrays()[0]
+
+    @property
+    def quote_index(self) -> np.ndarray:
+        return self._index_arrays()[1]
+
+    def _index_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if getattr(self, '_arrays', None) is None:
+            self._arrays = (np.array([self._asset_index[p.base] for p in self.pools], dtype=np.intp),
+                            np.array([self._asset_index[p.quote] for p in self.pools], dtype=np.intp))
+        return self._arrays
+
+    # ────────────────────────────────────────────────
+    # Prices
+    # ────────────────────────────────────────────────
+
+    def pool_prices(self, asset_prices) -> np.ndarray:
+        """
+        Pool prices (quote per base) from USD asset prices.
+        asset_prices has the assets on its last axis, e.g. (n_assets,) or (n_days, n_assets);
+        the result has the pools there instead.
+        """
+        asset_prices = np.asarray(asset_prices, dtype=np.float64)
+        return asset_prices[..., self.base_index] / asset_prices[..., self.quote_index]
+
+    def position_prices(self, book, asset_prices) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (pool price, quote asset USD price) for every position of a pool-tagged book,
+        for one row of asset prices.
+        """
+        asset_prices = np.asarray(asset_prices, dtype=np.float64)
+        pools = _pools_of(book)
+        return self.pool_prices(asset_prices)[pools], asset_prices[self.quote_index][pools]
+
+    def position_value_usd(self, book, asset_prices, backend=None) -> np.ndarray:
+        """USD value of every position at one row of asset prices."""
+        price, quote_usd = self.position_prices(book, asset_prices)
+        return book.position_value(price, backend) * quote_usd
+
+    def evaluate_usd(self, book, open_asset_prices, close_asset_prices, backend=None) -> PositionEvaluation:
+        """PositionBook.evaluate for a pool-tagged book, with values converted to USD (IL is a ratio)."""
+        open_price, open_quote_usd = self.position_prices(book, open_asset_prices)
+        close_price, close_quote_usd = self.position_prices(book, close_asset_prices)
+        evaluation = book.evaluate(open_price, close_price, backend)
+        return PositionEvaluation(evaluation.value_open * open_quote_usd,
+                                  evaluation.value_close * close_quote_usd,
+                                  evaluation.hold_close * close_quote_usd,
+                                  evaluation.impermanent_loss)
+
+
+def _pools_of(book) -> np.ndarray:
+    if book.pool_index is None:
+        return np.zeros(len(book), dtype=np.intp)
+    return book.pool_index
+
+
+def default_registry() -> PoolRegistry:
+    """The single ETH/USDC pool every untagged book lives in."""
+    return PoolRegistry(('ETH', 'USDC'), [Pool('ETH/USDC', 'ETH', 'USDC', 0.003)])
+
+
+def example_registry() -> PoolRegistry:
+    """A few common pools: volatile/stable, volatile/volatile and stable/stable pairs."""
+    return PoolRegistry(('ETH', 'USDC', 'USDT', 'WBTC', 'DAI'), [
+        Pool('ETH/USDC', 'ETH', 'USDC', 0.003),
+        Pool('ETH/USDT', 'ETH', 'USDT', 0.003),
+        Pool('WBTC/ETH', 'WBTC', 'ETH', 0.003),
+        Pool('WBTC/USDC', 'WBTC', 'USDC', 0.003),
+        Pool('USDC/USDT', 'USDC', 'USDT', 0.0001),
+        Pool('DAI/USDC', 'DAI', 'USDC', 0.0001),
+    ])
@@ -0,0 +1,380 @@
+import struct
+
+import numpy as np
+
+from uniswap.il_v3 import PositionEvaluation, UniswapV3Position
+
+
+class PositionBook:
+    """
+    Struct-of-arrays store for many Uniswap v3 positions (ETH/USDC unless tagged
+    with pools, see uniswap.pools).
+
+    Only the per-position quantities that the valuation math reads are stored,
+    as rows of one contiguous (n_fields, n_positions) float64 block: 40 bytes per
+    position, versus ~440 bytes for a UniswapV3Position object. The range bounds
+    and initial price are derived from the stored rows on demand.
+
+    book[i] returns a PositionView, a flyweight with the UniswapV3Position API
+    that reads from the shared arrays. to_bytes() / from_buffer() give a flat
+    serialization that can be mapped without copying (e.g. from shared memory).
+
+    pool_index optionally tags each position with its pool in a
+    uniswap.pools.PoolRegistry. Prices are then given per position, in the
+    pool's quote asset, and values come out in that quote asset.
+    """
+
+    # Row order of the underlying data block
+    FIELDS = (
+        'liquidity',
+        'sqrt_lower',
+        'sqrt_upper',
+        'actual_eth',
+        'actual_usdc',
+    )
+
+    # Serialized layout: header, id prefix, padding to 8 bytes, data block, id block,
+    # padding to 8 bytes, pool index block (int32, only when has_pools)
+    MAGIC = b'PBOOK'
+    VERSION = 2
+    _HEADER = struct.Struct('<5sBHQHHB')  # magic, version, n_fields, n_positions, id_width, prefix_len, has_pools
+
+    def __init__(self, data: np.ndarray, position_ids=None, id_prefix: str = "id#", pool_index=None):
+        """
+        Args:
+            data: float64 array of shape (len(FIELDS), n_positions).
+            position_ids: Optional explicit ids, one per position. When omitted,
+                position i has id f"{id_prefix}{i}" (as created by position_loader)
+                and no per-position id storage is used.
+            id_prefix: Prefix for generated ids.
+            pool_index: Optional pool of each position (index into a PoolRegistry).
+        """
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim != 2 or data.shape[0] != len(self.FIELDS):
+            raise ValueError(f"data must have shape ({len(self.FIELDS)}, n_positions), got {data.shape}")
+        self.data = data
+        self.id_prefix = id_prefix
+        self._ids = None
+        self.pool_index = None
+        if pool_index is not None:
+            pool_index = np.asarray(pool_index, dtype=np.int32)
+            if pool_index.shape != (data.shape[1],):
+                raise ValueError("pool_index must hold one pool per position")
+            self.pool_index = pool_index
+        if position_ids is not None:
+            if len(position_ids) != data.shape[1]:
+                raise ValueError("position_ids and data must describe the same number of positions")
+            generated = all(pid == f"{id_prefix}{i}" for i, pid in enumerate(position_ids))
+            if not generated:
+                self._ids = np.asarray([str(pid).encode() for pid in position_ids], dtype=np.bytes_)
+
+    # ────────────────────────────────────────────────
+    # Construction
+    # ────────────────────────────────────────────────
+
+    @classmethod
+    def from_positions(cls, positions) -> "PositionBook":
+        """
+        Build a book from UniswapV3Position objects (a list, or a dict keyed by id).
+        """
+        if isinstance(positions, dict):
+            positions = list(positions.values())
+        data = np.empty((len(cls.FIELDS), len(positions)), dtype=np.float64)
+        for i, pos in enumerate(positions):
+            data[:, i] = [getattr(pos, field) for field in cls.FIELDS]
+        return cls(data, [pos.position_id for pos in positions])
+
+    @classmethod
+    def from_deposits(cls, initial_eth_max, initial_usdc_max, range_width,
+                      position_ids=None, id_prefix: str = "id#", pool_index=None,
+                      initial_price=None) -> "PositionBook":
+        """
+        Vectorized UniswapV3Position.__init__: build a book straight from deposit arrays
+        without creating any position objects. For pool-tagged books, "eth" and "usdc"
+        are each pool's base and quote asset.
+
+        The range is centered on initial_price (scalar or per position), by default
+        the deposit ratio usdc_max / eth_max as in UniswapV3Position. With a given
+        price, the liquidity is the most both maxima allow, and the surplus of the
+        other token is not deposited.
+        """
+        initial_eth_max = np.asarray(initial_eth_max, dtype=np.float64)
+        initial_usdc_max = np.asarray(initial_usdc_max, dtype=np.float64)
+        range_width = np.asarray(range_width, dtype=np.float64)
+        if np.any((range_width <= 0) | (range_width >= 1)):
+            raise ValueError("Range width should be between 0 and 1 (exclusive).")
+
+        if initial_price is None:
+            initial_price = initial_usdc_max / initial_eth_max
+        initial_price = np.broadcast_to(np.asarray(initial_price, dtype=np.float64), initial_eth_max.shape)
+        sqrt_initial = np.sqrt(initial_price)
+        sqrt_lower = np.sqrt(initial_price * (1 - range_width))
+        sqrt_upper = np.sqrt(initial_price * (1 + range_width))
+
+        delta0 = 1 / sqrt_initial - 1 / sqrt_upper
+        delta1 = sqrt_initial - sqrt_lower
+        with np.errstate(divide='ignore'):
+            l0 = np.where(delta0 > 0, initial_eth_max / delta0, np.inf)
+            l1 = np.where(delta1 > 0, initial_usdc_max / delta1, np.inf)
+        liquidity = np.minimum(l0, l1)
+
+        data = np.empty((len(cls.FIELDS), len(liquidity)), dtype=np.float64)
+        data[0], data[1], data[2] = liquidity, sqrt_lower, sqrt_upper
+        book = cls(data, position_ids, id_prefix, pool_index)
+        # Actual deposited amounts at the initial price (same clip as get_amounts)
+        data[3], data[4] = book._amounts(initial_price)
+        return book
+
+    def _amounts(self, price):
+        sqrt_price = np.clip(np.sqrt(price), self.sqrt_lower, self.sqrt_upper)
+        return (self.liquidity * (1 / sqrt_price - 1 / self.sqrt_upper),
+                self.liquidity * (sqrt_price - self.sqrt_lower))
+
+    def take(self, indices) -> "PositionBook":
+        """Return a new book holding the positions at `indices` (ids are kept)."""
+        indices = np.asarray(indices)
+        pool_index = self.pool_index[indices] if self.pool_index is not None else None
+        return PositionBook(self.data[:, indices].copy(), [self.position_id(int(i)) for i in indices],
+                            pool_index=pool_index)
+
+    def copy(self) -> "PositionBook":
+        """Independent copy with the same ids and pools (e.g. before mutating liquidity)."""
+        ids = self.position_ids if self._ids is not None else None
+        pool_index = self.pool_index.copy() if self.pool_index is not None else None
+        return PositionBook(self.data.copy(), ids, self.id_prefix, pool_index)
+
+    # ────────────────────────────────────────────────
+    # Access
+    # ────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return self.data.shape[1]
+
+    def __getitem__(self, index: int) -> "PositionView":
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("position index out of range")
+        return PositionView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PositionView(self, i)
+
+    def field(self, name: str) -> np.ndarray:
+        """Return the (read/write) row for one stored field."""
+        return self.data[self.FIELDS.index(name)]
+
+    def position_id(self, index: int) -> str:
+        if self._ids is None:
+            return f"{self.id_prefix}{index}"
+        return self._ids[index].decode()
+
+    @property
+    def position_ids(self):
+        """All position ids as a list of str (materialized on each call)."""
+        if self._ids is None:
+            return [f"{self.id_prefix}{i}" for i in range(len(self))]
+        return [pid.decode() for pid in self._ids]
+
+    def index_of(self, position_id: str) -> int:
+        """Column index of a position id."""
+        if self._ids is None:
+            if position_id.startswith(self.id_prefix) and position_id[len(self.id_prefix):].isdigit():
+                index = int(position_id[len(self.id_prefix):])
+                if index < len(self):
+                    return index
+        else:
+            matches = np.flatnonzero(self._ids == position_id.encode())
+            if len(matches):
+                return int(matches[0])
+        raise KeyError(position_id)
+
+    # Derived per-position quantities (not stored)
+    @property
+    def lower_price(self) -> np.ndarray:
+        return self.sqrt_lower ** 2
+
+    @property
+    def upper_price(self) -> np.ndarray:
+        return self.sqrt_upper ** 2
+
+    @property
+    def sqrt_initial(self) -> np.ndarray:
+        # In range at the initial price: actual_usdc = L * (sqrt_initial - sqrt_lower)
+        return self.actual_usdc / self.liquidity + self.sqrt_lower
+
+    @property
+    def initial_price(self) -> np.ndarray:
+        return self.sqrt_initial ** 2
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the position arrays (data block plus explicit ids and pools)."""
+        return (self.data.nbytes + (self._ids.nbytes if self._ids is not None else 0)
+                + (self.pool_index.nbytes if self.pool_index is not None else 0))
+
+    # ────────────────────────────────────────────────
+    # Valuation
+    # ────────────────────────────────────────────────
+
+    def evaluate(self, open_price, close_price, backend=None) -> PositionEvaluation:
+        """
+        Book-wide UniswapV3Position.evaluate: one fused pass over all positions.
+        Args:
+            open_price: Scalar price, or one price per position.
+            close_price: Scalar price, or one price per position.
+            backend: Backend name or module (default: kernels.backend.get_backend()).
+        Returns:
+            PositionEvaluation whose fields are arrays of length len(book).
+        """
+        return PositionEvaluation(*_backend(backend).evaluate(self, open_price, close_price))
+
+    def position_value(self, price, backend=None) -> np.ndarray:
+        """Position values in USDC at `price` (scalar or per position)."""
+        return _backend(backend).position_value(self, price)
+
+    def price_for_value(self, target_value) -> np.ndarray:
+        """
+        Inverse of position_value: the price at which each position is worth
+        target_value (scalar or per position).
+
+        Value is non-decreasing in price: x_max * p below the range,
+        L * (2 sqrt(p) - p / sqrt_upper - sqrt_lower) inside it, and the all-USDC
+        amount L * (sqrt_upper - sqrt_lower) above it. So for every p,
+        position_value(p) < target_value exactly when p < price_for_value(target_value).
+        Targets at or below 0 give 0. Targets the position never reaches (above
+        its all-USDC value) give +inf.
+        """
+        target = np.broadcast_to(np.asarray(target_value, dtype=np.float64), (len(self),))
+        liquidity, sqrt_lower, sqrt_upper = self.liquidity, self.sqrt_lower, self.sqrt_upper
+        eth_max = liquidity * (1 / sqrt_lower - 1 / sqrt_upper)   # all-ETH amount below the range
+        usdc_max = liquidity * (sqrt_upper - sqrt_lower)           # all-USDC amount above the range
+        value_at_lower = eth_max * sqrt_lower ** 2
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            below = target / eth_max
+            # Smaller root of s^2 / sqrt_upper - 2 s + (sqrt_lower + V / L) = 0, s = sqrt(p)
+            disc = np.maximum(1 - (sqrt_lower + target / liquidity) / sqrt_upper, 0.0)
+            inside = (sqrt_upper * (1 - np.sqrt(disc))) ** 2
+        price = np.where(target <= value_at_lower, below, inside)
+        price = np.where(target > usdc_max, np.inf, price)
+        return np.where(target <= 0, 0.0, price)
+
+    # ────────────────────────────────────────────────
+    # Serialization
+    # ────────────────────────────────────────────────
+
+    def _layout(self):
+        prefix = self.id_prefix.encode()
+        id_width = self._ids.dtype.itemsize if self._ids is not None else 0
+        data_offset = -(-(self._HEADER.size + len(prefix)) // 8) * 8
+        ids_offset = data_offset + self.data.nbytes
+        pools_offset = -(-(ids_offset + id_width * len(self)) // 8) * 8
+        pools_size = self.pool_index.nbytes if self.pool_index is not None else 0
+        return prefix, id_width, data_offset, ids_offset, pools_offset, pools_offset + pools_size
+
+    def serialized_size(self) -> int:
+        return self._layout()[-1]
+
+    def write_to(self, buffer) -> int:
+        """Serialize into a writable buffer (bytearray, mmap, SharedMemory.buf). Returns bytes written."""
+        prefix, id_width, data_offset, ids_offset, pools_offset, total = self._layout()
+        view = memoryview(buffer).cast('B')
+        self._HEADER.pack_into(view, 0, self.MAGIC, self.VERSION, len(self.FIELDS), len(self), id_width, len(prefix),
+                               self.pool_index is not None)
+        view[self._HEADER.size:self._HEADER.size + len(prefix)] = prefix
+        np.frombuffer(view, dtype=np.float64, count=self.data.size, offset=data_offset)[:] = self.data.ravel()
+        if id_width:
+            view[ids_offset:ids_offset + id_width * len(self)] = self._ids.tobytes()
+        if self.pool_index is not None:
+            np.frombuffer(view, dtype=np.int32, count=len(self), offset=pools_offset)[:] = self.pool_index
+        return total
+
+    def to_bytes(self) -> bytes:
+        buffer = bytearray(self.serialized_size())
+        self.write_to(buffer)
+        return bytes(buffer)
+
+    @classmethod
+    def from_buffer(cls, buffer) -> "PositionBook":
+        """
+        Map a serialized book without copying: the arrays are views into `buffer`
+        (read-only when the buffer is, e.g. bytes).
+        """
+        view = memoryview(buffer).cast('B')
+        magic, version, n_fields, n_positions, id_width, prefix_len, has_pools = cls._HEADER.unpack_from(view, 0)
+        if magic != cls.MAGIC or version != cls.VERSION or n_fields != len(cls.FIELDS):
+            raise ValueError("buffer does not contain a serialized PositionBook")
+        prefix = bytes(view[cls._HEADER.size:cls._HEADER.size + prefix_len]).decode()
+        data_offset = -(-(cls._HEADER.size + prefix_len) // 8) * 8
+        data = np.frombuffer(view, dtype=np.float64, count=n_fields * n_positions,
+                             offset=data_offset).reshape(n_fields, n_positions)
+
+        book = cls.__new__(cls)
+        book.data = data
+        book.id_prefix = prefix
+        book._ids = None
+        book.pool_index = None
+        ids_offset = data_offset + data.nbytes
+        if id_width:
+            book._ids = np.frombuffer(view, dtype=f'S{id_width}', count=n_positions, offset=ids_offset)
+        if has_pools:
+            pools_offset = -(-(ids_offset + id_width * n_positions) // 8) * 8
+            book.pool_index = np.frombuffer(view, dtype=np.int32, count=n_positions, offset=pools_offset)
+        return book
+
+
+class PositionView:
+    """
+    Flyweight over one column of a PositionBook with the UniswapV3Position API.
+    Holds only a reference to the book and an index.
+    """
+
+    __slots__ = ('_book', '_index')
+
+    def __init__(self, book: PositionBook, index: int):
+        self._book = book
+        self._index = index
+
+    @property
+    def position_id(self) -> str:
+        return self._book.position_id(self._index)
+
+    @property
+    def lower_price(self) -> float:
+        return float(self._book.data[1, self._index]) ** 2
+
+    @property
+    def upper_price(self) -> float:
+        return float(self._book.data[2, self._index]) ** 2
+
+    @property
+    def sqrt_initial(self) -> float:
+        return self.actual_usdc / self.liquidity + self.sqrt_lower
+
+    @property
+    def initial_price(self) -> float:
+        return self.sqrt_initial ** 2
+
+    # Valuation methods are shared with UniswapV3Position; they only read the attributes above
+    get_amounts = UniswapV3Position.get_amounts
+    compute_position_value = UniswapV3Position.compute_position_value
+    compute_hold_value = UniswapV3Position.compute_hold_value
+    compute_impermanent_loss = UniswapV3Position.compute_impermanent_loss
+    evaluate = UniswapV3Position.evaluate
+
+    def __repr__(self) -> str:
+        return f"PositionView({self.position_id!r})"
+
+
+def _backend(backend):
+    from kernels.backend import get_backend
+    return get_backend(backend) if backend is None or isinstance(backend, str) else backend
+
+
+# Expose each stored field as a read-only property, e.g. book.liquidity (row) / view.liquidity (float)
+for _row, _name in enumerate(PositionBook.FIELDS):
+    setattr(PositionBook, _name, property(lambda self, _row=_row: self.data[_row]))
+    setattr(PositionView, _name, property(lambda self, _row=_row: float(self._book.data[_row, self._index])))